@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import atexit
+
 from flask import Flask, render_template
 from flask_cors import CORS
 
 from .config import AppConfig
-from .database import init_db
+from .database import init_db, db_manager
+from .services.crawl_engine import crawl_engine
 from .routes.auth import auth_bp
 from .routes.tasks import tasks_bp
 from .routes.scheduled_tasks import scheduled_tasks_bp
@@ -25,6 +28,14 @@ def create_app() -> Flask:
     with app.app_context():
         init_db()
 
+    # 每个请求结束时释放该请求线程绑定的数据库会话
+    @app.teardown_appcontext
+    def remove_db_session(exception=None):
+        db_manager.remove_scoped_session()
+
+    # 进程退出时关闭爬取引擎（共享连接池与 crawl4ai 浏览器池）
+    atexit.register(crawl_engine.stop)
+
     # 初始化飞书服务
     if AppConfig.FEISHU_ENABLED:
         try:
@@ -23,12 +23,51 @@ class AppConfig:
     YT_SCOPES = ['https://www.googleapis.com/auth/youtube.force-ssl']
     YT_API_SERVICE_NAME = 'youtube'
     YT_API_VERSION = 'v3'
+    # 分页深度搜索：单次搜索最多获取的视频数与可消耗的配额（每页100单位）
+    YT_SEARCH_MAX_TOTAL = int(os.environ.get('YT_SEARCH_MAX_TOTAL', '200'))
+    YT_SEARCH_QUOTA_BUDGET = int(os.environ.get('YT_SEARCH_QUOTA_BUDGET', '500'))
+    # 每日配额（太平洋时间零点重置）及各优先级任务需保留的配额比例
+    YT_DAILY_QUOTA = int(os.environ.get('YT_DAILY_QUOTA', '10000'))
+    YT_QUOTA_RESERVE_NORMAL = float(os.environ.get('YT_QUOTA_RESERVE_NORMAL', '0.1'))
+    YT_QUOTA_RESERVE_LOW = float(os.environ.get('YT_QUOTA_RESERVE_LOW', '0.3'))
     
     # 数据库配置
     DATABASE_PATH = os.environ.get('DATABASE_PATH', str(BASE_DIR / 'video_search.db'))
+    # 连接模式：pooled(连接池+WAL，默认) 或 static(所有线程共享单连接，兼容旧行为)
+    DB_POOL_MODE = os.environ.get('DB_POOL_MODE', 'pooled').lower()
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '10'))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '10'))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', '30'))
+    # SQLite PRAGMA：写锁等待时间(毫秒)、页缓存大小(KB)、内存映射大小(字节)
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get('DB_BUSY_TIMEOUT_MS', '5000'))
+    DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', '20000'))
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', str(128 * 1024 * 1024)))
     
     # 定时任务配置
     SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true'
+    # 定时任务执行线程池大小
+    SCHEDULER_MAX_WORKERS = int(os.environ.get('SCHEDULER_MAX_WORKERS', '4'))
+    # 停机后错过执行的补偿策略：skip(跳过), run_once(补执行一次), run_all(逐次补执行，最多 SCHEDULER_CATCHUP_MAX_RUNS 次)
+    SCHEDULER_CATCHUP_POLICY = os.environ.get('SCHEDULER_CATCHUP_POLICY', 'skip')
+    SCHEDULER_CATCHUP_MAX_RUNS = int(os.environ.get('SCHEDULER_CATCHUP_MAX_RUNS', '10'))
+    
+    # 外部API限流与熔断：每秒请求数、突发容量、并发上限
+    YT_API_RATE_PER_SEC = float(os.environ.get('YT_API_RATE_PER_SEC', '5'))
+    YT_API_BURST = float(os.environ.get('YT_API_BURST', '10'))
+    YT_API_MAX_CONCURRENCY = int(os.environ.get('YT_API_MAX_CONCURRENCY', '4'))
+    VOLC_API_RATE_PER_SEC = float(os.environ.get('VOLC_API_RATE_PER_SEC', '10'))
+    VOLC_API_BURST = float(os.environ.get('VOLC_API_BURST', '10'))
+    VOLC_API_MAX_CONCURRENCY = int(os.environ.get('VOLC_API_MAX_CONCURRENCY', '4'))
+    DEEPSEEK_API_RATE_PER_SEC = float(os.environ.get('DEEPSEEK_API_RATE_PER_SEC', '1'))
+    DEEPSEEK_API_BURST = float(os.environ.get('DEEPSEEK_API_BURST', '2'))
+    DEEPSEEK_API_MAX_CONCURRENCY = int(os.environ.get('DEEPSEEK_API_MAX_CONCURRENCY', '2'))
+    FEISHU_API_RATE_PER_SEC = float(os.environ.get('FEISHU_API_RATE_PER_SEC', '5'))
+    FEISHU_API_BURST = float(os.environ.get('FEISHU_API_BURST', '5'))
+    FEISHU_API_MAX_CONCURRENCY = int(os.environ.get('FEISHU_API_MAX_CONCURRENCY', '2'))
+    # 连续失败多少次后熔断、熔断后多少秒放行探测请求、等待令牌/并发名额的最长时间
+    CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_RECOVERY_SECONDS = float(os.environ.get('CIRCUIT_RECOVERY_SECONDS', '60'))
+    API_ACQUIRE_TIMEOUT = float(os.environ.get('API_ACQUIRE_TIMEOUT', '30'))
     
     # 飞书配置
     FEISHU_APP_ID = os.environ.get('FEISHU_APP_ID')
@@ -40,10 +79,62 @@ class AppConfig:
     VOLC_ACCESS_KEY = os.environ.get('VOLC_ACCESS_KEY')
     VOLC_SECRET_KEY = os.environ.get('VOLC_SECRET_KEY')
     VOLC_ENABLED = os.environ.get('VOLC_ENABLED', 'true').lower() == 'true'
+    # 翻译记忆进程内LRU缓存条数（持久化部分保存在SQLite中）
+    TRANSLATION_CACHE_SIZE = int(os.environ.get('TRANSLATION_CACHE_SIZE', '5000'))
+    # 目标语言文字占比达到该值时视为无需翻译
+    TRANSLATION_SKIP_TARGET_RATIO = float(os.environ.get('TRANSLATION_SKIP_TARGET_RATIO', '0.6'))
+    # 翻译任务队列：工作线程数、每批领取的视频数、最大重试次数、首次重试间隔（秒，之后指数增长）
+    TRANSLATION_WORKERS = int(os.environ.get('TRANSLATION_WORKERS', '2'))
+    TRANSLATION_BATCH_SIZE = int(os.environ.get('TRANSLATION_BATCH_SIZE', '25'))
+    TRANSLATION_MAX_ATTEMPTS = int(os.environ.get('TRANSLATION_MAX_ATTEMPTS', '5'))
+    TRANSLATION_BACKOFF_SECONDS = int(os.environ.get('TRANSLATION_BACKOFF_SECONDS', '60'))
+    # 下载任务队列：工作线程数（同时进行的下载数上限）、同一主机同时下载数上限
+    DOWNLOAD_WORKERS = int(os.environ.get('DOWNLOAD_WORKERS', '3'))
+    DOWNLOAD_PER_HOST_LIMIT = int(os.environ.get('DOWNLOAD_PER_HOST_LIMIT', '2'))
+    # 下载吞吐：分片并发数、HTTP分块大小（字节，0表示不分块）、重试次数
+    DOWNLOAD_CONCURRENT_FRAGMENTS = int(os.environ.get('DOWNLOAD_CONCURRENT_FRAGMENTS', '4'))
+    DOWNLOAD_HTTP_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_HTTP_CHUNK_SIZE', '10485760'))
+    DOWNLOAD_RETRIES = int(os.environ.get('DOWNLOAD_RETRIES', '10'))
+    # 外部下载器（如 aria2c），为空或未安装时使用 yt-dlp 内置下载器；外部下载器运行期间无法中途取消和统计进度
+    DOWNLOAD_EXTERNAL_DOWNLOADER = os.environ.get('DOWNLOAD_EXTERNAL_DOWNLOADER', '')
+    # 带宽上限（字节/秒，0表示不限）：单个任务的默认上限、所有下载合计的上限
+    DOWNLOAD_RATE_LIMIT = int(os.environ.get('DOWNLOAD_RATE_LIMIT', '0'))
+    DOWNLOAD_GLOBAL_RATE_LIMIT = int(os.environ.get('DOWNLOAD_GLOBAL_RATE_LIMIT', '0'))
+    # 视频信息缓存：有效期（秒，0表示不缓存；解析结果中的下载地址会过期，不宜过长）、最多缓存的视频数
+    DOWNLOAD_INFO_CACHE_TTL = int(os.environ.get('DOWNLOAD_INFO_CACHE_TTL', '600'))
+    DOWNLOAD_INFO_CACHE_SIZE = int(os.environ.get('DOWNLOAD_INFO_CACHE_SIZE', '200'))
+    # 已下载文件索引：目录未变化时两次完整扫描的最小间隔（秒）
+    DOWNLOAD_LIBRARY_SCAN_INTERVAL = int(os.environ.get('DOWNLOAD_LIBRARY_SCAN_INTERVAL', '300'))
+    # 下载去重：同一视频同一格式已有文件时不再下载；下载完成后按内容哈希合并重复文件
+    DOWNLOAD_DEDUP_ENABLED = os.environ.get('DOWNLOAD_DEDUP_ENABLED', 'true').lower() == 'true'
+    # 下载目录磁盘配额（GB，0表示不限）、超出配额时的淘汰策略：lru(最久未使用) / age(最早下载)、文件最长保留天数（0表示不限）
+    DOWNLOAD_QUOTA_GB = float(os.environ.get('DOWNLOAD_QUOTA_GB', '0'))
+    DOWNLOAD_EVICTION_POLICY = os.environ.get('DOWNLOAD_EVICTION_POLICY', 'lru').lower()
+    DOWNLOAD_MAX_AGE_DAYS = int(os.environ.get('DOWNLOAD_MAX_AGE_DAYS', '0'))
+    # 定时任务发送飞书通知前等待新视频翻译完成的最长时间（秒），0表示不等待
+    TRANSLATION_NOTIFY_WAIT_SECONDS = int(os.environ.get('TRANSLATION_NOTIFY_WAIT_SECONDS', '60'))
     
     # DeepSeek AI配置
     DEEPSEEK_API_KEY = os.environ.get('DEEPSEEK_API_KEY')
     DEEPSEEK_ENABLED = os.environ.get('DEEPSEEK_ENABLED', 'true').lower() == 'true'
+
+    # 网站爬虫配置：同时爬取的网站数上限、连接池总连接数、单个主机的并发连接数与请求间隔（秒）
+    CRAWL_MAX_CONCURRENCY = int(os.environ.get('CRAWL_MAX_CONCURRENCY', '8'))
+    CRAWL_MAX_CONNECTIONS = int(os.environ.get('CRAWL_MAX_CONNECTIONS', '50'))
+    CRAWL_PER_HOST_LIMIT = int(os.environ.get('CRAWL_PER_HOST_LIMIT', '2'))
+    CRAWL_PER_HOST_DELAY = float(os.environ.get('CRAWL_PER_HOST_DELAY', '1.0'))
+    # DNS缓存时间、空闲连接保活时间、单个请求超时（秒）
+    CRAWL_DNS_CACHE_TTL = int(os.environ.get('CRAWL_DNS_CACHE_TTL', '300'))
+    CRAWL_KEEPALIVE_SECONDS = float(os.environ.get('CRAWL_KEEPALIVE_SECONDS', '30'))
+    CRAWL_REQUEST_TIMEOUT = float(os.environ.get('CRAWL_REQUEST_TIMEOUT', '30'))
+    # crawl4ai 浏览器池：浏览器实例数、每个实例同时渲染的页面数、实例渲染多少次后重建
+    CRAWL_BROWSER_POOL_SIZE = int(os.environ.get('CRAWL_BROWSER_POOL_SIZE', '2'))
+    CRAWL_BROWSER_MAX_PAGES = int(os.environ.get('CRAWL_BROWSER_MAX_PAGES', '3'))
+    CRAWL_BROWSER_MAX_RENDERS = int(os.environ.get('CRAWL_BROWSER_MAX_RENDERS', '100'))
+    # HTML解析后端：html.parser(默认，与历史结果一致)、lxml(更快，但对不规范HTML的容错方式不同)、auto(已安装lxml时使用lxml)
+    CRAWL_HTML_PARSER = os.environ.get('CRAWL_HTML_PARSER', 'html.parser')
+    # 增量爬取：沿分页链接/站点地图爬取时，单个网站一次最多请求的页面数
+    CRAWL_FRONTIER_MAX_PAGES = int(os.environ.get('CRAWL_FRONTIER_MAX_PAGES', '20'))
     
     @classmethod
     def validate_config(cls):
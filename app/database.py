@@ -1,60 +1,196 @@
 # -*- coding: utf-8 -*-
 
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import StaticPool, QueuePool
 
 from .models import Base
 from .config import AppConfig
 
 
+class InstrumentedQueuePool(QueuePool):
+    """带统计的连接池：记录获取连接的等待时间、超时次数"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats_lock = threading.Lock()
+        self.wait_stats = {'waits': 0, 'total_wait_seconds': 0.0, 'max_wait_seconds': 0.0, 'timeouts': 0}
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self.stats_lock:
+                self.wait_stats['timeouts'] += 1
+            raise
+        finally:
+            wait = time.perf_counter() - start
+            with self.stats_lock:
+                self.wait_stats['waits'] += 1
+                self.wait_stats['total_wait_seconds'] += wait
+                self.wait_stats['max_wait_seconds'] = max(self.wait_stats['max_wait_seconds'], wait)
+
+    def recreate(self):
+        # dispose() 时重建连接池，保留统计对象
+        new_pool = super().recreate()
+        new_pool.stats_lock = self.stats_lock
+        new_pool.wait_stats = self.wait_stats
+        return new_pool
+
+
 class DatabaseManager:
     """数据库管理器"""
-    
+
     def __init__(self):
         self.engine = None
         self.SessionLocal = None
         self.db_session = None
-    
+        self._counters_lock = threading.Lock()
+        self._counters = {'connects': 0, 'checkouts': 0, 'checkins': 0, 'sessions': 0}
+
     def init_database(self, db_path: str = None):
         """初始化数据库"""
         if db_path is None:
-            db_path = os.path.join(AppConfig.BASE_DIR, 'video_search.db')
-        
+            db_path = AppConfig.DATABASE_PATH or os.path.join(AppConfig.BASE_DIR, 'video_search.db')
+            # 相对路径按项目根目录解析，避免因启动目录不同而创建新的数据库文件
+            if not os.path.isabs(db_path):
+                db_path = os.path.join(AppConfig.BASE_DIR, db_path)
+
         # 创建数据库引擎
-        self.engine = create_engine(
-            f'sqlite:///{db_path}',
-            connect_args={'check_same_thread': False},
-            poolclass=StaticPool,
-            echo=False  # 设置为True可以看到SQL语句
-        )
-        
+        if AppConfig.DB_POOL_MODE == 'static':
+            # 兼容模式：所有线程共享同一个连接
+            self.engine = create_engine(
+                f'sqlite:///{db_path}',
+                connect_args={'check_same_thread': False},
+                poolclass=StaticPool,
+                echo=False  # 设置为True可以看到SQL语句
+            )
+        else:
+            # 连接池模式：配合WAL，读请求不再被调度器的长写事务阻塞
+            self.engine = create_engine(
+                f'sqlite:///{db_path}',
+                connect_args={
+                    'check_same_thread': False,
+                    'timeout': AppConfig.DB_BUSY_TIMEOUT_MS / 1000,
+                },
+                poolclass=InstrumentedQueuePool,
+                pool_size=AppConfig.DB_POOL_SIZE,
+                max_overflow=AppConfig.DB_MAX_OVERFLOW,
+                pool_timeout=AppConfig.DB_POOL_TIMEOUT,
+                pool_pre_ping=False,
+                echo=False  # 设置为True可以看到SQL语句
+            )
+        self._register_engine_events(self.engine)
+
         # 创建会话工厂
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-        
-        # 创建全局会话 - 移除scoped_session，改为每次创建新会话
-        # self.db_session = scoped_session(self.SessionLocal)
-        
+
+        # 线程（请求/任务）级会话注册表，配合 remove_scoped_session() 在请求或任务结束时释放
+        self.db_session = scoped_session(self.SessionLocal)
+
         # 创建所有表
         Base.metadata.create_all(bind=self.engine)
-        
-        print(f"数据库已初始化: {db_path}")
-    
+
+        print(f"数据库已初始化: {db_path}（连接模式: {AppConfig.DB_POOL_MODE}）")
+
+    def _register_engine_events(self, engine):
+        """注册连接事件：设置SQLite PRAGMA并统计连接池使用情况"""
+
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.execute(f"PRAGMA busy_timeout={int(AppConfig.DB_BUSY_TIMEOUT_MS)}")
+                cursor.execute(f"PRAGMA cache_size=-{int(AppConfig.DB_CACHE_SIZE_KB)}")
+                cursor.execute(f"PRAGMA mmap_size={int(AppConfig.DB_MMAP_SIZE)}")
+                cursor.execute("PRAGMA temp_store=MEMORY")
+            finally:
+                cursor.close()
+            with self._counters_lock:
+                self._counters['connects'] += 1
+
+        @event.listens_for(engine, 'checkout')
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            with self._counters_lock:
+                self._counters['checkouts'] += 1
+
+        @event.listens_for(engine, 'checkin')
+        def _on_checkin(dbapi_connection, connection_record):
+            with self._counters_lock:
+                self._counters['checkins'] += 1
+
     def get_session(self):
         """获取数据库会话"""
         if self.SessionLocal is None:
             raise RuntimeError("数据库未初始化，请先调用 init_database()")
-        
+
         # 每次返回新的会话，避免多线程问题
-        session = self.SessionLocal()
-        print(f"创建新的数据库会话: {id(session)}")
-        return session
-    
+        with self._counters_lock:
+            self._counters['sessions'] += 1
+        return self.SessionLocal()
+
+    @contextmanager
+    def session_scope(self):
+        """以一个任务/操作为单位的会话：正常结束提交，异常时回滚，最后关闭"""
+        session = self.get_session()
+        try:
+            yield session
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            session.close()
+
+    def get_scoped_session(self):
+        """
+        获取当前线程（请求或任务）绑定的会话
+
+        路由处理函数与定时任务、后台爬取任务使用该会话，同一线程内多次获取为同一个会话；
+        Flask请求结束（teardown）或任务结束时由 remove_scoped_session() 统一关闭，调用方无需自行关闭
+        """
+        if self.db_session is None:
+            raise RuntimeError("数据库未初始化，请先调用 init_database()")
+        return self.db_session()
+
+    def remove_scoped_session(self):
+        """释放当前线程绑定的会话（Flask请求结束、定时任务执行结束时调用）"""
+        if self.db_session is not None:
+            self.db_session.remove()
+
+    def get_pool_stats(self) -> dict:
+        """获取连接池统计：连接创建、检出/归还次数、等待时间等"""
+        with self._counters_lock:
+            stats = dict(self._counters)
+        stats['pool_mode'] = AppConfig.DB_POOL_MODE
+        if self.engine is None:
+            return stats
+
+        pool = self.engine.pool
+        stats['pool_status'] = pool.status()
+        if isinstance(pool, QueuePool):
+            stats['checked_out'] = pool.checkedout()
+            stats['pool_size'] = pool.size()
+            stats['overflow'] = pool.overflow()
+        if isinstance(pool, InstrumentedQueuePool):
+            with pool.stats_lock:
+                wait_stats = dict(pool.wait_stats)
+            waits = wait_stats['waits']
+            wait_stats['avg_wait_seconds'] = wait_stats['total_wait_seconds'] / waits if waits else 0.0
+            stats.update(wait_stats)
+        return stats
+
     def close_session(self):
         """关闭数据库会话 - 已废弃，请直接调用session.close()"""
         print("警告: close_session() 已废弃，请直接调用 session.close()")
-    
+
     def close(self):
         """关闭数据库连接"""
         if self.engine:
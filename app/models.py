@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from datetime import datetime, timedelta, timezone
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey, CheckConstraint
+from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Boolean, JSON, ForeignKey, CheckConstraint, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.sql import func
@@ -57,7 +57,10 @@ class ScheduledTask(Base):
     schedule_days = Column(String(100))  # 执行日期，格式：1,2,3,4,5,6,7（周一到周日）
     schedule_date = Column(String(10))  # 执行日期，格式：DD（每月第几天）
     is_active = Column(Boolean, default=True)
+    priority = Column(String(10), default='normal')  # 配额紧张时的优先级：high, normal, low
+    dedup_scope = Column(String(10), default='task')  # 去重范围：task(本任务), event(同事件任务), global(全局)
     next_run = Column(DateTime)
+    deferred_run = Column(DateTime)  # 配额不足延后时，配额重置后的补执行时间（执行后清空）
     created_at = Column(DateTime, default=get_east8_time)
     updated_at = Column(DateTime, default=get_east8_time, onupdate=get_east8_time)
     
@@ -65,6 +68,8 @@ class ScheduledTask(Base):
     task = relationship("Task", back_populates="scheduled_tasks")
     # 关联执行结果
     execution_results = relationship("ScheduledExecutionResult", back_populates="scheduled_task", cascade="all, delete-orphan")
+    # 关联已见视频台账
+    seen_videos = relationship("ScheduledTaskSeenVideo", back_populates="scheduled_task", cascade="all, delete-orphan")
 
 
 class ExecutionResult(Base):
@@ -101,12 +106,29 @@ class ScheduledExecutionResult(Base):
     scheduled_task = relationship("ScheduledTask", back_populates="execution_results")
 
 
+class ScheduledTaskSeenVideo(Base):
+    """定时任务已见视频台账表，用于按任务去重"""
+    __tablename__ = 'scheduled_task_seen_videos'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    scheduled_task_id = Column(Integer, ForeignKey('scheduled_tasks.id'), nullable=False)
+    video_id = Column(String(50), nullable=False)  # YouTube视频ID
+    first_seen_at = Column(DateTime, default=get_east8_time)
+    
+    # 关联定时任务
+    scheduled_task = relationship("ScheduledTask", back_populates="seen_videos")
+    
+    __table_args__ = (
+        UniqueConstraint('scheduled_task_id', 'video_id', name='uq_seen_task_video'),
+    )
+
+
 class VideoInfo(Base):
     """视频信息表"""
     __tablename__ = 'video_info'
     
     id = Column(Integer, primary_key=True, autoincrement=True)
-    video_id = Column(String(50), nullable=False, index=True)
+    video_id = Column(String(50), nullable=False, unique=True, index=True)
     title = Column(String(500))
     description = Column(Text)
     channel_title = Column(String(200))
@@ -121,7 +143,11 @@ class VideoInfo(Base):
     category_id = Column(String(20))
     default_language = Column(String(10))
     default_audio_language = Column(String(10))
-    created_at = Column(DateTime, default=get_east8_time)
+    created_at = Column(DateTime, default=get_east8_time)  # 即全局首次发现时间
+    
+    # 首次发现该视频的任务
+    first_seen_task_id = Column(Integer, ForeignKey('tasks.id'), nullable=True)
+    first_seen_scheduled_task_id = Column(Integer, ForeignKey('scheduled_tasks.id'), nullable=True)
     
     # 翻译相关字段
     translated_title = Column(String(500))  # 翻译后的标题
@@ -157,6 +183,124 @@ class VideoExecutionResult(Base):
     )
 
 
+class YouTubeQuotaUsage(Base):
+    """YouTube Data API 配额使用表（按太平洋时间自然日统计）"""
+    __tablename__ = 'youtube_quota_usage'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    quota_date = Column(String(10), nullable=False)  # 太平洋时间日期，格式：YYYY-MM-DD
+    call_type = Column(String(50), nullable=False)  # 如 search.list, videos.list
+    calls = Column(Integer, default=0)
+    units = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=get_east8_time, onupdate=get_east8_time)
+    
+    __table_args__ = (
+        UniqueConstraint('quota_date', 'call_type', name='uq_quota_date_call_type'),
+    )
+
+
+class TranslationMemory(Base):
+    """翻译记忆表（按 规范化原文哈希 + 目标语言 缓存翻译结果）"""
+    __tablename__ = 'translation_memory'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    text_hash = Column(String(64), nullable=False)  # 规范化原文的SHA-256
+    target_language = Column(String(20), nullable=False)
+    source_text = Column(Text)
+    translated_text = Column(Text, nullable=False)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=get_east8_time)
+    last_used_at = Column(DateTime, default=get_east8_time)
+
+    __table_args__ = (
+        UniqueConstraint('text_hash', 'target_language', name='uq_translation_hash_lang'),
+    )
+
+
+class TranslationJob(Base):
+    """视频翻译任务队列表（每个视频一条，记录翻译状态）"""
+    __tablename__ = 'translation_jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    video_info_id = Column(Integer, ForeignKey('video_info.id'), nullable=False, unique=True)
+    status = Column(String(20), default='pending', index=True)  # pending, running, done, failed
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime, default=get_east8_time)
+    claim_token = Column(String(36))  # 领取该任务的批次标识
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=get_east8_time)
+    updated_at = Column(DateTime, default=get_east8_time, onupdate=get_east8_time)
+
+
+
+class DownloadJob(Base):
+    """视频下载任务队列表（状态持久化，重启后继续处理未完成的下载）"""
+    __tablename__ = 'download_jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # 自增主键即提交顺序
+    job_id = Column(String(64), nullable=False, unique=True)  # 对外的任务ID：download_<uuid>
+    url = Column(Text, nullable=False)
+    host = Column(String(255), index=True)  # 按主机限制并发下载数
+    format_id = Column(String(100), default='best')
+    download_path = Column(Text)
+    status = Column(String(20), default='queued', index=True)  # queued, downloading, completed, failed, cancelled
+    progress = Column(Integer, default=0)
+    rate_limit = Column(Integer)  # 单个任务的带宽上限（字节/秒），为空时使用配置
+    downloaded_bytes = Column(Integer, default=0)
+    total_bytes = Column(Integer, default=0)
+    transferred_bytes = Column(Integer, default=0)  # 最近一次下载实际传输的字节数（不含续传前已下载的部分）
+    avg_speed = Column(Integer, default=0)  # 最近一次下载的平均吞吐量（字节/秒）
+    attempts = Column(Integer, default=0)  # 开始下载的次数（含重启后恢复）
+    error = Column(Text)
+    result = Column(Text)  # 下载结果(JSON格式)
+    created_at = Column(DateTime, default=get_east8_time)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    updated_at = Column(DateTime, default=get_east8_time, onupdate=get_east8_time)
+
+
+class DownloadedFile(Base):
+    """已下载文件索引表（下载完成时写入，按目录增量扫描校正）"""
+    __tablename__ = 'downloaded_files'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    path = Column(String(1000), nullable=False, unique=True)  # 绝对路径
+    directory = Column(String(1000), nullable=False)
+    name = Column(String(500), nullable=False)
+    size = Column(Integer, default=0)
+    mtime_ns = Column(Integer)  # 文件修改时间（纳秒），扫描时与文件系统比较判断是否变化
+    created_time = Column(DateTime)
+    modified_time = Column(DateTime)
+    video_id = Column(String(100))  # 规范化视频ID，如 youtube:<视频ID>；扫描发现的文件为空
+    job_id = Column(String(64))  # 下载该文件的任务ID
+    format_id = Column(String(100))  # 下载时请求的格式，与 video_id 一起作为去重键
+    sha256 = Column(String(64), index=True)  # 文件内容哈希（下载完成时流式计算），扫描发现或内容变化的文件为空
+    last_accessed_at = Column(DateTime)  # 最近一次被下载或去重复用的时间，LRU淘汰依据
+    indexed_at = Column(DateTime, default=get_east8_time)
+    updated_at = Column(DateTime, default=get_east8_time, onupdate=get_east8_time)
+
+    __table_args__ = (
+        Index('ix_downloaded_files_dir_created', 'directory', 'created_time'),
+        Index('ix_downloaded_files_video_format', 'video_id', 'format_id'),
+    )
+
+
+class DownloadedFileAlias(Base):
+    """已下载文件别名表（其他视频/格式下载得到的内容与已有文件完全相同时，指向该文件）"""
+    __tablename__ = 'downloaded_file_aliases'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    file_id = Column(Integer, ForeignKey('downloaded_files.id'), nullable=False, index=True)
+    video_id = Column(String(100), nullable=False)
+    format_id = Column(String(100), nullable=False)
+    sha256 = Column(String(64), nullable=False)  # 建立别名时文件的内容哈希，文件内容变化后别名失效
+    created_at = Column(DateTime, default=get_east8_time)
+
+    __table_args__ = (
+        UniqueConstraint('video_id', 'format_id', name='uq_downloaded_file_alias'),
+    )
+
+
 class AuthCredentials(Base):
     """认证凭证表"""
     __tablename__ = 'auth_credentials'
@@ -321,3 +465,37 @@ class CrawlScheduledTask(Base):
     
     # 关联关系
     website = relationship('CrawlWebsite', backref='scheduled_tasks')
+
+class CrawlPageCache(Base):
+    """爬取页面HTTP缓存表（按URL记录校验信息，用于条件请求和内容变化检测）"""
+    __tablename__ = 'crawl_page_cache'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    url = Column(String(1000), nullable=False, unique=True, comment='页面URL')
+    etag = Column(String(500), comment='响应的ETag')
+    last_modified = Column(String(100), comment='响应的Last-Modified')
+    content_hash = Column(String(64), comment='页面内容的SHA-256')
+    config_hash = Column(String(64), comment='解析配置的SHA-256，配置变化后不复用缓存')
+    fetch_count = Column(Integer, default=0, comment='请求次数')
+    not_modified_count = Column(Integer, default=0, comment='返回304的次数')
+    unchanged_count = Column(Integer, default=0, comment='返回200但内容未变化的次数')
+    last_checked_at = Column(DateTime, default=datetime.utcnow, comment='最近请求时间')
+    last_changed_at = Column(DateTime, default=datetime.utcnow, comment='内容最近变化时间')
+
+class CrawlSeenUrl(Base):
+    """网站已见视频索引表（按网站 + 规范化URL去重，记录首次/最近发现时间）"""
+    __tablename__ = 'crawl_seen_urls'
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    website_id = Column(Integer, ForeignKey('crawl_websites.id'), nullable=False, comment='关联网站ID')
+    normalized_url = Column(String(1000), nullable=False, comment='规范化后的视频链接')
+    content_hash = Column(String(64), comment='标题、简介、缩略图的SHA-256，用于判断内容是否变化')
+    first_seen_task_id = Column(Integer, comment='首次发现该视频的爬取任务ID')
+    last_changed_task_id = Column(Integer, comment='最近一次保存该视频（新增或内容变化）的爬取任务ID')
+    first_seen_at = Column(DateTime, default=datetime.utcnow, comment='首次发现时间')
+    last_seen_at = Column(DateTime, default=datetime.utcnow, comment='最近发现时间')
+    last_changed_at = Column(DateTime, default=datetime.utcnow, comment='内容最近变化时间')
+    
+    __table_args__ = (
+        UniqueConstraint('website_id', 'normalized_url', name='uq_crawl_seen_website_url'),
+    )
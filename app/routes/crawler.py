@@ -5,13 +5,15 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 import json
-import asyncio
 import threading
 from typing import Dict, List
 
 from ..database import db_manager
 from ..models import CrawlWebsite, CrawlTask, CrawlVideo, CrawlScheduledTask
 from ..services.crawler_service import CrawlerService
+from ..services.crawl_engine import crawl_engine
+from ..services.page_cache_service import page_cache_service
+from ..services.crawl_seen_service import crawl_seen_service
 from ..services.translate_service import get_translate_service
 
 crawler_bp = Blueprint('crawler', __name__, url_prefix='/api/crawler')
@@ -23,7 +25,7 @@ crawler_tasks = {}
 def get_websites():
     """获取所有爬取网站"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         websites = db.query(CrawlWebsite).filter(CrawlWebsite.is_active == True).all()
         
         result = []
@@ -59,8 +61,6 @@ def get_websites():
             'success': False,
             'error': f'获取网站列表失败: {str(e)}'
         }), 500
-    finally:
-        db.close()
 
 @crawler_bp.route('/websites', methods=['POST'])
 def create_website():
@@ -78,7 +78,7 @@ def create_website():
                 'error': '网站名称和URL不能为空'
             }), 400
         
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         # 检查URL是否已存在
         existing_website = db.query(CrawlWebsite).filter(CrawlWebsite.url == url).first()
@@ -130,15 +130,13 @@ def create_website():
             'success': False,
             'error': f'创建网站失败: {str(e)}'
         }), 500
-    finally:
-        db.close()
 
 @crawler_bp.route('/websites/<int:website_id>', methods=['PUT'])
 def update_website(website_id):
     """更新爬取网站"""
     try:
         data = request.get_json()
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         website = db.query(CrawlWebsite).filter(CrawlWebsite.id == website_id).first()
         if not website:
@@ -194,14 +192,12 @@ def update_website(website_id):
             'success': False,
             'error': f'更新网站失败: {str(e)}'
         }), 500
-    finally:
-        db.close()
 
 @crawler_bp.route('/websites/<int:website_id>', methods=['DELETE'])
 def delete_website(website_id):
     """删除爬取网站"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         website = db.query(CrawlWebsite).filter(CrawlWebsite.id == website_id).first()
         if not website:
@@ -231,14 +227,12 @@ def delete_website(website_id):
             'success': False,
             'error': f'删除网站失败: {str(e)}'
         }), 500
-    finally:
-        db.close()
 
 @crawler_bp.route('/tasks', methods=['GET'])
 def get_tasks():
     """获取所有爬取任务"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         tasks = db.query(CrawlTask).order_by(CrawlTask.created_at.desc()).all()
         
         result = []
@@ -266,8 +260,6 @@ def get_tasks():
             'success': False,
             'error': f'获取任务列表失败: {str(e)}'
         }), 500
-    finally:
-        db.close()
 
 @crawler_bp.route('/tasks', methods=['POST'])
 def create_task():
@@ -286,7 +278,7 @@ def create_task():
                 'error': '任务名称和网站ID不能为空'
             }), 400
         
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         # 检查网站是否存在
         website = db.query(CrawlWebsite).filter(CrawlWebsite.id == website_id).first()
@@ -339,7 +331,7 @@ def create_task():
 def get_task_videos(task_id):
     """获取任务关联的视频"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         videos = db.query(CrawlVideo).filter(CrawlVideo.task_id == task_id).order_by(CrawlVideo.crawl_time.desc()).all()
         
         result = []
@@ -372,14 +364,12 @@ def get_task_videos(task_id):
             'success': False,
             'error': f'获取视频列表失败: {str(e)}'
         }), 500
-    finally:
-        db.close()
 
 @crawler_bp.route('/tasks/<int:task_id>/execute', methods=['POST'])
 def execute_crawl_task(task_id):
     """执行爬取任务"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         # 查找任务
         task = db.query(CrawlTask).filter(CrawlTask.id == task_id).first()
@@ -405,12 +395,12 @@ def execute_crawl_task(task_id):
         # 在后台执行爬取任务
         def run_crawl_task():
             try:
-                asyncio.run(execute_crawl_task_async(task_id))
+                execute_crawl_task_async(task_id)
             except Exception as e:
                 print(f"爬取任务执行失败: {str(e)}")
                 # 更新任务状态为失败
                 try:
-                    db = db_manager.get_session()
+                    db = db_manager.get_scoped_session()
                     task = db.query(CrawlTask).filter(CrawlTask.id == task_id).first()
                     if task:
                         task.status = 'failed'
@@ -420,7 +410,7 @@ def execute_crawl_task(task_id):
                 except Exception as db_error:
                     print(f"更新任务状态失败: {str(db_error)}")
                 finally:
-                    db.close()
+                    db_manager.remove_scoped_session()
         
         # 启动后台线程
         thread = threading.Thread(target=run_crawl_task)
@@ -437,14 +427,12 @@ def execute_crawl_task(task_id):
             'success': False,
             'error': f'启动任务失败: {str(e)}'
         }), 500
-    finally:
-        db.close()
 
 @crawler_bp.route('/tasks/<int:task_id>', methods=['DELETE'])
 def delete_crawl_task(task_id):
     """删除爬取任务"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         # 查找任务
         task = db.query(CrawlTask).filter(CrawlTask.id == task_id).first()
@@ -471,14 +459,12 @@ def delete_crawl_task(task_id):
             'success': False,
             'error': f'删除任务失败: {str(e)}'
         }), 500
-    finally:
-        db.close()
 
 @crawler_bp.route('/scheduled-tasks', methods=['GET'])
 def get_scheduled_tasks():
     """获取所有定时爬取任务"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         tasks = db.query(CrawlScheduledTask).filter(CrawlScheduledTask.is_active == True).all()
         
         result = []
@@ -506,8 +492,6 @@ def get_scheduled_tasks():
             'success': False,
             'error': f'获取定时任务列表失败: {str(e)}'
         }), 500
-    finally:
-        db.close()
 
 @crawler_bp.route('/scheduled-tasks', methods=['POST'])
 def create_scheduled_task():
@@ -526,7 +510,7 @@ def create_scheduled_task():
                 'error': '任务名称和网站ID不能为空'
             }), 400
         
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         # 检查网站是否存在
         website = db.query(CrawlWebsite).filter(CrawlWebsite.id == website_id).first()
@@ -568,6 +552,94 @@ def create_scheduled_task():
             'error': f'创建定时任务失败: {str(e)}'
         }), 500
 
+@crawler_bp.route('/websites/crawl-all', methods=['POST'])
+def crawl_all_websites():
+    """为所有启用的网站创建手动爬取任务并并发执行"""
+    try:
+        data = request.get_json(silent=True) or {}
+        crawl_config = data.get('crawl_config', {})
+        
+        db = db_manager.get_scoped_session()
+        websites = db.query(CrawlWebsite).filter(CrawlWebsite.is_active == True).all()
+        if not websites:
+            return jsonify({
+                'success': False,
+                'error': '没有启用的网站'
+            }), 400
+        
+        batch_time = datetime.now().strftime('%Y-%m-%d %H:%M')
+        new_tasks = [
+            CrawlTask(
+                name=f"{website.name} {batch_time}",
+                website_id=website.id,
+                task_type='manual',
+                status='pending',
+                crawl_config=json.dumps(crawl_config)
+            )
+            for website in websites
+        ]
+        db.add_all(new_tasks)
+        db.commit()
+        task_ids = [task.id for task in new_tasks]
+        
+        thread = threading.Thread(target=execute_crawl_tasks, args=(task_ids,))
+        thread.daemon = True
+        thread.start()
+        
+        return jsonify({
+            'success': True,
+            'task_ids': task_ids,
+            'message': f'已启动 {len(task_ids)} 个网站的爬取'
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'启动批量爬取失败: {str(e)}'
+        }), 500
+
+@crawler_bp.route('/engine/stats', methods=['GET'])
+def get_engine_stats():
+    """获取爬取引擎统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': crawl_engine.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取爬取引擎统计失败: {str(e)}'
+        }), 500
+
+@crawler_bp.route('/page-cache/stats', methods=['GET'])
+def get_page_cache_stats():
+    """获取页面缓存统计（304、内容未变化次数及跳过比例）"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': page_cache_service.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取页面缓存统计失败: {str(e)}'
+        }), 500
+
+@crawler_bp.route('/seen/stats', methods=['GET'])
+def get_seen_stats():
+    """获取已见视频索引统计（新增、变化、未变化的视频数）"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': crawl_seen_service.get_stats()
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'获取已见视频索引统计失败: {str(e)}'
+        }), 500
+
 @crawler_bp.route('/supported-websites', methods=['GET'])
 def get_supported_websites():
     """获取支持的网站模板"""
@@ -586,89 +658,109 @@ def get_supported_websites():
             'error': f'获取支持的网站失败: {str(e)}'
         }), 500
 
-def execute_crawl_task_async(task_id: int):
-    """执行爬取任务（异步）"""
+def _build_crawl_config(task: CrawlTask, website: CrawlWebsite) -> Dict:
+    """合并任务与网站的爬取配置"""
+    task_crawl_config = json.loads(task.crawl_config) if task.crawl_config else {}
+    
+    website_crawl_config = {}
+    if website.crawl_config:
+        try:
+            website_crawl_config = json.loads(website.crawl_config)
+        except:
+            pass
+    
+    return {
+        **task_crawl_config,
+        'website_crawl_config': website_crawl_config
+    }
+
+def _save_crawl_videos(db: Session, task: CrawlTask, website: CrawlWebsite, videos: List[Dict],
+                       page_caches: List[Dict] = None):
+    """保存爬取到的视频并将任务标记为完成"""
+    for video_data in videos:
+        video = CrawlVideo(
+            task_id=task.id,
+            website_id=website.id,
+            video_title=video_data.get('video_title', ''),
+            video_url=video_data.get('video_url', ''),
+            video_description=video_data.get('video_description', ''),
+            thumbnail_url=video_data.get('thumbnail_url', ''),
+            duration=video_data.get('duration', ''),
+            upload_date=video_data.get('upload_date', ''),
+            view_count=video_data.get('view_count', ''),
+            like_count=video_data.get('like_count', ''),
+            translated_title=video_data.get('translated_title', ''),
+            translated_description=video_data.get('translated_description', ''),
+            language=video_data.get('language', ''),
+            crawl_time=datetime.utcnow()
+        )
+        db.add(video)
+    # 与视频在同一事务中写入已见视频索引和页面缓存校验信息，保存失败时下次爬取仍会重新解析这些页面
+    crawl_seen_service.record(db, website.id, task.id, videos)
+    page_cache_service.record(db, page_caches)
+    
+    task.status = 'completed'
+    task.total_videos = len(videos)
+    task.completed_at = datetime.utcnow()
+    task.updated_at = datetime.utcnow()
+
+def execute_crawl_tasks(task_ids: List[int]):
+    """
+    并发执行多个爬取任务
+    
+    所有任务的网站提交到共享的爬取引擎中同时爬取，全部结束后逐个保存结果；
+    在后台线程中执行，使用该线程绑定的会话，结束时释放
+    """
     try:
-        db = db_manager.get_session()
-        task = db.query(CrawlTask).filter(CrawlTask.id == task_id).first()
-        
-        if not task:
-            print(f"任务 {task_id} 不存在")
-            return
-        
-        # 获取网站信息
-        website = db.query(CrawlWebsite).filter(CrawlWebsite.id == task.website_id).first()
-        if not website:
-            task.status = 'failed'
-            task.error_message = '网站不存在'
-            task.updated_at = datetime.now()
-            db.commit()
-            return
-        
-        # 获取爬取配置
-        task_crawl_config = json.loads(task.crawl_config) if task.crawl_config else {}
-        
-        # 获取网站的爬取配置
-        website_crawl_config = {}
-        if website.crawl_config:
-            try:
-                website_crawl_config = json.loads(website.crawl_config)
-            except:
-                pass
-        
-        # 合并配置
-        final_crawl_config = {
-            **task_crawl_config,
-            'website_crawl_config': website_crawl_config
+        db = db_manager.get_scoped_session()
+        tasks = db.query(CrawlTask).filter(CrawlTask.id.in_(task_ids)).all()
+        websites = {
+            website.id: website for website in
+            db.query(CrawlWebsite).filter(CrawlWebsite.id.in_([task.website_id for task in tasks])).all()
         }
         
-        # 执行爬取
-        try:
-            # 创建新的爬虫服务实例
-            crawler_service = CrawlerService()
-            # 直接调用爬取方法
-            videos = asyncio.run(crawler_service.crawl_website(website.url, final_crawl_config))
-        except Exception as crawl_error:
-            print(f"爬取失败: {str(crawl_error)}")
-            videos = []
-        
-        # 保存视频信息
-        for video_data in videos:
-            video = CrawlVideo(
-                task_id=task_id,
-                website_id=website.id,
-                video_title=video_data.get('video_title', ''),
-                video_url=video_data.get('video_url', ''),
-                video_description=video_data.get('video_description', ''),
-                thumbnail_url=video_data.get('thumbnail_url', ''),
-                duration=video_data.get('duration', ''),
-                upload_date=video_data.get('upload_date', ''),
-                view_count=video_data.get('view_count', ''),
-                like_count=video_data.get('like_count', ''),
-                translated_title=video_data.get('translated_title', ''),
-                translated_description=video_data.get('translated_description', ''),
-                language=video_data.get('language', ''),
-                crawl_time=datetime.utcnow()
-            )
-            db.add(video)
-        
-        # 更新任务状态
-        task.status = 'completed'
-        task.total_videos = len(videos)
-        task.completed_at = datetime.utcnow()
-        task.updated_at = datetime.utcnow()
-        
+        # 提交所有网站的爬取
+        pending = []
+        for task in tasks:
+            website = websites.get(task.website_id)
+            if not website:
+                task.status = 'failed'
+                task.error_message = '网站不存在'
+                task.updated_at = datetime.now()
+                continue
+            task.status = 'running'
+            task.started_at = task.started_at or datetime.utcnow()
+            pending.append((task, website, crawl_engine.submit(
+                website.url, _build_crawl_config(task, website), website_id=website.id)))
         db.commit()
-        print(f"任务 {task_id} 执行完成，共获取 {len(videos)} 个视频")
+        
+        # 等待全部完成后保存结果，单个任务失败不影响其他任务
+        for task, website, future in pending:
+            try:
+                try:
+                    videos, page_caches = future.result()
+                except Exception as crawl_error:
+                    print(f"爬取失败: {str(crawl_error)}")
+                    videos, page_caches = [], []
+                _save_crawl_videos(db, task, website, videos, page_caches)
+                db.commit()
+                print(f"任务 {task.id} 执行完成，共获取 {len(videos)} 个视频")
+            except Exception as e:
+                db.rollback()
+                print(f"任务 {task.id} 执行失败: {str(e)}")
+                try:
+                    task.status = 'failed'
+                    task.error_message = str(e)
+                    task.updated_at = datetime.utcnow()
+                    db.commit()
+                except:
+                    db.rollback()
         
     except Exception as e:
-        print(f"任务 {task_id} 执行失败: {str(e)}")
-        try:
-            task.status = 'failed'
-            task.error_message = str(e)
-            task.updated_at = datetime.utcnow()
-            db.commit()
-        except:
-            pass
+        print(f"批量爬取任务执行失败: {str(e)}")
     finally:
-        db.close()
+        db_manager.remove_scoped_session()
+
+def execute_crawl_task_async(task_id: int):
+    """执行爬取任务（异步）"""
+    execute_crawl_tasks([task_id])
@@ -3,16 +3,25 @@
 
 from flask import Blueprint, jsonify, request, send_file
 import os
-from datetime import datetime
-import threading
-import time
 
 from ..services.youtube_downloader import get_youtube_downloader
+from ..services.download_queue_service import download_queue, JOB_CANCELLED, JOB_CANCELLING
+from ..services.download_library_service import download_library
+from ..services.download_quota_service import download_quota
+from yt_dlp.utils import parse_bytes
 
 downloads_bp = Blueprint('downloads', __name__)
 
-# 存储下载任务状态
-download_tasks = {}
+def _parse_rate_limit(value):
+    """解析带宽上限：字节/秒整数或 yt-dlp 格式的字符串（如 '2M'、'500K'），为空返回None"""
+    if value in (None, '', 0, '0'):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    rate_limit = parse_bytes(str(value).strip())
+    if rate_limit is None:
+        raise ValueError(f'无效的带宽上限: {value}')
+    return rate_limit
 
 @downloads_bp.route('/downloads/extract-info', methods=['POST'])
 def extract_video_info():
@@ -42,7 +51,7 @@ def extract_video_info():
 
 @downloads_bp.route('/downloads/start', methods=['POST'])
 def start_download():
-    """开始下载视频"""
+    """开始下载视频（加入下载队列）"""
     try:
         data = request.get_json()
         url = data.get('url', '').strip()
@@ -52,117 +61,128 @@ def start_download():
         if not url:
             return jsonify({'success': False, 'error': '请提供视频URL'})
         
+        try:
+            rate_limit = _parse_rate_limit(data.get('rate_limit'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+        
         # 验证URL
         downloader = get_youtube_downloader()
         if not downloader.validate_url(url):
             return jsonify({'success': False, 'error': '无效的YouTube URL'})
         
-        # 创建下载任务
-        task_id = f"download_{int(time.time())}"
-        download_tasks[task_id] = {
-            'id': task_id,
-            'url': url,
-            'status': 'starting',
-            'progress': 0,
-            'start_time': datetime.now().isoformat(),
-            'error': None
-        }
-        
-        # 在后台线程中执行下载
-        def download_worker():
-            try:
-                download_tasks[task_id]['status'] = 'downloading'
-                download_tasks[task_id]['progress'] = 10
-                
-                # 设置下载选项
-                options = {
-                    'format': format_id
-                }
-                
-                # 添加进度回调（如果支持）
-                try:
-                    options['progress_hooks'] = [lambda d: progress_callback(task_id, d)]
-                except:
-                    pass
-                
-                if download_path:
-                    options['outtmpl'] = os.path.join(download_path, '%(title)s.%(ext)s')
-                
-                # 执行下载
-                result = downloader.download_video(url, options)
-                
-                if result['success']:
-                    download_tasks[task_id]['status'] = 'completed'
-                    download_tasks[task_id]['progress'] = 100
-                    download_tasks[task_id]['result'] = result
-                else:
-                    download_tasks[task_id]['status'] = 'failed'
-                    download_tasks[task_id]['error'] = result['error']
-                    
-            except Exception as e:
-                download_tasks[task_id]['status'] = 'failed'
-                download_tasks[task_id]['error'] = str(e)
-        
-        # 启动下载线程
-        thread = threading.Thread(target=download_worker)
-        thread.daemon = True
-        thread.start()
+        # 创建下载任务，由下载队列的工作线程执行
+        task_id = download_queue.submit([url], format_id, download_path, rate_limit)[0]
         
         return jsonify({
             'success': True,
             'task_id': task_id,
-            'message': '下载任务已启动'
+            'message': '下载任务已加入队列'
         })
         
     except Exception as e:
         return jsonify({'success': False, 'error': f'启动下载失败: {str(e)}'}), 500
 
-def progress_callback(task_id: str, d: dict):
-    """下载进度回调"""
-    if task_id in download_tasks:
-        if d['status'] == 'downloading':
-            # 计算进度百分比
-            if 'total_bytes' in d and d['total_bytes']:
-                progress = int((d['downloaded_bytes'] / d['total_bytes']) * 90) + 10
-                download_tasks[task_id]['progress'] = progress
-            elif 'total_bytes_estimate' in d and d['total_bytes_estimate']:
-                progress = int((d['downloaded_bytes'] / d['total_bytes_estimate']) * 90) + 10
-                download_tasks[task_id]['progress'] = progress
+@downloads_bp.route('/downloads/batch', methods=['POST'])
+def start_batch_download():
+    """批量下载视频（全部加入下载队列，按工作线程数和单主机并发上限依次下载）"""
+    try:
+        data = request.get_json()
+        urls = [url.strip() for url in data.get('urls', []) if url and url.strip()]
+        format_id = data.get('format', 'best')
+        download_path = data.get('download_path', '')
+        
+        if not urls:
+            return jsonify({'success': False, 'error': '请提供视频URL列表'})
+        
+        try:
+            rate_limit = _parse_rate_limit(data.get('rate_limit'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)})
+        
+        downloader = get_youtube_downloader()
+        valid_urls = [url for url in urls if downloader.validate_url(url)]
+        invalid_urls = [url for url in urls if url not in valid_urls]
+        if not valid_urls:
+            return jsonify({'success': False, 'error': '没有有效的YouTube URL', 'invalid_urls': invalid_urls})
+        
+        task_ids = download_queue.submit(valid_urls, format_id, download_path, rate_limit)
+        
+        return jsonify({
+            'success': True,
+            'task_ids': task_ids,
+            'invalid_urls': invalid_urls,
+            'message': f'{len(task_ids)} 个下载任务已加入队列'
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'批量下载失败: {str(e)}'}), 500
 
 @downloads_bp.route('/downloads/status/<task_id>', methods=['GET'])
 def get_download_status(task_id: str):
     """获取下载任务状态"""
-    if task_id not in download_tasks:
-        return jsonify({'success': False, 'error': '任务不存在'}), 404
-    
-    task = download_tasks[task_id]
-    return jsonify({
-        'success': True,
-        'task': task
-    })
+    try:
+        task = download_queue.get_job(task_id)
+        if not task:
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
+        
+        return jsonify({
+            'success': True,
+            'task': task
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'获取任务状态失败: {str(e)}'}), 500
 
 @downloads_bp.route('/downloads/tasks', methods=['GET'])
 def list_download_tasks():
-    """获取所有下载任务"""
-    return jsonify({
-        'success': True,
-        'tasks': list(download_tasks.values())
-    })
+    """获取最近的下载任务"""
+    try:
+        limit = request.args.get('limit', 100, type=int)
+        return jsonify({
+            'success': True,
+            'tasks': download_queue.list_jobs(limit)
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'获取下载任务失败: {str(e)}'}), 500
 
 @downloads_bp.route('/downloads/cancel/<task_id>', methods=['POST'])
 def cancel_download(task_id: str):
     """取消下载任务"""
-    if task_id not in download_tasks:
-        return jsonify({'success': False, 'error': '任务不存在'}), 404
-    
-    # 标记任务为已取消
-    download_tasks[task_id]['status'] = 'cancelled'
-    download_tasks[task_id]['progress'] = 0
-    
-    return jsonify({
-        'success': True,
-        'message': '下载任务已取消'
-    })
+    try:
+        status = download_queue.cancel(task_id)
+        if status is None:
+            return jsonify({'success': False, 'error': '任务不存在'}), 404
+        
+        if status == JOB_CANCELLED:
+            return jsonify({'success': True, 'status': status, 'message': '下载任务已取消'})
+        if status == JOB_CANCELLING:
+            return jsonify({'success': True, 'status': status, 'message': '正在中止下载'})
+        return jsonify({'success': False, 'status': status, 'error': '任务已结束，无法取消'}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'取消下载失败: {str(e)}'}), 500
+
+@downloads_bp.route('/downloads/queue/stats', methods=['GET'])
+def get_download_queue_stats():
+    """获取下载队列统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': download_queue.get_stats()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'获取下载队列统计失败: {str(e)}'}), 500
+
+@downloads_bp.route('/downloads/cache/stats', methods=['GET'])
+def get_info_cache_stats():
+    """获取视频信息缓存统计"""
+    try:
+        downloader = get_youtube_downloader()
+        return jsonify({
+            'success': True,
+            'stats': downloader.get_info_cache_stats()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'获取视频信息缓存统计失败: {str(e)}'}), 500
 
 @downloads_bp.route('/downloads/formats', methods=['GET'])
 def get_supported_formats():
@@ -180,37 +200,69 @@ def get_supported_formats():
 
 @downloads_bp.route('/downloads/files', methods=['GET'])
 def list_downloaded_files():
-    """获取已下载的文件列表"""
+    """获取已下载的文件列表（从文件索引分页获取，支持 page/per_page/sort/order，refresh=1 时强制重新扫描目录）"""
     try:
         downloader = get_youtube_downloader()
         download_path = downloader.download_path
         
-        files = []
-        if os.path.exists(download_path):
-            for filename in os.listdir(download_path):
-                file_path = os.path.join(download_path, filename)
-                if os.path.isfile(file_path):
-                    file_info = {
-                        'name': filename,
-                        'path': file_path,
-                        'size': os.path.getsize(file_path),
-                        'size_mb': round(os.path.getsize(file_path) / (1024 * 1024), 2),
-                        'created_time': datetime.fromtimestamp(os.path.getctime(file_path)).isoformat(),
-                        'modified_time': datetime.fromtimestamp(os.path.getmtime(file_path)).isoformat()
-                    }
-                    files.append(file_info)
-        
-        # 按创建时间排序
-        files.sort(key=lambda x: x['created_time'], reverse=True)
+        page = request.args.get('page', 1, type=int)
+        per_page = min(max(request.args.get('per_page', 100, type=int), 1), 500)
+        sort = request.args.get('sort', 'created_time')
+        order = request.args.get('order', 'desc')
+        refresh = request.args.get('refresh', '').lower() in ('1', 'true')
+        
+        # 目录未变化时只比较一次目录修改时间，不遍历文件
+        download_library.reconcile(download_path, force=refresh)
+        result = download_library.list_files(download_path, page, per_page, sort, order)
         
         return jsonify({
             'success': True,
-            'files': files,
+            'files': result['files'],
+            'total': result['total'],
+            'page': result['page'],
+            'per_page': result['per_page'],
+            'pages': result['pages'],
             'download_path': download_path
         })
     except Exception as e:
         return jsonify({'success': False, 'error': f'获取文件列表失败: {str(e)}'}), 500
 
+@downloads_bp.route('/downloads/library/stats', methods=['GET'])
+def get_download_library_stats():
+    """获取已下载文件索引统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'stats': download_library.get_stats()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'获取文件索引统计失败: {str(e)}'}), 500
+
+@downloads_bp.route('/downloads/quota', methods=['GET'])
+def get_download_quota():
+    """获取下载目录占用、配额与清理统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'usage': download_quota.get_usage(),
+            'stats': download_quota.get_stats()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'获取磁盘配额失败: {str(e)}'}), 500
+
+@downloads_bp.route('/downloads/quota/enforce', methods=['POST'])
+def enforce_download_quota():
+    """立即按配额清理下载目录"""
+    try:
+        download_library.reconcile(get_youtube_downloader().download_path)
+        return jsonify({
+            'success': True,
+            'result': download_quota.enforce(),
+            'usage': download_quota.get_usage()
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': f'清理下载目录失败: {str(e)}'}), 500
+
 @downloads_bp.route('/downloads/download/<filename>', methods=['GET'])
 def download_file(filename: str):
     """下载文件"""
@@ -221,6 +273,7 @@ def download_file(filename: str):
         if not os.path.exists(file_path):
             return jsonify({'success': False, 'error': '文件不存在'}), 404
         
+        download_library.touch(file_path)
         return send_file(file_path, as_attachment=True)
     except Exception as e:
         return jsonify({'success': False, 'error': f'下载文件失败: {str(e)}'}), 500
@@ -236,6 +289,7 @@ def delete_file(filename: str):
             return jsonify({'success': False, 'error': '文件不存在'}), 404
         
         os.remove(file_path)
+        download_library.remove(file_path)
         
         return jsonify({
             'success': True,
@@ -50,7 +50,7 @@ def get_focus_points():
 def list_events():
     """获取所有事件列表"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         events = db.query(Event).order_by(Event.created_at.desc()).all()
         
         result = []
@@ -98,16 +98,13 @@ def list_events():
         
     except Exception as e:
         return jsonify({"error": f"获取事件列表失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @events_bp.get('/events/<int:event_id>')
 def get_event(event_id: int):
     """获取指定事件详情"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         event = db.query(Event).filter(Event.id == event_id).first()
         
         if not event:
@@ -155,9 +152,6 @@ def get_event(event_id: int):
         
     except Exception as e:
         return jsonify({"error": f"获取事件详情失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @events_bp.post('/events')
@@ -176,7 +170,7 @@ def create_event():
         if data['event_type'] not in EVENT_TYPES:
             return jsonify({"error": f"无效的事件类型: {data['event_type']}"}), 400
         
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         # 创建事件
         event = Event(
@@ -220,9 +214,6 @@ def create_event():
         if 'db' in locals():
             db.rollback()
         return jsonify({"error": f"创建事件失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @events_bp.put('/events/<int:event_id>')
@@ -231,7 +222,7 @@ def update_event(event_id: int):
     try:
         data = request.get_json() or {}
         
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         event = db.query(Event).filter(Event.id == event_id).first()
         
         if not event:
@@ -289,16 +280,13 @@ def update_event(event_id: int):
         if 'db' in locals():
             db.rollback()
         return jsonify({"error": f"更新事件失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @events_bp.delete('/events/<int:event_id>')
 def delete_event(event_id: int):
     """删除事件"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         event = db.query(Event).filter(Event.id == event_id).first()
         
         if not event:
@@ -320,16 +308,13 @@ def delete_event(event_id: int):
         if 'db' in locals():
             db.rollback()
         return jsonify({"error": f"删除事件失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @events_bp.get('/events/<int:event_id>/scheduled-tasks')
 def get_event_scheduled_tasks(event_id: int):
     """获取事件关联的定时任务列表"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         event = db.query(Event).filter(Event.id == event_id).first()
         
         if not event:
@@ -361,6 +346,3 @@ def get_event_scheduled_tasks(event_id: int):
         
     except Exception as e:
         return jsonify({"error": f"获取事件定时任务失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
@@ -6,7 +6,8 @@ import uuid
 
 from ..database import db_manager
 from ..models import Task, ScheduledTask, ScheduledExecutionResult
-from ..scheduler import task_scheduler
+from ..scheduler import task_scheduler, calculate_next_run
+from ..services.content_filter_service import DEDUP_SCOPE_TASK, DEDUP_SCOPES
 
 scheduled_tasks_bp = Blueprint('scheduled_tasks', __name__)
 
@@ -31,7 +32,7 @@ def create_scheduled_task():
                 return jsonify({"error": f"缺少必需参数: {field}"}), 400
         
         # 验证任务是否存在
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         task = db.query(Task).filter(Task.task_id == data['task_id']).first()
         if not task:
             return jsonify({"error": "任务不存在"}), 404
@@ -49,6 +50,16 @@ def create_scheduled_task():
             if schedule_type == 'monthly' and 'schedule_date' not in data:
                 return jsonify({"error": "每月任务需要指定schedule_date参数"}), 400
         
+        # 配额紧张时的优先级
+        priority = data.get('priority', 'normal')
+        if priority not in ('high', 'normal', 'low'):
+            return jsonify({"error": "priority 必须为 high、normal 或 low"}), 400
+        
+        # 去重范围
+        dedup_scope = data.get('dedup_scope', DEDUP_SCOPE_TASK)
+        if dedup_scope not in DEDUP_SCOPES:
+            return jsonify({"error": "dedup_scope 必须为 task、event 或 global"}), 400
+        
         # 创建定时任务
         scheduled_task = ScheduledTask(
             task_id=task.id,
@@ -57,11 +68,13 @@ def create_scheduled_task():
             schedule_time=data.get('schedule_time'),
             schedule_days=data.get('schedule_days'),
             schedule_date=data.get('schedule_date'),
+            priority=priority,
+            dedup_scope=dedup_scope,
             is_active=True
         )
         
         # 计算下次执行时间
-        scheduled_task.next_run = _calculate_next_run(scheduled_task)
+        scheduled_task.next_run = calculate_next_run(scheduled_task)
         
         db.add(scheduled_task)
         db.commit()
@@ -80,16 +93,13 @@ def create_scheduled_task():
         if 'db' in locals():
             db.rollback()
         return jsonify({"error": f"创建定时任务失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @scheduled_tasks_bp.get('/scheduled-tasks')
 def list_scheduled_tasks():
     """获取所有定时任务列表"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         scheduled_tasks = db.query(ScheduledTask).join(Task).order_by(ScheduledTask.created_at.desc()).all()
         
         result = []
@@ -112,16 +122,22 @@ def list_scheduled_tasks():
         return jsonify({"success": True, "scheduled_tasks": result})
     except Exception as e:
         return jsonify({"error": f"获取定时任务列表失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
+
+
+@scheduled_tasks_bp.get('/scheduler/metrics')
+def get_scheduler_metrics():
+    """获取调度器运行指标"""
+    try:
+        return jsonify({"success": True, "metrics": task_scheduler.get_metrics()})
+    except Exception as e:
+        return jsonify({"error": f"获取调度器指标失败: {str(e)}"}), 500
 
 
 @scheduled_tasks_bp.get('/scheduled-tasks/<int:scheduled_task_id>')
 def get_scheduled_task(scheduled_task_id: int):
     """获取指定定时任务详情"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         scheduled_task = db.query(ScheduledTask).filter(ScheduledTask.id == scheduled_task_id).first()
         
         if not scheduled_task:
@@ -144,9 +160,6 @@ def get_scheduled_task(scheduled_task_id: int):
         return jsonify({"success": True, "scheduled_task": result})
     except Exception as e:
         return jsonify({"error": f"获取定时任务详情失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @scheduled_tasks_bp.put('/scheduled-tasks/<int:scheduled_task_id>/toggle')
@@ -171,7 +184,7 @@ def toggle_scheduled_task(scheduled_task_id: int):
         
         print(f"最终状态: is_active = {is_active}")
         
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         scheduled_task = db.query(ScheduledTask).filter(ScheduledTask.id == scheduled_task_id).first()
         
         if not scheduled_task:
@@ -186,7 +199,7 @@ def toggle_scheduled_task(scheduled_task_id: int):
         
         if is_active:
             # 重新计算下次执行时间并添加到调度器
-            scheduled_task.next_run = _calculate_next_run(scheduled_task)
+            scheduled_task.next_run = calculate_next_run(scheduled_task)
             print(f"计算下次执行时间: {scheduled_task.next_run}")
             task_scheduler.add_scheduled_task(scheduled_task)
             print(f"定时任务 {scheduled_task_id} 已添加到调度器")
@@ -212,16 +225,37 @@ def toggle_scheduled_task(scheduled_task_id: int):
         if 'db' in locals():
             db.rollback()
         return jsonify({"error": f"切换定时任务状态失败: {str(e)}"}), 500
-    finally:
+
+
+@scheduled_tasks_bp.put('/scheduled-tasks/<int:scheduled_task_id>/dedup-scope')
+def update_dedup_scope(scheduled_task_id: int):
+    """修改定时任务的去重范围（task/event/global）"""
+    try:
+        data = request.get_json() or {}
+        dedup_scope = data.get('dedup_scope')
+        if dedup_scope not in DEDUP_SCOPES:
+            return jsonify({"error": "dedup_scope 必须为 task、event 或 global"}), 400
+        
+        db = db_manager.get_scoped_session()
+        scheduled_task = db.query(ScheduledTask).filter(ScheduledTask.id == scheduled_task_id).first()
+        if not scheduled_task:
+            return jsonify({"error": "定时任务不存在"}), 404
+        
+        scheduled_task.dedup_scope = dedup_scope
+        db.commit()
+        
+        return jsonify({"success": True, "scheduled_task": _scheduled_task_to_dict(scheduled_task)})
+    except Exception as e:
         if 'db' in locals():
-            db.close()
+            db.rollback()
+        return jsonify({"error": f"修改去重范围失败: {str(e)}"}), 500
 
 
 @scheduled_tasks_bp.delete('/scheduled-tasks/<int:scheduled_task_id>')
 def delete_scheduled_task(scheduled_task_id: int):
     """删除定时任务"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         scheduled_task = db.query(ScheduledTask).filter(ScheduledTask.id == scheduled_task_id).first()
         
         if not scheduled_task:
@@ -240,16 +274,13 @@ def delete_scheduled_task(scheduled_task_id: int):
         if 'db' in locals():
             db.rollback()
         return jsonify({"error": f"删除定时任务失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @scheduled_tasks_bp.get('/scheduled-tasks/<int:scheduled_task_id>/executions')
 def get_scheduled_task_executions(scheduled_task_id: int):
     """获取定时任务的执行历史"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         executions = db.query(ScheduledExecutionResult).filter(
             ScheduledExecutionResult.scheduled_task_id == scheduled_task_id
         ).order_by(ScheduledExecutionResult.started_at.desc()).all()
@@ -269,16 +300,13 @@ def get_scheduled_task_executions(scheduled_task_id: int):
         return jsonify({"success": True, "executions": result})
     except Exception as e:
         return jsonify({"error": f"获取执行历史失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @scheduled_tasks_bp.get('/scheduled-tasks/executions/<int:execution_id>/videos')
 def get_execution_videos(execution_id: int):
     """获取执行结果的视频列表"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         execution = db.query(ScheduledExecutionResult).filter(
             ScheduledExecutionResult.id == execution_id
         ).first()
@@ -336,9 +364,6 @@ def get_execution_videos(execution_id: int):
         return jsonify({"success": True, "videos": videos})
     except Exception as e:
         return jsonify({"error": f"获取视频列表失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 def _scheduled_task_to_dict(scheduled_task: ScheduledTask) -> dict:
@@ -355,69 +380,14 @@ def _scheduled_task_to_dict(scheduled_task: ScheduledTask) -> dict:
         'schedule_date': scheduled_task.schedule_date,
         'is_active': scheduled_task.is_active,
         'status': 'active' if scheduled_task.is_active else 'inactive',  # 添加status字段以兼容前端
+        'priority': scheduled_task.priority or 'normal',
+        'dedup_scope': scheduled_task.dedup_scope or DEDUP_SCOPE_TASK,
         'next_run': scheduled_task.next_run.isoformat() if scheduled_task.next_run else None,
         'created_at': scheduled_task.created_at.isoformat() if scheduled_task.created_at else None,
         'updated_at': scheduled_task.updated_at.isoformat() if scheduled_task.updated_at else None
     }
 
 
-def _calculate_next_run(scheduled_task: ScheduledTask) -> datetime:
-    """计算下次执行时间"""
-    now = get_east8_time()
-    
-    if scheduled_task.schedule_type == 'interval':
-        return now + timedelta(minutes=scheduled_task.interval_minutes)
-    
-    elif scheduled_task.schedule_type == 'daily':
-        time_parts = scheduled_task.schedule_time.split(':')
-        hour, minute = int(time_parts[0]), int(time_parts[1])
-        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
-        if next_run <= now:
-            next_run += timedelta(days=1)
-        return next_run
-    
-    elif scheduled_task.schedule_type == 'weekly':
-        time_parts = scheduled_task.schedule_time.split(':')
-        hour, minute = int(time_parts[0]), int(time_parts[1])
-        days = [int(d) for d in scheduled_task.schedule_days.split(',')]
-        
-        # 找到下一个执行日期
-        for day_offset in range(1, 8):
-            next_date = now + timedelta(days=day_offset)
-            if next_date.weekday() + 1 in days:  # weekday()返回0-6，我们使用1-7
-                next_run = next_date.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                return next_run
-        
-        # 如果本周没有找到，找下周
-        for day_offset in range(8, 15):
-            next_date = now + timedelta(days=day_offset)
-            if next_date.weekday() + 1 in days:
-                next_run = next_date.replace(hour=hour, minute=minute, second=0, microsecond=0)
-                return next_run
-    
-    elif scheduled_task.schedule_type == 'monthly':
-        time_parts = scheduled_task.schedule_time.split(':')
-        hour, minute = int(time_parts[0]), int(time_parts[1])
-        day = int(scheduled_task.schedule_date)
-        
-        # 计算下个月的同一天
-        if now.month == 12:
-            next_month = now.replace(year=now.year + 1, month=1, day=day, hour=hour, minute=minute, second=0, microsecond=0)
-        else:
-            next_month = now.replace(month=now.month + 1, day=day, hour=hour, minute=minute, second=0, microsecond=0)
-        
-        if next_month <= now:
-            # 如果下个月的同一天已经过去，找再下个月
-            if next_month.month == 12:
-                next_month = next_month.replace(year=next_month.year + 1, month=1)
-            else:
-                next_month = next_month.replace(month=next_month.month + 1)
-        
-        return next_month
-    
-    return now + timedelta(hours=1)  # 默认1小时后
-
-
 @scheduled_tasks_bp.route('/scheduled-tasks/<int:scheduled_task_id>/bind-event', methods=['POST'])
 def bind_event_to_task(scheduled_task_id):
     """绑定事件到定时任务"""
@@ -428,7 +398,7 @@ def bind_event_to_task(scheduled_task_id):
         if not event_id:
             return jsonify({'success': False, 'error': '缺少事件ID'})
         
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         # 检查定时任务是否存在
         scheduled_task = db.query(ScheduledTask).filter_by(id=scheduled_task_id).first()
@@ -468,16 +438,13 @@ def bind_event_to_task(scheduled_task_id):
         if 'db' in locals():
             db.rollback()
         return jsonify({'success': False, 'error': str(e)})
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @scheduled_tasks_bp.route('/scheduled-tasks/<int:scheduled_task_id>/unbind-event', methods=['DELETE'])
 def unbind_event_from_task(scheduled_task_id):
     """从定时任务解绑事件"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         # 查找并删除绑定关系
         from ..models import EventScheduledTask
@@ -496,16 +463,13 @@ def unbind_event_from_task(scheduled_task_id):
         if 'db' in locals():
             db.rollback()
         return jsonify({'success': False, 'error': str(e)})
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @scheduled_tasks_bp.route('/scheduled-tasks/<int:scheduled_task_id>/event-binding', methods=['GET'])
 def get_task_event_binding(scheduled_task_id):
     """获取定时任务的事件绑定信息"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         # 查找绑定关系
         from ..models import Event, EventScheduledTask
@@ -540,16 +504,13 @@ def get_task_event_binding(scheduled_task_id):
         })
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @scheduled_tasks_bp.route('/scheduled-tasks/<int:scheduled_task_id>/execution-history', methods=['GET'])
 def get_task_execution_history(scheduled_task_id):
     """获取定时任务的执行历史"""
     try:
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         print(f"获取定时任务 {scheduled_task_id} 的执行历史")
         
         # 检查定时任务是否存在
@@ -599,9 +560,6 @@ def get_task_execution_history(scheduled_task_id):
         if 'db' in locals():
             db.rollback()
         return jsonify({'success': False, 'error': str(e)})
-    finally:
-        if 'db' in locals():
-            db.close()
 
 
 @scheduled_tasks_bp.post('/scheduled-tasks/ai-generate-keywords')
@@ -614,7 +572,7 @@ def ai_generate_keywords():
         if not event_id:
             return jsonify({"error": "事件ID不能为空"}), 400
         
-        db = db_manager.get_session()
+        db = db_manager.get_scoped_session()
         
         # 获取事件信息
         from ..models import Event
@@ -691,6 +649,3 @@ def ai_generate_keywords():
     except Exception as e:
         print(f"AI关键词生成失败: {str(e)}")
         return jsonify({"error": f"AI关键词生成失败: {str(e)}"}), 500
-    finally:
-        if 'db' in locals():
-            db.close()
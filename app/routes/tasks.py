@@ -47,9 +47,10 @@ def execute_task(task_id: str):
         if not youtube_service.authenticate(credentials):
             return jsonify({"error": "API认证失败"}), 500
 
-        result = youtube_service.search_videos(
+        # max_results 超过单页上限(50)时自动分页获取
+        result = youtube_service.search_videos_deep(
             query=task['query'],
-            max_results=task['max_results'],
+            max_total=task['max_results'],
             published_after=task.get('published_after'),
             published_before=task.get('published_before'),
             region_code=task.get('region_code'),
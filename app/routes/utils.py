@@ -4,6 +4,12 @@ from flask import Blueprint, jsonify
 import requests
 import datetime
 
+from ..services.quota_service import quota_manager
+from ..database import db_manager
+from ..services.translation_memory_service import translation_memory_service
+from ..services.translation_queue_service import translation_queue
+from ..services.rate_limit_service import rate_limit_registry
+from ..services.language_detect_service import language_detect_service
 
 utils_bp = Blueprint('utils', __name__)
 
@@ -66,3 +72,44 @@ def get_languages():
         {"code": "ar", "name": "阿拉伯语"}
     ]
     return jsonify({"success": True, "languages": languages})
+
+
+@utils_bp.get('/quota')
+def get_quota_status():
+    """获取YouTube API今日配额使用情况"""
+    try:
+        return jsonify({"success": True, "quota": quota_manager.get_status()})
+    except Exception as e:
+        return jsonify({"error": f"获取配额状态失败: {str(e)}"}), 500
+
+
+@utils_bp.get('/db/stats')
+def get_db_stats():
+    """获取数据库连接池统计（检出次数、等待时间等）"""
+    try:
+        return jsonify({"success": True, "stats": db_manager.get_pool_stats()})
+    except Exception as e:
+        return jsonify({"error": f"获取数据库统计失败: {str(e)}"}), 500
+
+
+@utils_bp.get('/translation/stats')
+def get_translation_stats():
+    """获取翻译记忆命中统计、本地语言预判跳过比例和翻译任务队列状态"""
+    try:
+        return jsonify({
+            "success": True,
+            "stats": translation_memory_service.get_stats(),
+            "language": language_detect_service.get_stats(),
+            "queue": translation_queue.get_stats()
+        })
+    except Exception as e:
+        return jsonify({"error": f"获取翻译统计失败: {str(e)}"}), 500
+
+
+@utils_bp.get('/rate-limits')
+def get_rate_limit_stats():
+    """获取各外部API的限流与熔断状态"""
+    try:
+        return jsonify({"success": True, "providers": rate_limit_registry.get_stats()})
+    except Exception as e:
+        return jsonify({"error": f"获取限流状态失败: {str(e)}"}), 500
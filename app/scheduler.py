@@ -1,17 +1,28 @@
 # -*- coding: utf-8 -*-
 
 import uuid
+import math
+import heapq
+import calendar
+import itertools
 import threading
 import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional, List
-import schedule
+from typing import Callable, Optional, List
 
+from .config import AppConfig
 from .database import db_manager
-from .models import ScheduledTask, ExecutionResult, ScheduledExecutionResult, Task, VideoInfo, VideoExecutionResult
-from .services.youtube_service import youtube_service
+from .models import ScheduledTask, ExecutionResult, ScheduledExecutionResult, Task, VideoInfo
+from .services.youtube_service import youtube_service, SEARCH_PAGE_SIZE, SEARCH_LIST_COST
+from .services.quota_service import quota_manager, get_next_reset_time, ADMIT_DOWNGRADE, ADMIT_DEFER, ADMIT_SKIP
 from .services.feishu_service import get_feishu_service
 from .utils.auth_utils import global_credential_store
+from .store.video_store import save_search_results
+from .services.translation_queue_service import translation_queue
+from .services.download_queue_service import download_queue
+from .services.crawl_engine import crawl_engine
 
 # 东八区时区
 EAST_8_TZ = timezone(timedelta(hours=8))
@@ -21,13 +32,133 @@ def get_east8_time():
     return datetime.now(EAST_8_TZ)
 
 
+# 调度规则快照，避免在调度线程中持有ORM对象
+ScheduleSpec = namedtuple('ScheduleSpec', [
+    'id', 'schedule_type', 'interval_minutes', 'schedule_time', 'schedule_days', 'schedule_date'
+])
+
+# 堆条目类型：周期任务 / 配额重置后的一次性补执行
+JOB_RECURRING = 'recurring'
+JOB_DEFERRED = 'deferred'
+
+# 停机后错过执行时间的补偿策略
+CATCHUP_SKIP = 'skip'
+CATCHUP_RUN_ONCE = 'run_once'
+CATCHUP_RUN_ALL = 'run_all'
+
+
+def to_east8(dt: Optional[datetime]) -> Optional[datetime]:
+    """将数据库中读出的时间统一为东八区时间（SQLite不保存时区，按东八区解释）"""
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=EAST_8_TZ)
+    return dt.astimezone(EAST_8_TZ)
+
+
+def calculate_next_run(scheduled_task, after: datetime = None) -> Optional[datetime]:
+    """
+    计算下次执行时间
+    
+    Args:
+        scheduled_task: ScheduledTask 或 ScheduleSpec（需包含调度规则字段）
+        after: 基准时间，默认为当前东八区时间；间隔任务返回 after + 间隔，
+               其他类型返回严格晚于 after 的第一个执行时间
+        
+    Returns:
+        datetime: 东八区下次执行时间
+    """
+    now = to_east8(after) if after else get_east8_time()
+    
+    if scheduled_task.schedule_type == 'interval':
+        return now + timedelta(minutes=scheduled_task.interval_minutes)
+    
+    time_parts = (scheduled_task.schedule_time or '00:00').split(':')
+    hour, minute = int(time_parts[0]), int(time_parts[1])
+    
+    if scheduled_task.schedule_type == 'daily':
+        next_run = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return next_run
+    
+    elif scheduled_task.schedule_type == 'weekly':
+        days = [int(d) for d in scheduled_task.schedule_days.split(',') if d.strip()]
+        for day_offset in range(0, 8):
+            next_date = now + timedelta(days=day_offset)
+            if next_date.weekday() + 1 in days:  # weekday()返回0-6，我们使用1-7
+                next_run = next_date.replace(hour=hour, minute=minute, second=0, microsecond=0)
+                if next_run > now:
+                    return next_run
+        return None
+    
+    elif scheduled_task.schedule_type == 'monthly':
+        day = int(scheduled_task.schedule_date)
+        year, month = now.year, now.month
+        for _ in range(13):
+            # 当月天数不足时取当月最后一天
+            last_day = calendar.monthrange(year, month)[1]
+            next_run = now.replace(year=year, month=month, day=min(day, last_day),
+                                   hour=hour, minute=minute, second=0, microsecond=0)
+            if next_run > now:
+                return next_run
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return None
+    
+    return now + timedelta(hours=1)  # 默认1小时后
+
+
+def _spec_from_task(scheduled_task) -> ScheduleSpec:
+    return ScheduleSpec(
+        id=scheduled_task.id,
+        schedule_type=scheduled_task.schedule_type,
+        interval_minutes=scheduled_task.interval_minutes,
+        schedule_time=scheduled_task.schedule_time,
+        schedule_days=scheduled_task.schedule_days,
+        schedule_date=scheduled_task.schedule_date,
+    )
+
+
 class TaskScheduler:
-    """定时任务调度器"""
+    """定时任务调度器
+    
+    以最小堆保存各任务的下次执行时间（与 ScheduledTask.next_run 持久化同步），
+    调度线程休眠到最近的到期时间，到期后把任务提交到有界线程池执行并重新入堆。
+    取消采用惰性删除：只标记条目失效，出堆时跳过。
+    """
     
-    def __init__(self):
+    def __init__(self, max_workers: int = None, catchup_policy: str = None):
         self.running = False
         self.scheduler_thread = None
         self.stop_event = threading.Event()
+        
+        # 调度堆：[到期时间戳, 序号, 任务ID, 条目类型, 是否有效]
+        self._heap = []
+        self._entries = {}  # (任务ID, 条目类型) -> 堆条目
+        self._specs = {}  # 任务ID -> ScheduleSpec
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self.catchup_policy = catchup_policy or AppConfig.SCHEDULER_CATCHUP_POLICY
+        
+        # 到期任务提交到有界线程池执行，调度线程只负责分发
+        self.max_workers = max_workers or AppConfig.SCHEDULER_MAX_WORKERS
+        self.executor = None
+        # 已提交（排队或执行中）的任务ID，保证同一任务不会重叠执行
+        self._active_task_ids = set()
+        self._active_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'skipped_overlap': 0,
+            'queued': 0,
+            'running': 0,
+            'last_schedule_lag_seconds': 0.0,
+            'max_schedule_lag_seconds': 0.0,
+            'last_queue_wait_seconds': 0.0,
+            'max_queue_wait_seconds': 0.0,
+        }
     
     def start(self):
         """启动调度器"""
@@ -36,10 +167,11 @@ class TaskScheduler:
         
         self.running = True
         self.stop_event.clear()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scheduled-task')
         self.scheduler_thread = threading.Thread(target=self._run_scheduler)
         self.scheduler_thread.daemon = True
         self.scheduler_thread.start()
-        print("定时任务调度器已启动")
+        print(f"定时任务调度器已启动，工作线程数: {self.max_workers}")
     
     def stop(self):
         """停止调度器"""
@@ -48,50 +180,284 @@ class TaskScheduler:
         
         self.running = False
         self.stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
         if self.scheduler_thread:
             self.scheduler_thread.join(timeout=5)
+        if self.executor:
+            # 不等待执行中的任务，排队中的任务直接取消
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+        # 被取消的排队任务不会再执行，清理其互斥标记与排队计数
+        with self._active_lock:
+            self._active_task_ids.clear()
+        with self._metrics_lock:
+            self._metrics['queued'] = 0
         print("定时任务调度器已停止")
     
     def _run_scheduler(self):
-        """调度器主循环"""
+        """调度器主循环：休眠到最近的到期时间，而不是每秒轮询"""
         while self.running and not self.stop_event.is_set():
             try:
-                schedule.run_pending()
-                time.sleep(1)
+                with self._cond:
+                    due_entries = self._pop_due_entries(time.time())
+                    if not due_entries:
+                        self._cond.wait(timeout=self._seconds_until_next())
+                        continue
+                for entry in due_entries:
+                    self._dispatch(entry)
             except Exception as e:
                 print(f"调度器运行错误: {e}")
-                time.sleep(5)
+                self.stop_event.wait(5)
     
-    def add_scheduled_task(self, scheduled_task: ScheduledTask):
-        """添加定时任务到调度器"""
+    def _seconds_until_next(self) -> float:
+        """距离最近到期任务的秒数（调用方需持有锁）；最长休眠5分钟以应对系统时间调整"""
+        while self._heap and not self._heap[0][4]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return 300.0
+        return min(300.0, max(0.0, self._heap[0][0] - time.time()))
+    
+    def _pop_due_entries(self, now_ts: float) -> list:
+        """弹出所有已到期的有效条目（调用方需持有锁）"""
+        due = []
+        while self._heap and self._heap[0][0] <= now_ts:
+            entry = heapq.heappop(self._heap)
+            if not entry[4]:
+                continue
+            self._entries.pop((entry[2], entry[3]), None)
+            due.append(entry)
+        return due
+    
+    def _push(self, scheduled_task_id: int, due: datetime, kind: str = JOB_RECURRING):
+        """将任务的下次执行时间压入堆，同类型的旧条目被替换"""
+        with self._cond:
+            old = self._entries.pop((scheduled_task_id, kind), None)
+            if old:
+                old[4] = False
+            entry = [due.timestamp(), next(self._counter), scheduled_task_id, kind, True]
+            self._entries[(scheduled_task_id, kind)] = entry
+            heapq.heappush(self._heap, entry)
+            # 新条目可能早于当前等待的到期时间，唤醒调度线程重新计算休眠时长
+            self._cond.notify()
+    
+    def _cancel(self, scheduled_task_id: int) -> int:
+        """取消任务的所有堆条目，返回取消的条目数"""
+        cancelled = 0
+        with self._cond:
+            for kind in (JOB_RECURRING, JOB_DEFERRED):
+                entry = self._entries.pop((scheduled_task_id, kind), None)
+                if entry:
+                    entry[4] = False
+                    cancelled += 1
+            self._specs.pop(scheduled_task_id, None)
+            # 失效条目过多时压缩堆
+            if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+                self._heap = [e for e in self._heap if e[4]]
+                heapq.heapify(self._heap)
+            self._cond.notify()
+        return cancelled
+    
+    def _dispatch(self, entry: list):
+        """分发到期条目：提交执行，周期任务计算并持久化下次执行时间"""
+        due_ts, _, scheduled_task_id, kind, _ = entry
+        lag = max(0.0, time.time() - due_ts)
+        with self._metrics_lock:
+            self._metrics['last_schedule_lag_seconds'] = lag
+            self._metrics['max_schedule_lag_seconds'] = max(self._metrics['max_schedule_lag_seconds'], lag)
+        
+        if kind == JOB_DEFERRED:
+            # 先清除持久化的补执行时间，本次执行再次延后时会重新写入
+            self._persist_schedule(scheduled_task_id, deferred_run=None)
+        self.submit_scheduled_task(scheduled_task_id, check_active=True)
+        
+        if kind != JOB_RECURRING:
+            return
+        spec = self._specs.get(scheduled_task_id)
+        if not spec:
+            return
+        due = datetime.fromtimestamp(due_ts, EAST_8_TZ)
+        next_run = self._next_after(spec, due, get_east8_time())
+        if next_run:
+            self._push(scheduled_task_id, next_run)
+            self._persist_schedule(scheduled_task_id, next_run=next_run)
+    
+    def _next_after(self, spec: ScheduleSpec, due: datetime, now: datetime) -> Optional[datetime]:
+        """以上次计划时间为锚点计算下次执行时间，避免间隔任务累积漂移"""
+        next_run = calculate_next_run(spec, after=due)
+        if next_run and next_run <= now:
+            next_run = calculate_next_run(spec, after=now)
+        return next_run
+    
+    def _persist_schedule(self, scheduled_task_id: int, **values):
+        """将下次执行时间（next_run）或补执行时间（deferred_run）写回数据库"""
+        try:
+            with db_manager.session_scope() as db:
+                values = {getattr(ScheduledTask, column): value for column, value in values.items()}
+                values[ScheduledTask.updated_at] = ScheduledTask.updated_at
+                db.query(ScheduledTask).filter(ScheduledTask.id == scheduled_task_id).update(
+                    values, synchronize_session=False
+                )
+        except Exception as e:
+            print(f"保存定时任务 {scheduled_task_id} 调度时间失败: {e}")
+    
+    def submit_scheduled_task(self, scheduled_task_id: int, check_active: bool = False, runs: int = 1) -> bool:
+        """
+        将到期的定时任务提交到线程池
+        
+        Args:
+            scheduled_task_id: 定时任务ID
+            check_active: 执行前是否检查任务仍处于启用状态
+            runs: 连续执行次数（补偿策略 run_all 时大于1）
+            
+        Returns:
+            bool: 是否成功提交（同一任务仍在排队或执行时返回False）
+        """
+        with self._active_lock:
+            if scheduled_task_id in self._active_task_ids:
+                with self._metrics_lock:
+                    self._metrics['skipped_overlap'] += 1
+                print(f"定时任务 {scheduled_task_id} 上一次执行尚未结束，跳过本次触发")
+                return False
+            self._active_task_ids.add(scheduled_task_id)
+        
+        if self.executor is None:
+            # 调度器未启动（如手动触发），直接在当前线程执行
+            try:
+                self._run_task(scheduled_task_id, check_active, runs)
+            finally:
+                db_manager.remove_scoped_session()
+                with self._active_lock:
+                    self._active_task_ids.discard(scheduled_task_id)
+            return True
+        
+        with self._metrics_lock:
+            self._metrics['submitted'] += 1
+            self._metrics['queued'] += 1
+        self.executor.submit(self._run_pooled_task, scheduled_task_id, check_active, runs, time.monotonic())
+        return True
+    
+    def submit_background(self, fn: Callable, *args) -> bool:
+        """
+        将请求完成后的后处理工作（如补全视频统计信息）提交到线程池，不阻塞请求线程
+        
+        Returns:
+            bool: 是否提交到线程池（调度器未启动时在当前线程执行并返回False）
+        """
+        executor = self.executor
+        if executor is not None:
+            try:
+                executor.submit(self._run_background, fn, *args)
+                return True
+            except RuntimeError:
+                # 线程池已关闭（调度器正在停止）
+                pass
+        self._run_background(fn, *args)
+        return False
+    
+    def _run_background(self, fn: Callable, *args):
+        """线程池中的后处理入口，异常只记录不向外抛出"""
         try:
-            # 先检查是否已经存在相同ID的任务，如果存在则先移除
-            self.remove_scheduled_task(scheduled_task.id)
+            fn(*args)
+        except Exception as e:
+            print(f"后台任务 {getattr(fn, '__name__', fn)} 执行出错: {e}")
+        finally:
+            db_manager.remove_scoped_session()
+    
+    def _run_pooled_task(self, scheduled_task_id: int, check_active: bool, runs: int, submitted_at: float):
+        """线程池中的任务入口，负责指标统计与互斥标记的释放"""
+        wait = time.monotonic() - submitted_at
+        with self._metrics_lock:
+            self._metrics['queued'] -= 1
+            self._metrics['running'] += 1
+            self._metrics['last_queue_wait_seconds'] = wait
+            self._metrics['max_queue_wait_seconds'] = max(self._metrics['max_queue_wait_seconds'], wait)
+        failed = False
+        try:
+            self._run_task(scheduled_task_id, check_active, runs)
+        except Exception as e:
+            failed = True
+            print(f"定时任务 {scheduled_task_id} 在工作线程中执行出错: {e}")
+        finally:
+            # 工作线程会被复用，任务结束时释放该线程绑定的数据库会话
+            db_manager.remove_scoped_session()
+            with self._active_lock:
+                self._active_task_ids.discard(scheduled_task_id)
+            with self._metrics_lock:
+                self._metrics['running'] -= 1
+                self._metrics['failed' if failed else 'completed'] += 1
+    
+    def _run_task(self, scheduled_task_id: int, check_active: bool, runs: int = 1):
+        """执行任务，可选地先检查任务是否仍处于启用状态"""
+        if check_active:
+            db = None
+            try:
+                db = db_manager.get_scoped_session()
+                task_check = db.query(ScheduledTask).filter(ScheduledTask.id == scheduled_task_id).first()
+                if not task_check:
+                    print(f"定时任务 {scheduled_task_id} 查询失败")
+                    return
+                is_active = task_check.is_active
+            finally:
+                # 检查完成后立即释放会话，避免执行期间长时间占用
+                if db:
+                    db.close()
             
-            if scheduled_task.schedule_type == 'interval':
-                self._schedule_interval_task(scheduled_task)
-            elif scheduled_task.schedule_type == 'daily':
-                self._schedule_daily_task(scheduled_task)
-            elif scheduled_task.schedule_type == 'weekly':
-                self._schedule_weekly_task(scheduled_task)
-            elif scheduled_task.schedule_type == 'monthly':
-                self._schedule_monthly_task(scheduled_task)
+            if not is_active:
+                print(f"定时任务 {scheduled_task_id} 已被禁用，跳过执行")
+                # 任务被禁用时，从调度器中移除
+                self.remove_scheduled_task(scheduled_task_id)
+                return
+        
+        for _ in range(max(1, runs)):
+            self.execute_scheduled_task(scheduled_task_id)
+    
+    def get_metrics(self) -> dict:
+        """获取调度器运行指标（队列深度、执行中数量、调度延迟等）"""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        metrics['queue_depth'] = metrics.pop('queued')
+        metrics['max_workers'] = self.max_workers
+        with self._cond:
+            metrics['scheduled_jobs'] = len(self._entries)
+            next_ts = min((e[0] for e in self._entries.values()), default=None)
+        metrics['next_due'] = datetime.fromtimestamp(next_ts, EAST_8_TZ).isoformat() if next_ts else None
+        metrics['catchup_policy'] = self.catchup_policy
+        metrics['running_scheduler'] = self.running
+        return metrics
+    
+    def add_scheduled_task(self, scheduled_task: ScheduledTask):
+        """添加定时任务到调度器（已存在则替换）"""
+        try:
+            spec = _spec_from_task(scheduled_task)
+            next_run = to_east8(scheduled_task.next_run)
+            if not next_run or next_run <= get_east8_time():
+                next_run = calculate_next_run(spec)
+            if not next_run:
+                print(f"定时任务 {scheduled_task.id} 无法计算下次执行时间，未加入调度器")
+                return
             
-            print(f"定时任务已添加到调度器: {scheduled_task.id}")
+            with self._cond:
+                self._specs[spec.id] = spec
+            self._push(spec.id, next_run)
+            print(f"定时任务已添加到调度器: {scheduled_task.id}，下次执行: {next_run.isoformat()}")
         except Exception as e:
             print(f"添加定时任务到调度器失败: {e}")
     
     def get_scheduled_jobs(self):
-        """获取当前调度器中的所有任务"""
+        """获取当前调度器中的所有任务（按下次执行时间排序）"""
+        with self._cond:
+            entries = sorted(self._entries.values())
+            specs = dict(self._specs)
         jobs_info = []
-        for job in schedule.jobs:
-            job_info = {
-                'tags': getattr(job, 'tags', []),
-                'next_run': getattr(job, 'next_run', None),
-                'interval': getattr(job, 'interval', None),
-                'unit': getattr(job, 'unit', None)
-            }
-            jobs_info.append(job_info)
+        for due_ts, _, scheduled_task_id, kind, _ in entries:
+            spec = specs.get(scheduled_task_id)
+            jobs_info.append({
+                'scheduled_task_id': scheduled_task_id,
+                'kind': kind,
+                'schedule_type': spec.schedule_type if spec else None,
+                'next_run': datetime.fromtimestamp(due_ts, EAST_8_TZ),
+            })
         return jobs_info
     
     def print_scheduled_jobs(self):
@@ -99,118 +465,25 @@ class TaskScheduler:
         jobs = self.get_scheduled_jobs()
         print(f"当前调度器中有 {len(jobs)} 个任务:")
         for i, job in enumerate(jobs):
-            print(f"  任务 {i+1}: 标签={job['tags']}, 下次运行={job['next_run']}, 间隔={job['interval']} {job['unit']}")
+            print(f"  任务 {i+1}: ID={job['scheduled_task_id']}, 类型={job['schedule_type']}({job['kind']}), 下次运行={job['next_run']}")
     
     def remove_scheduled_task(self, scheduled_task_id: int):
         """从调度器移除定时任务"""
         try:
-            print(f"移除定时任务前，调度器状态:")
-            self.print_scheduled_jobs()
-            
-            # 清除所有带有该标签的任务
-            schedule.clear(scheduled_task_id)
-            
-            # 额外检查：清除所有可能相关的任务
-            # 由于schedule库的限制，我们需要手动检查并清除
-            jobs_to_remove = []
-            for job in schedule.jobs:
-                if hasattr(job, 'tags') and scheduled_task_id in job.tags:
-                    jobs_to_remove.append(job)
-            
-            for job in jobs_to_remove:
-                schedule.jobs.remove(job)
-            
-            print(f"移除定时任务后，调度器状态:")
-            self.print_scheduled_jobs()
-            print(f"定时任务已从调度器移除: {scheduled_task_id}")
+            if self._cancel(scheduled_task_id):
+                print(f"定时任务已从调度器移除: {scheduled_task_id}")
         except Exception as e:
             print(f"从调度器移除定时任务失败: {e}")
     
-    def _schedule_interval_task(self, scheduled_task: ScheduledTask):
-        """调度间隔任务"""
-        def job():
-            # 在执行前检查任务状态
-            db = None
-            try:
-                print(f"检查定时任务 {scheduled_task.id} 状态")
-                db = db_manager.get_session()
-                print(f"定时任务 {scheduled_task.id} 获取数据库会话成功")
-                
-                task_check = db.query(ScheduledTask).filter(ScheduledTask.id == scheduled_task.id).first()
-                if task_check:
-                    print(f"定时任务 {scheduled_task.id} 当前状态: is_active = {task_check.is_active}")
-                    if task_check.is_active:
-                        print(f"定时任务 {scheduled_task.id} 状态正常，开始执行")
-                        self.execute_scheduled_task(scheduled_task.id)
-                        # 注意：不需要重新调度，schedule库会自动重复执行
-                        print(f"定时任务 {scheduled_task.id} 执行完成，等待下次调度")
-                    else:
-                        print(f"定时任务 {scheduled_task.id} 已被禁用，跳过执行")
-                        # 任务被禁用时，从调度器中移除
-                        self.remove_scheduled_task(scheduled_task.id)
-                else:
-                    print(f"定时任务 {scheduled_task.id} 查询失败")
-            except Exception as e:
-                print(f"检查定时任务状态时出错: {e}")
-            finally:
-                # 确保数据库会话被正确关闭
-                if db:
-                    try:
-                        db.close()
-                        print(f"定时任务 {scheduled_task.id} 状态检查会话已关闭")
-                    except Exception as close_error:
-                        print(f"关闭数据库会话时出错: {close_error}")
-        
-        # 使用schedule库的重复执行功能，不需要手动重新调度
-        schedule.every(scheduled_task.interval_minutes).minutes.do(job).tag(scheduled_task.id)
-        print(f"定时任务 {scheduled_task.id} 已调度，间隔: {scheduled_task.interval_minutes} 分钟")
-    
-    def _schedule_daily_task(self, scheduled_task: ScheduledTask):
-        """调度每日任务"""
-        def job():
-            self.execute_scheduled_task(scheduled_task.id)
-        
-        schedule.every().day.at(scheduled_task.schedule_time).do(job).tag(scheduled_task.id)
-    
-    def _schedule_weekly_task(self, scheduled_task: ScheduledTask):
-        """调度每周任务"""
-        def job():
-            self.execute_scheduled_task(scheduled_task.id)
-        
-        days = [int(d) for d in scheduled_task.schedule_days.split(',')]
-        for day in days:
-            if day == 1:
-                schedule.every().monday.at(scheduled_task.schedule_time).do(job).tag(scheduled_task.id)
-            elif day == 2:
-                schedule.every().tuesday.at(scheduled_task.schedule_time).do(job).tag(scheduled_task.id)
-            elif day == 3:
-                schedule.every().wednesday.at(scheduled_task.schedule_time).do(job).tag(scheduled_task.id)
-            elif day == 4:
-                schedule.every().thursday.at(scheduled_task.schedule_time).do(job).tag(scheduled_task.id)
-            elif day == 5:
-                schedule.every().friday.at(scheduled_task.schedule_time).do(job).tag(scheduled_task.id)
-            elif day == 6:
-                schedule.every().saturday.at(scheduled_task.schedule_time).do(job).tag(scheduled_task.id)
-            elif day == 7:
-                schedule.every().sunday.at(scheduled_task.schedule_time).do(job).tag(scheduled_task.id)
-    
-    def _schedule_monthly_task(self, scheduled_task: ScheduledTask):
-        """调度每月任务"""
-        def job():
-            self.execute_scheduled_task(scheduled_task.id)
-        
-        # 每月指定日期执行
-        schedule.every().month.at(scheduled_task.schedule_time).do(job).tag(scheduled_task.id)
-    
     def execute_scheduled_task(self, scheduled_task_id: int):
         """执行定时任务"""
         db = None
         execution_result = None
         
         try:
-            # 为每个任务执行创建新的数据库会话
-            db = db_manager.get_session()
-            print(f"定时任务 {scheduled_task_id} 创建新数据库会话")
+            # 使用当前工作线程绑定的会话，任务结束时由 _run_pooled_task 释放
+            db = db_manager.get_scoped_session()
+            print(f"定时任务 {scheduled_task_id} 获取任务数据库会话")
             
             # 重新查询定时任务，确保在当前会话中
             scheduled_task = db.query(ScheduledTask).filter_by(id=scheduled_task_id).first()
@@ -290,6 +563,32 @@ class TaskScheduler:
                 print(f"定时任务 {scheduled_task_id} 认证失败: {error_msg}")
                 return
             
+            # 配额准入：根据剩余配额和任务优先级决定正常执行、降级、延后或跳过
+            max_total = search_task.max_results or AppConfig.YT_SEARCH_MAX_TOTAL
+            requested_pages = min(
+                math.ceil(max_total / SEARCH_PAGE_SIZE),
+                max(1, AppConfig.YT_SEARCH_QUOTA_BUDGET // SEARCH_LIST_COST)
+            )
+            decision, allowed_pages = quota_manager.admit(scheduled_task.priority, requested_pages)
+            if decision in (ADMIT_DEFER, ADMIT_SKIP):
+                if decision == ADMIT_DEFER:
+                    self._defer_until_quota_reset(db, scheduled_task_id)
+                    error_msg = f"YouTube API配额不足，任务已延后至配额重置后执行（剩余 {quota_manager.remaining()}）"
+                else:
+                    error_msg = f"YouTube API配额不足，低优先级任务本次跳过（剩余 {quota_manager.remaining()}）"
+                execution_result.status = 'deferred' if decision == ADMIT_DEFER else 'skipped'
+                execution_result.completed_at = get_east8_time()
+                execution_result.error_message = error_msg
+                execution_result.result_data = None
+                execution_result.videos_count = 0
+                db.commit()
+                print(f"定时任务 {scheduled_task_id} {error_msg}")
+                return
+            quota_budget = allowed_pages * SEARCH_LIST_COST
+            if decision == ADMIT_DOWNGRADE:
+                max_total = min(max_total, allowed_pages * SEARCH_PAGE_SIZE)
+                print(f"定时任务 {scheduled_task_id} 配额紧张，降级为最多 {allowed_pages} 页")
+            
             print(f"定时任务 {scheduled_task_id} 认证成功，开始执行搜索...")
             print(f"定时任务 {scheduled_task_id} 搜索参数:")
             print(f"  关键词: {search_task.query}")
@@ -301,10 +600,13 @@ class TaskScheduler:
             print(f"  视频质量: {search_task.video_definition}")
             print(f"  视频类型: {search_task.video_type}")
             
-            # 执行搜索
-            result = youtube_service.search_videos(
+            # 逐页搜索、过滤、保存：每页的新视频、已见台账和翻译任务在一个事务中提交，
+            # 不在内存中合并全部结果；整页都是已见过的视频时提前停止，避免无效的深度翻页
+            from .services.content_filter_service import content_filter_service
+            pages = youtube_service.iter_search_pages(
                 query=search_task.query,
-                max_results=search_task.max_results,
+                max_total=max_total,
+                quota_budget=quota_budget,
                 published_after=search_task.published_after,
                 published_before=search_task.published_before,
                 region_code=search_task.region_code,
@@ -316,132 +618,97 @@ class TaskScheduler:
                 order_by=search_task.order_by,  # 新增：排序方式
             )
             
-            if result.get('success'):
-                # 搜索成功，更新执行结果
+            search_error = None
+            pages_fetched = 0
+            total_count = 0
+            summary = None
+            video_pks = []
+            new_video_ids = []
+            for page_result in pages:
+                if not page_result.get('success'):
+                    search_error = page_result.get('error', '未知错误')
+                    break
+                pages_fetched = page_result['page']
+                data = page_result['data']
+                items = data.get('items', [])
+                total_count += len(items)
+                if summary is None:
+                    summary = {key: value for key, value in data.items() if key != 'items'}
+                
+                new_videos, _ = content_filter_service.filter_new_videos(scheduled_task_id, data)
+                if not new_videos:
+                    if items:
+                        print(f"第 {pages_fetched} 页视频均已见过，提前停止分页搜索")
+                    break
+                
+                try:
+                    page_pks, inserted_ids = save_search_results(
+                        db,
+                        new_videos,
+                        scheduled_execution_result_id=execution_result.id,
+                        first_seen_task_id=search_task.id,
+                        first_seen_scheduled_task_id=scheduled_task_id,
+                        rank_offset=len(video_pks)
+                    )
+                    page_video_ids = [v.get('id', {}).get('videoId') for v in new_videos]
+                    content_filter_service.record_seen_videos(db, scheduled_task_id, page_video_ids)
+                    # 翻译任务与视频同一事务写入，由翻译队列在后台处理
+                    translation_queue.enqueue(db, page_pks)
+                    execution_result.videos_count = len(new_video_ids) + len(new_videos)
+                    db.commit()
+                    translation_queue.notify()
+                    video_pks.extend(page_pks)
+                    new_video_ids.extend(vid for vid in page_video_ids if vid)
+                    print(f"定时任务 {scheduled_task_id} 第 {pages_fetched} 页保存视频 {len(page_pks)} 个，"
+                          f"其中全局新视频 {len(inserted_ids)} 个")
+                except Exception as save_error:
+                    print(f"批量保存第 {pages_fetched} 页视频信息失败: {save_error}")
+                    db.rollback()
+            
+            if pages_fetched:
+                if search_error:
+                    # 已保存的页面仍然有效，保留部分结果
+                    print(f"分页搜索在第 {pages_fetched + 1} 页失败: {search_error}")
+                # 搜索成功，更新执行结果（视频已逐页保存，结果中只记录分页信息）
+                summary['pagesFetched'] = pages_fetched
+                summary['itemsFetched'] = total_count
                 execution_result.status = 'success'
                 execution_result.completed_at = get_east8_time()
                 execution_result.error_message = None
-                execution_result.result_data = result['data']
-                execution_result.videos_count = result['data'].get('pageInfo', {}).get('totalResults', 0)
-                
-                # 使用内容过滤服务过滤新视频
-                from .services.content_filter_service import content_filter_service
-                new_videos, all_videos = content_filter_service.filter_new_videos(scheduled_task_id, result['data'])
-                
-                # 更新执行结果，记录新视频数量
-                execution_result.videos_count = len(new_videos)
-                
-                # 保存视频信息（只保存新视频）
-                if new_videos:
-                    for i, video_data in enumerate(new_videos):
-                        try:
-                            # 保存视频基本信息
-                            video_id = video_data.get('id', {}).get('videoId')
-                            if not video_id:
-                                continue
-                            
-                            # 检查视频是否已存在
-                            existing_video = db.query(VideoInfo).filter_by(video_id=video_id).first()
-                            if existing_video:
-                                video_info = existing_video
-                            else:
-                                # 创建新的视频信息
-                                snippet = video_data.get('snippet', {})
-                                statistics = video_data.get('statistics', {})
-                                
-                                video_info = VideoInfo(
-                                    video_id=video_id,
-                                    title=snippet.get('title'),
-                                    description=snippet.get('description'),
-                                    channel_title=snippet.get('channelTitle'),
-                                    channel_id=snippet.get('channelId'),
-                                    published_at=datetime.fromisoformat(snippet.get('publishedAt').replace('Z', '+00:00')).replace(tzinfo=EAST_8_TZ) if snippet.get('publishedAt') else None,
-                                    thumbnails=snippet.get('thumbnails'),
-                                    duration=snippet.get('duration'),
-                                    view_count=int(statistics.get('viewCount', 0)) if statistics.get('viewCount') else 0,
-                                    like_count=int(statistics.get('likeCount', 0)) if statistics.get('likeCount') else 0,
-                                    comment_count=int(statistics.get('commentCount', 0)) if statistics.get('commentCount') else 0,
-                                    tags=snippet.get('tags'),
-                                    category_id=snippet.get('categoryId'),
-                                    default_language=snippet.get('defaultLanguage'),
-                                    default_audio_language=snippet.get('defaultAudioLanguage')
-                                )
-                                db.add(video_info)
-                                db.flush()  # 确保ID被分配
-                            
-                            # 尝试翻译视频标题和描述
-                            try:
-                                from .services.translate_service import get_translate_service
-                                translate_service = get_translate_service()
-                                if translate_service:
-                                    # 翻译标题
-                                    if video_info.title:
-                                        translated_title = translate_service.translate_text(video_info.title)
-                                        if translated_title:
-                                            video_info.translated_title = translated_title
-                                            print(f"标题翻译: '{video_info.title}' -> '{translated_title}'")
-                                    
-                                    # 翻译描述
-                                    if video_info.description:
-                                        translated_description = translate_service.translate_text(video_info.description)
-                                        if translated_description:
-                                            video_info.translated_description = translated_description
-                                            print(f"描述翻译: '{video_info.description[:50]}...' -> '{translated_description[:50]}...'")
-                                    
-                                    # 更新翻译时间
-                                    if translated_title or translated_description:
-                                        video_info.translation_updated_at = get_east8_time()
-                            except Exception as translate_error:
-                                print(f"翻译视频信息时出错: {translate_error}")
-                            
-                            # 创建视频执行结果关联
-                            video_execution = VideoExecutionResult(
-                                video_id=video_info.id,
-                                scheduled_execution_result_id=execution_result.id,
-                                rank=i + 1
-                            )
-                            db.add(video_execution)
-                            
-                            # 提交当前视频的更改
-                            try:
-                                db.commit()
-                            except Exception as commit_error:
-                                print(f"提交视频信息失败: {commit_error}")
-                                db.rollback()
-                                continue
-                        except Exception as video_error:
-                            print(f"保存视频信息失败: {video_error}")
-                            continue
-                
-                # 提交所有更改
+                execution_result.result_data = summary
+                execution_result.videos_count = len(new_video_ids)
                 db.commit()
-                print(f"定时任务 {scheduled_task_id} 执行完成，保存了 {len(new_videos)} 个新视频")
+                print(f"定时任务 {scheduled_task_id} 执行完成，共 {pages_fetched} 页，保存了 {len(new_video_ids)} 个新视频")
+                
+                # 批量补全新视频的统计数据和时长（videos.list，每50个ID消耗1配额）
+                if new_video_ids:
+                    try:
+                        from .services.video_enrichment_service import video_enrichment_service
+                        video_enrichment_service.enrich_videos(new_video_ids)
+                    except Exception as enrich_error:
+                        print(f"补全视频统计信息失败: {enrich_error}")
                 
                 # 发送飞书通知（只推送新内容）
-                if new_videos:
+                if video_pks:
                     try:
                         from .services.feishu_service import get_feishu_service
                         feishu_service = get_feishu_service()
                         if feishu_service:
-                            # 将新视频数据转换为VideoInfo对象列表
-                            new_video_objects = []
-                            for video_data in new_videos:
-                                video_id = video_data.get('id', {}).get('videoId')
-                                if video_id:
-                                    # 查询数据库中的视频信息
-                                    video_info = db.query(VideoInfo).filter_by(video_id=video_id).first()
-                                    if video_info:
-                                        new_video_objects.append(video_info)
-                            
+                            # 通知中包含译文，短暂等待后台翻译完成（超时则推送已有内容）
+                            if not translation_queue.wait_for(video_pks, AppConfig.TRANSLATION_NOTIFY_WAIT_SECONDS):
+                                print(f"定时任务 {scheduled_task_id} 翻译未全部完成，部分视频将不带译文推送")
+                            # 一次查询取回本次保存的视频，按排名顺序用于推送
+                            videos_by_pk = {v.id: v for v in db.query(VideoInfo).filter(VideoInfo.id.in_(video_pks)).all()}
+                            new_video_objects = [videos_by_pk[pk] for pk in video_pks if pk in videos_by_pk]
                             if new_video_objects:
                                 feishu_service.send_task_execution_result(
                                     task_name=search_task.query,
                                     videos=new_video_objects,
                                     execution_time=execution_result.completed_at.strftime('%Y-%m-%d %H:%M:%S'),
-                                    total_count=len(all_videos),
-                                    new_count=len(new_videos)
+                                    total_count=total_count,
+                                    new_count=len(new_video_ids)
                                 )
-                                print(f"飞书通知发送成功，推送了 {len(new_videos)} 个新视频")
+                                print(f"飞书通知发送成功，推送了 {len(new_video_objects)} 个新视频")
                     except Exception as feishu_error:
                         print(f"发送飞书通知失败: {feishu_error}")
                 else:
@@ -449,7 +716,7 @@ class TaskScheduler:
                 
             else:
                 # 搜索失败
-                error_msg = result.get('error', '未知错误')
+                error_msg = search_error or '搜索失败，未获取到任何结果'
                 execution_result.status = 'failed'
                 execution_result.completed_at = get_east8_time()
                 execution_result.error_message = error_msg
@@ -484,33 +751,82 @@ class TaskScheduler:
         
         print(f"定时任务执行完成: {scheduled_task_id}")
     
+    def _defer_until_quota_reset(self, db, scheduled_task_id: int):
+        """配额不足时，在太平洋时间零点配额重置后补执行一次（补执行时间随调用方的事务持久化，重启后恢复）"""
+        run_at = (get_next_reset_time() + timedelta(minutes=1)).astimezone(EAST_8_TZ)
+        db.query(ScheduledTask).filter(ScheduledTask.id == scheduled_task_id).update(
+            {ScheduledTask.deferred_run: run_at, ScheduledTask.updated_at: ScheduledTask.updated_at},
+            synchronize_session=False
+        )
+        self._push(scheduled_task_id, run_at, kind=JOB_DEFERRED)
+        print(f"定时任务 {scheduled_task_id} 将在配额重置后补执行: {run_at.isoformat()}")
+    
     def load_existing_tasks(self):
-        """加载数据库中已存在的定时任务"""
+        """加载数据库中已存在的定时任务，并按补偿策略处理停机期间错过的执行"""
         db = None
         try:
             print("开始加载已存在的定时任务")
             db = db_manager.get_session()
-            print("获取数据库会话成功")
             
             existing_tasks = db.query(ScheduledTask).filter(ScheduledTask.is_active == True).all()
-            print(f"找到 {len(existing_tasks)} 个启用的定时任务")
+            print(f"找到 {len(existing_tasks)} 个启用的定时任务，补偿策略: {self.catchup_policy}")
             
+            now = get_east8_time()
             for task in existing_tasks:
-                print(f"加载定时任务: {task.id}, 类型: {task.schedule_type}")
-                self.add_scheduled_task(task)
+                spec = _spec_from_task(task)
+                next_run = to_east8(task.next_run)
+                if next_run and next_run <= now:
+                    missed = self._count_missed_runs(spec, next_run, now)
+                    if self.catchup_policy == CATCHUP_RUN_ONCE:
+                        self.submit_scheduled_task(task.id, check_active=True)
+                    elif self.catchup_policy == CATCHUP_RUN_ALL:
+                        self.submit_scheduled_task(task.id, check_active=True, runs=missed)
+                    print(f"定时任务 {task.id} 停机期间错过 {missed} 次执行，按策略 {self.catchup_policy} 处理")
+                    next_run = self._next_after(spec, next_run, now)
+                elif not next_run:
+                    next_run = calculate_next_run(spec, after=now)
+                
+                # 恢复配额不足延后的补执行；已过期的在调度线程启动后立即执行
+                deferred_run = to_east8(task.deferred_run)
+                if deferred_run:
+                    self._push(spec.id, deferred_run, kind=JOB_DEFERRED)
+                    print(f"定时任务 {task.id} 恢复配额重置后的补执行: {deferred_run.isoformat()}")
+                
+                if not next_run:
+                    continue
+                if next_run != to_east8(task.next_run):
+                    db.query(ScheduledTask).filter(ScheduledTask.id == task.id).update(
+                        {ScheduledTask.next_run: next_run, ScheduledTask.updated_at: ScheduledTask.updated_at},
+                        synchronize_session=False
+                    )
+                with self._cond:
+                    self._specs[spec.id] = spec
+                self._push(spec.id, next_run)
             
+            db.commit()
             print(f"已加载 {len(existing_tasks)} 个定时任务")
         except Exception as e:
+            if db:
+                db.rollback()
             print(f"加载定时任务失败: {e}")
         finally:
             # 确保数据库会话被正确关闭
             if db:
                 try:
                     db.close()
-                    print("加载定时任务会话已关闭")
                 except Exception as close_error:
                     print(f"关闭数据库会话时出错: {close_error}")
 
+    def _count_missed_runs(self, spec: ScheduleSpec, first_missed: datetime, now: datetime) -> int:
+        """统计从 first_missed 到 now 之间错过的执行次数（上限为 SCHEDULER_CATCHUP_MAX_RUNS）"""
+        limit = AppConfig.SCHEDULER_CATCHUP_MAX_RUNS
+        count = 0
+        occurrence = first_missed
+        while occurrence and occurrence <= now and count < limit:
+            count += 1
+            occurrence = calculate_next_run(spec, after=occurrence)
+        return max(1, count)
+
     def check_scheduled_task_status(self):
         """检查定时任务状态"""
         db = None
@@ -558,11 +874,16 @@ task_scheduler = TaskScheduler()
 
 
 def start_scheduler():
-    """启动定时任务调度器"""
+    """启动定时任务调度器、翻译任务队列和下载任务队列"""
+    translation_queue.start()
+    download_queue.start()
     task_scheduler.start()
     task_scheduler.load_existing_tasks()
 
 
 def stop_scheduler():
-    """停止定时任务调度器"""
+    """停止定时任务调度器、翻译任务队列、下载任务队列和爬取引擎"""
     task_scheduler.stop()
+    translation_queue.stop()
+    download_queue.stop()
+    crawl_engine.stop()
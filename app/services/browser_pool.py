@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+crawl4ai 浏览器池
+在爬取引擎的事件循环中维护少量长期运行的 AsyncWebCrawler 实例，按页面数限制每个实例的并发渲染，
+避免每次爬取都启动新的无头浏览器；实例渲染一定次数后或出错后不再分配新页面，
+正在渲染的页面全部结束后关闭，下次使用时重建
+"""
+
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import Dict, Any
+
+from ..config import AppConfig
+
+try:
+    from crawl4ai import AsyncWebCrawler
+    CRAWL4AI_AVAILABLE = True
+except ImportError:
+    AsyncWebCrawler = None
+    CRAWL4AI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class _BrowserSlot:
+    """池中的一个浏览器实例"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.crawler = None
+        self.in_use = 0
+        self.renders = 0
+        self.broken = False
+        self.lock = None
+
+
+class BrowserPool:
+    """crawl4ai 浏览器池（所有方法须在同一个事件循环中调用）"""
+
+    def __init__(self, size: int = None, max_pages: int = None, max_renders: int = None):
+        self.size = size or AppConfig.CRAWL_BROWSER_POOL_SIZE
+        self.max_pages = max_pages or AppConfig.CRAWL_BROWSER_MAX_PAGES
+        self.max_renders = max_renders or AppConfig.CRAWL_BROWSER_MAX_RENDERS
+        self._slots = [_BrowserSlot(i) for i in range(self.size)]
+        self._cond = None
+        self._closed = False
+        self._metrics_lock = threading.Lock()
+        self._metrics = {'renders': 0, 'browser_starts': 0, 'browser_restarts': 0, 'errors': 0}
+
+    def _count(self, name: str, amount=1):
+        with self._metrics_lock:
+            self._metrics[name] += amount
+
+    def _needs_recycle(self, slot: _BrowserSlot) -> bool:
+        """实例出错或渲染次数达到上限，需要在空闲后重建"""
+        return slot.crawler is not None and (slot.broken or slot.renders >= self.max_renders)
+
+    def _condition(self) -> asyncio.Condition:
+        # 延迟创建，保证绑定到爬取引擎的事件循环
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    async def _pick_slot(self) -> _BrowserSlot:
+        """
+        等待一个还有空闲页面名额的实例，优先选择已启动且负载最低的
+
+        需要重建的实例在还有页面渲染时不再分配新页面，空闲后才可被选中（选中后重建）
+        """
+        cond = self._condition()
+        async with cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("浏览器池已关闭")
+                candidates = [slot for slot in self._slots if slot.in_use < self.max_pages
+                              and not (slot.in_use and self._needs_recycle(slot))]
+                if candidates:
+                    slot = min(candidates, key=lambda s: (s.crawler is None, s.in_use))
+                    slot.in_use += 1
+                    return slot
+                await cond.wait()
+
+    async def _release_slot(self, slot: _BrowserSlot):
+        cond = self._condition()
+        async with cond:
+            slot.in_use -= 1
+            cond.notify()
+        # 最后一个页面结束后立即关闭需要重建的实例，不等到下次被选中
+        if slot.in_use == 0 and self._needs_recycle(slot):
+            async with self._slot_lock(slot):
+                if slot.in_use == 0 and self._needs_recycle(slot):
+                    await self._close_slot(slot)
+                    self._count('browser_restarts')
+
+    def _slot_lock(self, slot: _BrowserSlot) -> asyncio.Lock:
+        # 延迟创建，保证绑定到爬取引擎的事件循环
+        if slot.lock is None:
+            slot.lock = asyncio.Lock()
+        return slot.lock
+
+    async def _ensure_crawler(self, slot: _BrowserSlot):
+        """启动实例；实例出错或渲染次数达到上限且空闲时重建"""
+        async with self._slot_lock(slot):
+            await self._start_or_recycle(slot)
+
+    async def _start_or_recycle(self, slot: _BrowserSlot):
+        if self._needs_recycle(slot) and slot.in_use == 1:
+            await self._close_slot(slot)
+            self._count('browser_restarts')
+        if slot.crawler is None:
+            crawler = AsyncWebCrawler()
+            await crawler.__aenter__()
+            slot.crawler = crawler
+            slot.renders = 0
+            slot.broken = False
+            self._count('browser_starts')
+            logger.info(f"浏览器实例 {slot.index} 已启动")
+
+    async def _close_slot(self, slot: _BrowserSlot):
+        crawler, slot.crawler = slot.crawler, None
+        if crawler is None:
+            return
+        try:
+            await crawler.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"关闭浏览器实例 {slot.index} 失败: {str(e)}")
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        获取一个浏览器实例用于渲染一个页面
+
+        Yields:
+            AsyncWebCrawler: 已启动的实例，调用方只需执行 arun()
+        """
+        if not CRAWL4AI_AVAILABLE:
+            raise RuntimeError("crawl4ai 未安装")
+        slot = await self._pick_slot()
+        try:
+            await self._ensure_crawler(slot)
+            slot.renders += 1
+            self._count('renders')
+            try:
+                yield slot.crawler
+            except Exception:
+                slot.broken = True
+                self._count('errors')
+                raise
+        finally:
+            await self._release_slot(slot)
+
+    async def close(self):
+        """关闭所有浏览器实例"""
+        self._closed = True
+        if self._cond is not None:
+            async with self._cond:
+                self._cond.notify_all()
+        for slot in self._slots:
+            await self._close_slot(slot)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            stats = dict(self._metrics)
+        stats['available'] = CRAWL4AI_AVAILABLE
+        stats['size'] = self.size
+        stats['max_pages'] = self.max_pages
+        stats['browsers'] = [
+            {'index': slot.index, 'running': slot.crawler is not None, 'in_use': slot.in_use, 'renders': slot.renders}
+            for slot in self._slots
+        ]
+        return stats
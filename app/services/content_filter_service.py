@@ -4,17 +4,26 @@
 用于过滤定时任务中的新内容，避免重复推送
 """
 
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Set, Tuple
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from ..database import db_manager
-from ..models import VideoInfo, ScheduledTask, ScheduledExecutionResult
+from ..models import (VideoInfo, ScheduledTask, ScheduledExecutionResult, ScheduledTaskSeenVideo,
+                      EventScheduledTask, get_east8_time)
 from datetime import datetime, timedelta
 
+# 去重范围
+DEDUP_SCOPE_TASK = 'task'
+DEDUP_SCOPE_EVENT = 'event'
+DEDUP_SCOPE_GLOBAL = 'global'
+DEDUP_SCOPES = (DEDUP_SCOPE_TASK, DEDUP_SCOPE_EVENT, DEDUP_SCOPE_GLOBAL)
+
 
 class ContentFilterService:
     """内容过滤服务"""
     
     def __init__(self):
-        pass
+        # 已确认台账完整（无需回填）的定时任务ID
+        self._backfilled_task_ids = set()
     
     def filter_new_videos(self, scheduled_task_id: int, search_results: Dict[str, Any]) -> Tuple[List[Dict], List[Dict]]:
         """
@@ -30,46 +39,151 @@ class ContentFilterService:
         if not search_results or 'items' not in search_results:
             return [], []
         
+        all_videos = search_results['items']
+        video_ids = [video.get('id', {}).get('videoId') for video in all_videos]
+        previous_video_ids = self.get_seen_video_ids(scheduled_task_id, [vid for vid in video_ids if vid])
+        
+        # 过滤新视频（同一页内重复出现的视频只保留第一次）
+        new_videos = []
+        page_seen = set()
+        for video, video_id in zip(all_videos, video_ids):
+            if video_id and video_id not in previous_video_ids and video_id not in page_seen:
+                new_videos.append(video)
+                page_seen.add(video_id)
+        
+        print(f"定时任务 {scheduled_task_id} 过滤结果:")
+        print(f"  总视频数: {len(all_videos)}")
+        print(f"  新视频数: {len(new_videos)}")
+        print(f"  重复视频数: {len(all_videos) - len(new_videos)}")
+        
+        return new_videos, all_videos
+    
+    def get_seen_video_ids(self, scheduled_task_id: int, video_ids: List[str], scope: str = None) -> Set[str]:
+        """
+        返回给定视频ID中已经见过的部分，全部通过索引IN查询完成，不扫描执行历史
+        
+        Args:
+            scheduled_task_id: 定时任务ID
+            video_ids: 待检查的视频ID列表
+            scope: 去重范围 task/event/global，默认使用定时任务的 dedup_scope
+            
+        Returns:
+            Set[str]: 已见过的视频ID集合
+        """
+        if not video_ids:
+            return set()
+        
+        unique_ids = set(video_ids)
         db = db_manager.get_session()
         try:
-            # 获取定时任务信息
-            scheduled_task = db.query(ScheduledTask).filter_by(id=scheduled_task_id).first()
-            if not scheduled_task:
-                return [], search_results['items']
+            if scope is None:
+                scope = db.query(ScheduledTask.dedup_scope).filter(
+                    ScheduledTask.id == scheduled_task_id
+                ).scalar() or DEDUP_SCOPE_TASK
+            
+            if scope == DEDUP_SCOPE_GLOBAL:
+                # 全局范围：video_info.video_id 唯一索引
+                rows = db.query(VideoInfo.video_id).filter(VideoInfo.video_id.in_(unique_ids)).all()
+                return {video_id for (video_id,) in rows}
+            
+            task_ids = [scheduled_task_id]
+            if scope == DEDUP_SCOPE_EVENT:
+                task_ids = self._get_event_sibling_task_ids(db, scheduled_task_id)
+            
+            for task_id in task_ids:
+                self._ensure_ledger_backfilled(db, task_id)
+            rows = db.query(ScheduledTaskSeenVideo.video_id).filter(
+                ScheduledTaskSeenVideo.scheduled_task_id.in_(task_ids),
+                ScheduledTaskSeenVideo.video_id.in_(unique_ids)
+            ).distinct().all()
+            return {video_id for (video_id,) in rows}
+        finally:
+            db.close()
+    
+    def _get_event_sibling_task_ids(self, db, scheduled_task_id: int) -> List[int]:
+        """获取与该定时任务绑定到同一事件的所有定时任务ID（未绑定事件时只包含自身）"""
+        event_id = db.query(EventScheduledTask.event_id).filter(
+            EventScheduledTask.scheduled_task_id == scheduled_task_id
+        ).scalar()
+        if event_id is None:
+            return [scheduled_task_id]
+        rows = db.query(EventScheduledTask.scheduled_task_id).filter(
+            EventScheduledTask.event_id == event_id
+        ).all()
+        return list({task_id for (task_id,) in rows} | {scheduled_task_id})
+    
+    def get_first_seen(self, video_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        查询视频的全局首次发现信息
+        
+        Args:
+            video_ids: 视频ID列表
             
-            # 获取该定时任务之前的所有执行结果
+        Returns:
+            Dict: 视频ID -> {first_seen_at, first_seen_task_id, first_seen_scheduled_task_id}
+        """
+        if not video_ids:
+            return {}
+        
+        db = db_manager.get_session()
+        try:
+            rows = db.query(
+                VideoInfo.video_id, VideoInfo.created_at,
+                VideoInfo.first_seen_task_id, VideoInfo.first_seen_scheduled_task_id
+            ).filter(VideoInfo.video_id.in_(set(video_ids))).all()
+            return {
+                video_id: {
+                    'first_seen_at': created_at.isoformat() if created_at else None,
+                    'first_seen_task_id': task_id,
+                    'first_seen_scheduled_task_id': scheduled_task_id
+                }
+                for video_id, created_at, task_id, scheduled_task_id in rows
+            }
+        finally:
+            db.close()
+    
+    def record_seen_videos(self, db, scheduled_task_id: int, video_ids: List[str]):
+        """
+        在调用方的事务中把视频写入已见台账（与新视频保存同时提交）
+        
+        Args:
+            db: 调用方的数据库会话
+            scheduled_task_id: 定时任务ID
+            video_ids: 视频ID列表
+        """
+        rows = [
+            {'scheduled_task_id': scheduled_task_id, 'video_id': video_id, 'first_seen_at': get_east8_time()}
+            for video_id in dict.fromkeys(vid for vid in video_ids if vid)
+        ]
+        if rows:
+            db.execute(sqlite_insert(ScheduledTaskSeenVideo).on_conflict_do_nothing(), rows)
+    
+    def _ensure_ledger_backfilled(self, db, scheduled_task_id: int):
+        """台账上线前的历史执行只保存在result_data中，首次使用时为该任务回填一次"""
+        if scheduled_task_id in self._backfilled_task_ids:
+            return
+        
+        has_ledger = db.query(ScheduledTaskSeenVideo.id).filter(
+            ScheduledTaskSeenVideo.scheduled_task_id == scheduled_task_id
+        ).first() is not None
+        if not has_ledger:
             previous_executions = db.query(ScheduledExecutionResult).filter(
                 ScheduledExecutionResult.scheduled_task_id == scheduled_task_id,
                 ScheduledExecutionResult.status == 'success'
-            ).order_by(ScheduledExecutionResult.completed_at.desc()).all()
+            ).all()
             
-            # 收集之前所有执行过的视频ID
-            previous_video_ids = set()
+            previous_video_ids = []
             for execution in previous_executions:
                 if execution.result_data and 'items' in execution.result_data:
                     for item in execution.result_data['items']:
-                        video_id = item.get('id', {}).get('videoId')
-                        if video_id:
-                            previous_video_ids.add(video_id)
-            
-            # 过滤新视频
-            new_videos = []
-            all_videos = search_results['items']
+                        previous_video_ids.append(item.get('id', {}).get('videoId'))
             
-            for video in all_videos:
-                video_id = video.get('id', {}).get('videoId')
-                if video_id and video_id not in previous_video_ids:
-                    new_videos.append(video)
-            
-            print(f"定时任务 {scheduled_task_id} 过滤结果:")
-            print(f"  总视频数: {len(all_videos)}")
-            print(f"  新视频数: {len(new_videos)}")
-            print(f"  重复视频数: {len(all_videos) - len(new_videos)}")
-            
-            return new_videos, all_videos
-            
-        finally:
-            db.close()
+            if previous_video_ids:
+                self.record_seen_videos(db, scheduled_task_id, previous_video_ids)
+                db.commit()
+                print(f"定时任务 {scheduled_task_id} 已见视频台账回填完成，共 {len(set(previous_video_ids))} 个视频")
+        
+        self._backfilled_task_ids.add(scheduled_task_id)
     
     def get_task_execution_summary(self, scheduled_task_id: int) -> Dict[str, Any]:
         """
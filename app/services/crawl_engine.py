@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+网站爬取引擎
+所有网站的爬取都运行在同一个后台事件循环中，共享一个带DNS缓存和长连接的aiohttp连接池；
+全局信号量限制同时爬取的网站数，按主机限制并发连接数和请求间隔，
+一次爬取整个网站列表的耗时接近最慢的那个网站，而不是所有网站耗时之和
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import List, Dict, Any, Tuple
+from urllib.parse import urlparse
+import aiohttp
+from ..config import AppConfig
+from .browser_pool import BrowserPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+
+class _HostSlot:
+    """单个主机的访问控制：并发连接数上限 + 相邻请求的最小间隔"""
+
+    def __init__(self, limit: int, delay: float):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.delay = delay
+        self.next_allowed_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait_turn(self):
+        """按最小间隔排队，预约下一个可发起请求的时间点"""
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_allowed_at - now
+            self.next_allowed_at = max(now, self.next_allowed_at) + self.delay
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class CrawlEngine:
+    """网站爬取引擎"""
+
+    def __init__(self, max_concurrency: int = None, per_host_limit: int = None, per_host_delay: float = None):
+        self.max_concurrency = max_concurrency or AppConfig.CRAWL_MAX_CONCURRENCY
+        self.per_host_limit = per_host_limit or AppConfig.CRAWL_PER_HOST_LIMIT
+        self.per_host_delay = AppConfig.CRAWL_PER_HOST_DELAY if per_host_delay is None else per_host_delay
+        self.request_timeout = AppConfig.CRAWL_REQUEST_TIMEOUT
+        self.session = None
+        self.browser_pool = None
+        self._loop = None
+        self._thread = None
+        self._semaphore = None
+        self._hosts = {}
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'sites_crawled': 0, 'sites_failed': 0, 'requests': 0,
+            'active_sites': 0, 'total_host_wait_seconds': 0.0,
+        }
+
+    def _count(self, name: str, amount=1):
+        with self._metrics_lock:
+            self._metrics[name] += amount
+
+    def start(self):
+        """启动后台事件循环（首次提交爬取时自动调用）"""
+        with self._start_lock:
+            if self._loop and self._loop.is_running():
+                return
+            ready = threading.Event()
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), name='crawl-engine', daemon=True)
+            self._thread.start()
+            ready.wait()
+            asyncio.run_coroutine_threadsafe(self._open_session(), self._loop).result()
+            print(f"爬取引擎已启动，网站并发 {self.max_concurrency}，单主机并发 {self.per_host_limit}，"
+                  f"请求间隔 {self.per_host_delay} 秒")
+
+    def _run_loop(self, ready: threading.Event):
+        asyncio.set_event_loop(self._loop)
+        self._loop.call_soon(ready.set)
+        self._loop.run_forever()
+
+    async def _open_session(self):
+        """在事件循环内创建共享的连接池和会话"""
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._hosts = {}
+        self.browser_pool = BrowserPool()
+        connector = aiohttp.TCPConnector(
+            limit=AppConfig.CRAWL_MAX_CONNECTIONS,
+            limit_per_host=self.per_host_limit,
+            ttl_dns_cache=AppConfig.CRAWL_DNS_CACHE_TTL,
+            keepalive_timeout=AppConfig.CRAWL_KEEPALIVE_SECONDS
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=DEFAULT_HEADERS,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout)
+        )
+
+    def stop(self):
+        """关闭共享会话并停止事件循环"""
+        with self._start_lock:
+            if not self._loop or not self._loop.is_running():
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self._close_session(), self._loop).result(timeout=30)
+            except Exception as e:
+                print(f"关闭爬取会话失败: {e}")
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self.session = None
+            self.browser_pool = None
+            self._loop = None
+            self._thread = None
+            print("爬取引擎已停止")
+
+    async def _close_session(self):
+        """关闭浏览器池和共享会话"""
+        if self.browser_pool:
+            await self.browser_pool.close()
+        if self.session:
+            await self.session.close()
+
+    @asynccontextmanager
+    async def host_slot(self, url: str):
+        """
+        按主机获取访问名额（在引擎事件循环内使用）
+
+        同一主机的请求受并发上限约束，且相邻两次请求的发起间隔不小于配置的延迟
+        """
+        host = urlparse(url).netloc.lower()
+        slot = self._hosts.get(host)
+        if slot is None:
+            slot = self._hosts[host] = _HostSlot(self.per_host_limit, self.per_host_delay)
+        start = time.monotonic()
+        async with slot.semaphore:
+            await slot.wait_turn()
+            self._count('total_host_wait_seconds', time.monotonic() - start)
+            self._count('requests')
+            yield
+
+    async def _crawl_site(self, website_url: str, crawl_config: Dict,
+                          website_id: int = None) -> Tuple[List[Dict], List[Dict]]:
+        """在全局并发上限内爬取单个网站，返回 (视频列表, 页面缓存校验信息)"""
+        from .crawler_service import CrawlerService
+
+        async with self._semaphore:
+            self._count('active_sites')
+            try:
+                crawler_service = CrawlerService(engine=self, website_id=website_id)
+                result = await crawler_service.crawl_website(website_url, crawl_config)
+                self._count('sites_crawled')
+                return result
+            except Exception:
+                self._count('sites_failed')
+                raise
+            finally:
+                self._count('active_sites', -1)
+
+    def submit(self, website_url: str, crawl_config: Dict, website_id: int = None) -> Future:
+        """
+        提交一个网站的爬取，立即返回
+
+        Args:
+            website_url: 网站URL
+            crawl_config: 爬取配置
+            website_id: 网站ID，提供时只返回新视频和内容有变化的视频
+
+        Returns:
+            Future: 结果为 (视频信息列表, 页面缓存校验信息列表)；保存视频时须在同一事务中
+                    调用 page_cache_service.record() 写入页面缓存校验信息
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self._crawl_site(website_url, crawl_config, website_id), self._loop)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取引擎统计：已爬网站数、请求数、主机排队等待时间等"""
+        with self._metrics_lock:
+            stats = dict(self._metrics)
+        stats['running'] = bool(self._loop and self._loop.is_running())
+        stats['max_concurrency'] = self.max_concurrency
+        stats['per_host_limit'] = self.per_host_limit
+        stats['per_host_delay'] = self.per_host_delay
+        stats['hosts'] = len(self._hosts)
+        stats['browser_pool'] = self.browser_pool.get_stats() if self.browser_pool else None
+        return stats
+
+
+# 单例服务
+crawl_engine = CrawlEngine()
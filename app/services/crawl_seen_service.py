@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+网站已见视频索引服务
+按（网站, 规范化视频链接）记录每个爬取到的视频及其内容哈希：
+再次爬取时只有新视频和内容有变化的视频会被翻译和保存，未变化的视频只更新最近发现时间
+"""
+
+import hashlib
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..database import db_manager
+from ..models import CrawlSeenUrl, CrawlVideo
+
+# 单条SQL绑定参数上限，IN查询按此大小分批
+IN_QUERY_BATCH_SIZE = 500
+
+# 规范化时去掉的跟踪参数
+_TRACKING_PARAMS = {'fbclid', 'gclid', 'msclkid', 'spm'}
+_DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+
+def normalize_url(url: str) -> str:
+    """
+    规范化视频链接：协议和主机小写、去掉默认端口、片段和跟踪参数、查询参数排序、去掉路径末尾的斜杠
+    """
+    if not url:
+        return ''
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip()
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    host, _, port = netloc.rpartition(':')
+    if host and _DEFAULT_PORTS.get(scheme) == port:
+        netloc = host
+    path = parts.path or '/'
+    if len(path) > 1:
+        path = path.rstrip('/')
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in _TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def make_item_hash(video: Dict[str, Any]) -> str:
+    """计算视频内容哈希（标题、简介、缩略图），用于判断已见视频是否有变化"""
+    content = '\x1f'.join((video.get(field) or '').strip()
+                          for field in ('video_title', 'video_description', 'thumbnail_url'))
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+class CrawlSeenService:
+    """网站已见视频索引服务"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._backfilled_website_ids = set()
+        self.stats = {'checked': 0, 'new': 0, 'changed': 0, 'unchanged': 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def filter_new_or_changed(self, website_id: Optional[int], videos: List[Dict],
+                              page_urls: List[str] = None) -> List[Dict]:
+        """
+        过滤出新视频和内容有变化的视频，未变化的视频只更新最近发现时间
+
+        返回的视频附带 normalized_url / content_hash / is_new 字段，
+        保存后需调用 record() 写入索引（未保存成功时下次爬取仍会视为新视频）
+
+        Args:
+            website_id: 网站ID，为空时不过滤
+            videos: 本次爬取到的视频列表
+            page_urls: 本次爬取的页面URL；链接就是页面本身的视频（如首页头条）按链接+标题区分
+
+        Returns:
+            List[Dict]: 新增或变化的视频（本次爬取内按规范化链接去重，保留第一次出现的）
+        """
+        page_keys = {normalize_url(url) for url in page_urls or ()}
+        unique = {}
+        for video in videos:
+            normalized = normalize_url(video.get('video_url', ''))
+            if normalized in page_keys:
+                title = (video.get('video_title') or '').strip()
+                normalized += '#' + hashlib.sha256(title.encode('utf-8')).hexdigest()[:12]
+            if normalized and normalized not in unique:
+                video['normalized_url'] = normalized
+                video['content_hash'] = make_item_hash(video)
+                unique[normalized] = video
+        if website_id is None:
+            return list(unique.values())
+
+        db = db_manager.get_session()
+        try:
+            self._ensure_backfilled(db, website_id)
+            known = {}
+            urls = list(unique)
+            for i in range(0, len(urls), IN_QUERY_BATCH_SIZE):
+                rows = db.query(CrawlSeenUrl.normalized_url, CrawlSeenUrl.content_hash).filter(
+                    CrawlSeenUrl.website_id == website_id,
+                    CrawlSeenUrl.normalized_url.in_(urls[i:i + IN_QUERY_BATCH_SIZE])
+                ).all()
+                known.update(rows)
+
+            result = []
+            unchanged_urls = []
+            for normalized, video in unique.items():
+                if normalized not in known:
+                    video['is_new'] = True
+                    result.append(video)
+                elif known[normalized] != video['content_hash']:
+                    video['is_new'] = False
+                    result.append(video)
+                else:
+                    unchanged_urls.append(normalized)
+
+            now = datetime.utcnow()
+            for i in range(0, len(unchanged_urls), IN_QUERY_BATCH_SIZE):
+                db.execute(
+                    update(CrawlSeenUrl)
+                    .where(CrawlSeenUrl.website_id == website_id,
+                           CrawlSeenUrl.normalized_url.in_(unchanged_urls[i:i + IN_QUERY_BATCH_SIZE]))
+                    .values(last_seen_at=now)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        new_count = sum(1 for video in result if video['is_new'])
+        self._count('checked', len(unique))
+        self._count('new', new_count)
+        self._count('changed', len(result) - new_count)
+        self._count('unchanged', len(unchanged_urls))
+        return result
+
+    def record(self, db, website_id: int, task_id: int, videos: List[Dict]):
+        """
+        在调用方的事务中把已保存的视频写入索引（与视频保存同时提交）
+
+        Args:
+            db: 调用方的数据库会话
+            website_id: 网站ID
+            task_id: 爬取任务ID
+            videos: filter_new_or_changed 返回的视频列表
+        """
+        now = datetime.utcnow()
+        rows = [
+            {'website_id': website_id, 'normalized_url': video['normalized_url'],
+             'content_hash': video.get('content_hash'), 'first_seen_task_id': task_id,
+             'last_changed_task_id': task_id, 'first_seen_at': now, 'last_seen_at': now, 'last_changed_at': now}
+            for video in videos if video.get('normalized_url')
+        ]
+        if not rows:
+            return
+        stmt = sqlite_insert(CrawlSeenUrl)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['website_id', 'normalized_url'],
+            set_={'content_hash': stmt.excluded.content_hash, 'last_changed_task_id': task_id,
+                  'last_seen_at': now, 'last_changed_at': now}
+        )
+        db.execute(stmt, rows)
+
+    def _ensure_backfilled(self, db, website_id: int):
+        """索引上线前的历史爬取结果只保存在crawl_videos中，首次使用时为该网站回填一次"""
+        if website_id in self._backfilled_website_ids:
+            return
+
+        has_index = db.query(CrawlSeenUrl.id).filter(CrawlSeenUrl.website_id == website_id).first() is not None
+        if not has_index:
+            previous_videos = db.query(CrawlVideo).filter(
+                CrawlVideo.website_id == website_id
+            ).order_by(CrawlVideo.crawl_time).all()
+
+            # 按时间顺序，同一链接以最早的记录为首次发现、最近的记录为当前内容
+            entries = {}
+            for video in previous_videos:
+                normalized = normalize_url(video.video_url)
+                if not normalized:
+                    continue
+                content_hash = make_item_hash({
+                    'video_title': video.video_title,
+                    'video_description': video.video_description,
+                    'thumbnail_url': video.thumbnail_url,
+                })
+                entry = entries.get(normalized)
+                if entry is None:
+                    entries[normalized] = {
+                        'website_id': website_id, 'normalized_url': normalized, 'content_hash': content_hash,
+                        'first_seen_task_id': video.task_id, 'last_changed_task_id': video.task_id,
+                        'first_seen_at': video.crawl_time, 'last_seen_at': video.crawl_time,
+                        'last_changed_at': video.crawl_time,
+                    }
+                else:
+                    entry['last_seen_at'] = video.crawl_time
+                    if entry['content_hash'] != content_hash:
+                        entry.update(content_hash=content_hash, last_changed_task_id=video.task_id,
+                                     last_changed_at=video.crawl_time)
+
+            if entries:
+                db.execute(sqlite_insert(CrawlSeenUrl).on_conflict_do_nothing(), list(entries.values()))
+                db.commit()
+                print(f"网站 {website_id} 已见视频索引回填完成，共 {len(entries)} 个视频")
+
+        self._backfilled_website_ids.add(website_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取过滤统计：检查数、新增数、变化数、未变化数"""
+        with self._lock:
+            return dict(self.stats)
+
+
+# 单例服务
+crawl_seen_service = CrawlSeenService()
@@ -2,15 +2,18 @@
 # -*- coding: utf-8 -*-
 
 import asyncio
+import contextlib
 import json
+from collections import deque
 import logging
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import aiohttp
 from bs4 import BeautifulSoup
 import re
 from urllib.parse import urljoin, urlparse
 import time
+import warnings
 
 try:
     from crawl4ai import AsyncWebCrawler
@@ -20,190 +23,386 @@ except ImportError:
     print("警告: crawl4ai 未安装，将使用备用爬虫方案")
 
 from ..services.translate_service import get_translate_service
+from ..services.page_cache_service import page_cache_service, make_content_hash, make_config_hash
+from ..services.crawl_seen_service import crawl_seen_service, normalize_url
+from ..utils.html_utils import SelectorPlan, make_soup
+from ..config import AppConfig
 
 logger = logging.getLogger(__name__)
 
+# 自动解析：视频相关元素选择器（优先）与其他媒体内容选择器
+VIDEO_SELECTORS = [
+    'video', 'iframe[src*="youtube"]', 'iframe[src*="vimeo"]', 'iframe[src*="bilibili"]',
+    'iframe[src*="player"]', 'iframe[src*="embed"]', 'iframe[src*="watch"]',
+    'div[class*="video"]', 'div[class*="player"]', 'div[class*="media"]',
+    'a[href*="video"]', 'a[href*="watch"]', 'a[href*="play"]',
+    'object[type*="video"]', 'embed[type*="video"]',
+    '[data-type="video"]', '[data-video]', '[class*="video-player"]'
+]
+MEDIA_SELECTORS = [
+    'img[src*="video"]', 'img[src*="thumb"]', 'img[src*="preview"]',
+    'div[class*="media"]', 'div[class*="content"]', 'div[class*="item"]',
+    'article', 'section', '.post', '.entry'
+]
+
+# 蒙古国家广播电视网站各类内容的选择器
+MNB_LIVE_SELECTORS = [
+    'div[class*="live"]', 'div[class*="stream"]', 'div[class*="broadcast"]',
+    'div[class*="tv"]', 'div[class*="radio"]', 'div[class*="channel"]',
+    'iframe[src*="live"]', 'iframe[src*="stream"]', 'iframe[src*="tv"]',
+    'video', 'audio', 'embed[type*="video"]', 'embed[type*="audio"]',
+    'object[type*="video"]', 'object[type*="audio"]'
+]
+MNB_NEWS_SELECTORS = [
+    'a[href*="/news"]', 'a[href*="/program"]', 'a[href*="/live"]',
+    'a[href*="/tv"]', 'a[href*="/radio"]', 'a[href*="/broadcast"]',
+    '.news-item', '.program-item', '.live-item', '.tv-item',
+    'div[class*="news"]', 'div[class*="program"]', 'div[class*="live"]'
+]
+MNB_CONTENT_SELECTORS = [
+    '.content', '.main-content', '.article', '.post',
+    '.news-content', '.program-content', '.live-content'
+]
+MNB_CHANNEL_SELECTORS = [
+    '.channel', '.station', '.frequency', '.program-schedule',
+    '[class*="channel"]', '[class*="station"]', '[class*="frequency"]'
+]
+MNB_SCHEDULE_SELECTORS = [
+    '.schedule', '.timetable', '.program-list', '.time-slot',
+    '[class*="schedule"]', '[class*="timetable"]', '[class*="time"]'
+]
+MNB_TEXT_SELECTORS = [
+    'p', 'div', 'span', 'li', 'td', 'th',
+    '[class*="text"]', '[class*="content"]', '[class*="info"]'
+]
+
+# 元素内字段提取时依次尝试的选择器（取每个选择器的第一个匹配）
+TITLE_SELECTORS = [
+    'title', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    '[class*="title"]', '[class*="name"]', '[class*="heading"]'
+]
+DESCRIPTION_SELECTORS = [
+    'p', 'span', 'div',
+    '[class*="description"]', '[class*="desc"]', '[class*="summary"]'
+]
+THUMBNAIL_SELECTORS = ['img', '[class*="thumbnail"]', '[class*="thumb"]']
+
+# 预编译的选择器计划：整页或整个元素只遍历一次即可得到所有选择器的匹配结果
+AUTO_PLAN = SelectorPlan(VIDEO_SELECTORS + MEDIA_SELECTORS)
+MNB_PLAN = SelectorPlan(
+    MNB_LIVE_SELECTORS + MNB_NEWS_SELECTORS + MNB_CONTENT_SELECTORS + MNB_CHANNEL_SELECTORS
+    + MNB_SCHEDULE_SELECTORS + MNB_TEXT_SELECTORS + ['a[href]']
+)
+BASIC_PAGE_PLAN = SelectorPlan(['title', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'a[href]'])
+FIELD_PLAN = SelectorPlan(TITLE_SELECTORS + DESCRIPTION_SELECTORS + THUMBNAIL_SELECTORS)
+
+# 分页链接识别：rel=next、class含next的链接、常见“下一页”文字，以及分页区域内的数字页码
+PAGINATION_PLAN = SelectorPlan(['a[rel]', 'link[rel]', 'a[class*="next"]', '[class*="pagination"]', '[class*="pager"]'])
+NEXT_PAGE_TEXTS = {'next', 'next page', 'next »', '»', '›', '>', '下一页', '下页', 'далее', 'дараах'}
+
+
+def discover_pagination_links(soup: BeautifulSoup, page_url: str) -> List[str]:
+    """在页面中查找同一站点的分页链接"""
+    matches = PAGINATION_PLAN.select_all(soup)
+    candidates = []
+    for element in matches['a[rel]'] + matches['link[rel]']:
+        if 'next' in [rel.lower() for rel in (element.get('rel') or [])]:
+            candidates.append(element.get('href'))
+    for element in matches['a[class*="next"]']:
+        candidates.append(element.get('href'))
+    for container in matches['[class*="pagination"]'] + matches['[class*="pager"]']:
+        for link in container.find_all('a', href=True):
+            text = link.get_text(strip=True).lower()
+            if text.isdigit() or text in NEXT_PAGE_TEXTS:
+                candidates.append(link.get('href'))
+    
+    host = urlparse(page_url).netloc.lower()
+    links = []
+    for href in candidates:
+        if not href or href.startswith(('#', 'javascript:')):
+            continue
+        url = urljoin(page_url, href)
+        if urlparse(url).netloc.lower() == host and url not in links:
+            links.append(url)
+    return links
+
 class CrawlerService:
     """视频爬虫服务"""
     
-    def __init__(self):
+    def __init__(self, engine=None, website_id: int = None):
+        """
+        Args:
+            engine: 爬取引擎，提供共享会话和按主机的访问控制；为空时需通过 async with 自建会话
+            website_id: 网站ID，提供时只返回该网站的新视频和内容有变化的视频
+        """
         self.translate_service = get_translate_service()
-        self.session = None
+        self.engine = engine
+        self.website_id = website_id
+        self.session = engine.session if engine else None
+        self._owns_session = False
+        self.request_timeout = aiohttp.ClientTimeout(total=engine.request_timeout if engine else 30)
+        # 页面未变化（304或内容哈希相同）时置为True，本次爬取跳过解析和翻译
+        self.page_unchanged = False
+        # 页面变化时待写入的缓存校验信息，随爬取结果返回，由调用方与视频在同一事务中写入；
+        # 视频未保存成功时校验信息也不会写入，下次爬取仍会重新解析
+        self._pending_page_caches = []
+        # 最近一次解析的页面DOM，用于发现分页链接
+        self._last_soup = None
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
-        self.session = aiohttp.ClientSession(headers=self.headers)
+        if self.session is None:
+            self.session = aiohttp.ClientSession(headers=self.headers)
+            self._owns_session = True
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """异步上下文管理器出口"""
-        if self.session:
+        if self.session and self._owns_session:
             await self.session.close()
+            self.session = None
+            self._owns_session = False
+    
+    def _host_slot(self, url: str):
+        """按主机获取访问名额；没有爬取引擎时不做限制"""
+        if self.engine:
+            return self.engine.host_slot(url)
+        return contextlib.nullcontext()
     
-    async def crawl_website(self, website_url: str, crawl_config: Dict) -> List[Dict]:
+    async def crawl_website(self, website_url: str, crawl_config: Dict) -> Tuple[List[Dict], List[Dict]]:
         """
         爬取网站视频信息
         
         Args:
             website_url: 网站URL
-            crawl_config: 爬取配置
+            crawl_config: 爬取配置，可选的增量爬取配置：
+                max_depth: 沿分页链接/站点地图继续爬取的深度，默认0（只爬取入口页面）
+                max_pages: 单次爬取最多请求的页面数（含站点地图）
+                follow_pagination: 是否跟随分页链接，默认True
+                follow_sitemap: 是否读取站点地图，默认False
+                sitemap_url: 站点地图地址，默认为 /sitemap.xml
             
         Returns:
-            视频信息列表
+            (视频信息列表, 页面缓存校验信息列表)：提供了网站ID时视频只包含新视频和内容有变化的视频；
+            页面缓存校验信息需在保存视频的同一事务中通过 page_cache_service.record() 写入
         """
         try:
             logger.info(f"开始爬取网站: {website_url}")
-            
-            # 使用 crawl4ai 进行爬取
-            if CRAWL4AI_AVAILABLE:
-                videos = await self._crawl_with_crawl4ai(website_url, crawl_config)
-            else:
-                # 备用方案：使用传统方法
-                videos = await self._crawl_traditional(website_url, crawl_config)
-            
-            # 翻译视频信息
-            if crawl_config.get('enable_translation', True):
-                videos = self._translate_videos(videos)
+            loop = asyncio.get_running_loop()
+            
+            max_depth = int(crawl_config.get('max_depth') or 0)
+            max_pages = int(crawl_config.get('max_pages') or AppConfig.CRAWL_FRONTIER_MAX_PAGES)
+            follow_pagination = crawl_config.get('follow_pagination', True)
+            
+            videos = []
+            page_urls = []
+            changed_pages = 0
+            pages_left = max_pages
+            queue = deque([(website_url, 0)])
+            visited = {normalize_url(website_url)}
+            
+            # 站点地图：视频条目直接作为结果，普通页面加入待爬取队列
+            if crawl_config.get('follow_sitemap'):
+                sitemap_videos, sitemap_pages, used = await self._crawl_sitemaps(website_url, crawl_config, pages_left - 1)
+                pages_left -= used
+                videos.extend(sitemap_videos)
+                changed_pages += 1 if sitemap_videos else 0
+                if max_depth >= 1:
+                    for page_url in sitemap_pages:
+                        normalized = normalize_url(page_url)
+                        if normalized not in visited:
+                            visited.add(normalized)
+                            queue.append((page_url, 1))
+            
+            while queue and pages_left > 0:
+                url, depth = queue.popleft()
+                pages_left -= 1
+                page_urls.append(url)
+                page_videos, soup, unchanged = await self._crawl_page(url, crawl_config)
+                if unchanged:
+                    continue
+                changed_pages += 1
+                videos.extend(page_videos)
+                
+                if soup is not None and follow_pagination and depth < max_depth:
+                    for link in discover_pagination_links(soup, url):
+                        normalized = normalize_url(link)
+                        if normalized not in visited:
+                            visited.add(normalized)
+                            queue.append((link, depth + 1))
+            
+            if not changed_pages:
+                logger.info(f"页面未变化，跳过解析和翻译: {website_url}")
+                return [], []
+            
+            # 只保留新视频和内容有变化的视频，已见过且未变化的不再翻译和保存
+            if self.website_id is not None:
+                total = len(videos)
+                videos = await loop.run_in_executor(
+                    None, crawl_seen_service.filter_new_or_changed, self.website_id, videos, page_urls)
+                logger.info(f"共解析 {total} 个视频，其中新增或变化 {len(videos)} 个")
+            
+            # 翻译视频信息（翻译接口是同步调用，放到线程池执行，避免阻塞共享的事件循环）
+            if videos and crawl_config.get('enable_translation', True):
+                videos = await loop.run_in_executor(None, self._translate_videos, videos)
+            
+            page_caches, self._pending_page_caches = self._pending_page_caches, []
             
             logger.info(f"爬取完成，共获取 {len(videos)} 个视频")
-            return videos
+            return videos, page_caches
             
         except Exception as e:
             logger.error(f"爬取网站失败: {website_url}, 错误: {str(e)}")
-            return []
+            return [], []
+    
+    async def _crawl_page(self, url: str, crawl_config: Dict):
+        """
+        爬取并解析单个页面
+        
+        Returns:
+            (视频列表, 页面DOM, 页面是否未变化)
+        """
+        self.page_unchanged = False
+        self._last_soup = None
+        if CRAWL4AI_AVAILABLE:
+            async with self._host_slot(url):
+                videos = await self._crawl_with_crawl4ai(url, crawl_config)
+        else:
+            # 备用方案：使用传统方法
+            videos = await self._crawl_traditional(url, crawl_config)
+        return videos, self._last_soup, self.page_unchanged
+    
+    async def _crawl_sitemaps(self, website_url: str, crawl_config: Dict, budget: int):
+        """
+        读取站点地图（支持站点地图索引）
+        
+        Returns:
+            (站点地图中的视频条目, 同一站点的普通页面URL列表, 请求的站点地图数)
+        """
+        parsed = urlparse(website_url)
+        queue = deque([crawl_config.get('sitemap_url') or f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"])
+        seen = set(queue)
+        videos = []
+        page_urls = []
+        used = 0
+        while queue and used < budget:
+            sitemap_url = queue.popleft()
+            used += 1
+            self.page_unchanged = False
+            content = await self._fetch_website_content(sitemap_url, crawl_config)
+            if not content:
+                continue
+            with warnings.catch_warnings():
+                # 站点地图按HTML方式解析即可取到 loc / video:* 标签，不依赖XML解析器
+                warnings.simplefilter('ignore')
+                soup = make_soup(content, 'html.parser')
+            for sitemap in soup.find_all('sitemap'):
+                loc = sitemap.find('loc')
+                child_url = loc.get_text(strip=True) if loc else ''
+                if child_url and child_url not in seen:
+                    seen.add(child_url)
+                    queue.append(child_url)
+            for entry in soup.find_all('url'):
+                loc = entry.find('loc')
+                page_url = loc.get_text(strip=True) if loc else ''
+                video_tag = entry.find('video:video')
+                if video_tag:
+                    title = video_tag.find('video:title')
+                    description = video_tag.find('video:description')
+                    thumbnail = video_tag.find('video:thumbnail_loc')
+                    player = video_tag.find('video:player_loc') or video_tag.find('video:content_loc')
+                    videos.append({
+                        'video_title': title.get_text(strip=True) if title else '',
+                        'video_url': page_url or (player.get_text(strip=True) if player else ''),
+                        'video_description': description.get_text(strip=True)[:500] if description else '',
+                        'thumbnail_url': thumbnail.get_text(strip=True) if thumbnail else '',
+                        'duration': video_tag.find('video:duration').get_text(strip=True) if video_tag.find('video:duration') else '',
+                        'upload_date': video_tag.find('video:publication_date').get_text(strip=True) if video_tag.find('video:publication_date') else '',
+                        'view_count': '',
+                        'like_count': '',
+                    })
+                elif page_url and urlparse(page_url).netloc.lower() == parsed.netloc.lower():
+                    page_urls.append(page_url)
+        videos = [video for video in videos if video['video_title'] and video['video_url']]
+        logger.info(f"站点地图读取完成：视频 {len(videos)} 个，页面 {len(page_urls)} 个")
+        return videos, page_urls, used
     
     async def _crawl_with_crawl4ai(self, website_url: str, crawl_config: Dict) -> List[Dict]:
-        """使用 crawl4ai 爬取网站"""
+        """
+        使用 crawl4ai 爬取网站
+        
+        页面只渲染一次，所有解析策略都在这一次渲染得到的DOM上执行；
+        有爬取引擎时从浏览器池借用长期运行的实例，否则临时启动一个实例并在结束后关闭；
+        浏览器渲染无法发起条件请求，渲染后按HTML内容哈希判断页面是否变化
+        """
         try:
             logger.info(f"使用 crawl4ai 爬取网站: {website_url}")
             
-            # 创建 AsyncWebCrawler 实例
-            crawler = AsyncWebCrawler()
-            logger.info("AsyncWebCrawler 实例创建成功")
-            
-            # 方法1: 最简单的爬取配置 - 获取HTML内容
-            logger.info("尝试方法1: 获取HTML内容")
-            try:
-                result = await crawler.arun(
-                    url=website_url,
-                    extraction_rules={
-                        "selector": "html",
-                        "type": "html"
-                    }
-                )
-                
-                if result and hasattr(result, '_results') and result._results:
-                    logger.info(f"crawl4ai 方法1执行成功，结果类型: {type(result)}")
-                    logger.info(f"结果属性: {[attr for attr in dir(result) if not attr.startswith('_')]}")
-                    
-                    # 检查结果内容
-                    if hasattr(result, 'html') and result.html:
-                        logger.info("找到HTML内容，使用传统方法解析")
-                        # 使用BeautifulSoup解析HTML内容
-                        soup = BeautifulSoup(result.html, 'html.parser')
-                        videos = await self._auto_parse_videos(soup, website_url)
-                        if videos:
-                            logger.info(f"传统方法解析成功，找到 {len(videos)} 个视频")
-                            return videos
-                    
-                    # 如果没有html属性，尝试其他属性
-                    for attr in ['body', 'content', 'text']:
-                        if hasattr(result, attr) and getattr(result, attr):
-                            logger.info(f"找到 {attr} 内容，使用传统方法解析")
-                            content = getattr(result, attr)
-                            if isinstance(content, str):
-                                soup = BeautifulSoup(content, 'html.parser')
-                                videos = await self._auto_parse_videos(soup, website_url)
-                                if videos:
-                                    logger.info(f"传统方法解析成功，找到 {len(videos)} 个视频")
-                                    return videos
-                
-                logger.info("方法1未找到有效内容，尝试方法2")
-                
-            except Exception as e:
-                logger.warning(f"crawl4ai 方法1失败: {str(e)}")
-            
-            # 方法2: 使用更复杂的爬取配置
-            logger.info("尝试方法2: 使用更复杂的爬取配置")
-            try:
-                # 构建提取规则
-                extraction_rules = {
-                    "videos": {
-                        "selector": crawl_config.get('video_selector', 'video, iframe[src*="youtube"], iframe[src*="vimeo"], div[class*="video"], div[class*="player"]'),
-                        "type": "elements"
-                    },
-                    "titles": {
-                        "selector": crawl_config.get('title_selector', 'h1, h2, h3, h4, h5, h6, .title, .video-title, [class*="title"]'),
-                        "type": "text"
-                    },
-                    "links": {
-                        "selector": crawl_config.get('link_selector', 'a[href], iframe[src]'),
-                        "type": "attributes",
-                        "attribute": "href"
-                    },
-                    "descriptions": {
-                        "selector": crawl_config.get('description_selector', 'p, .description, .video-description, [class*="desc"]'),
-                        "type": "text"
-                    }
-                }
-                
-                result = await crawler.arun(
-                    url=website_url,
-                    extraction_rules=extraction_rules
-                )
-                
-                if result and hasattr(result, '_results') and result._results:
-                    logger.info(f"crawl4ai 方法2爬取完成，结果类型: {type(result)}")
-                    
-                    # 尝试从结果中提取视频信息
-                    videos = []
-                    if hasattr(result, 'videos') and result.videos:
-                        logger.info(f"找到 {len(result.videos)} 个视频元素")
-                        for video_elem in result.videos:
-                            video_info = await self._extract_video_info(video_elem, website_url)
-                            if video_info:
-                                videos.append(video_info)
-                    
-                    if videos:
-                        logger.info(f"方法2成功提取 {len(videos)} 个视频")
-                        return videos
-                    
-                    logger.info("方法2未找到视频，尝试方法3")
-                
-            except Exception as e:
-                logger.warning(f"crawl4ai 方法2失败: {str(e)}")
-            
-            # 方法3: 获取原始HTML并使用传统方法解析
-            logger.info("尝试方法3: 获取原始HTML并使用传统方法解析")
-            try:
-                result = await crawler.arun(
-                    url=website_url,
-                    extraction_rules={
-                        "selector": "body",
-                        "type": "html"
-                    }
-                )
-                
-                if result and hasattr(result, 'body') and result.body:
-                    logger.info("找到body内容，使用传统方法解析")
-                    soup = BeautifulSoup(result.body, 'html.parser')
-                    videos = await self._auto_parse_videos(soup, website_url)
-                    if videos:
-                        logger.info(f"传统方法解析成功，找到 {len(videos)} 个视频")
-                        return videos
-                
-            except Exception as e:
-                logger.warning(f"crawl4ai 方法3失败: {str(e)}")
+            if self.engine:
+                async with self.engine.browser_pool.acquire() as crawler:
+                    result = await crawler.arun(url=website_url)
+            else:
+                async with AsyncWebCrawler() as crawler:
+                    result = await crawler.arun(url=website_url)
             
-            logger.warning("所有 crawl4ai 方法都失败，回退到传统方法")
-            return []
+            if not result or not getattr(result, 'success', True):
+                logger.warning(f"crawl4ai 渲染失败: {getattr(result, 'error_message', '') if result else '无结果'}")
+                return []
+            
+            html = getattr(result, 'html', None)
+            if isinstance(html, str) and html:
+                config_hash, cached = await self._get_page_cache(website_url, crawl_config)
+                if config_hash is not None:
+                    content_hash = make_content_hash(html.encode('utf-8'))
+                    if await self._check_unchanged(website_url, cached, content_hash, config_hash):
+                        return []
+            
+            return await self._parse_rendered_result(result, website_url, crawl_config)
             
         except Exception as e:
             logger.error(f"crawl4ai 爬取失败: {str(e)}")
             return []
+    
+    async def _parse_rendered_result(self, result, website_url: str, crawl_config: Dict) -> List[Dict]:
+        """在一次渲染结果上依次尝试各解析策略，返回第一个有结果的策略的视频列表"""
+        # 渲染结果中可解析的HTML内容，相同内容只解析一次
+        soups = []
+        seen_contents = set()
+        for attr in ['html', 'cleaned_html', 'body', 'content', 'text']:
+            content = getattr(result, attr, None)
+            if isinstance(content, str) and content and content not in seen_contents:
+                seen_contents.add(content)
+                soups.append((attr, make_soup(content)))
+        
+        if not soups:
+            logger.warning("crawl4ai 渲染结果中没有HTML内容")
+            return []
+        self._last_soup = soups[0][1]
+        
+        # 策略1: 自动解析
+        for attr, soup in soups:
+            videos = await self._auto_parse_videos(soup, website_url)
+            if videos:
+                logger.info(f"自动解析 {attr} 内容成功，找到 {len(videos)} 个视频")
+                return videos
+        
+        # 策略2: 按配置的视频元素选择器提取
+        video_selector = crawl_config.get('video_selector', 'video, iframe[src*="youtube"], iframe[src*="vimeo"], div[class*="video"], div[class*="player"]')
+        for attr, soup in soups:
+            videos = []
+            for element in soup.select(video_selector):
+                video_info = await self._extract_video_info(element, website_url)
+                if video_info:
+                    videos.append(video_info)
+            if videos:
+                logger.info(f"按视频选择器提取 {attr} 内容成功，找到 {len(videos)} 个视频")
+                return videos
+        
+        logger.warning("所有解析策略都未找到视频")
+        return []
 
     async def _crawl_traditional(self, website_url: str, crawl_config: Dict) -> List[Dict]:
         """使用传统方法进行爬取（备用方案）"""
@@ -211,7 +410,9 @@ class CrawlerService:
             logger.info(f"使用传统方法爬取网站: {website_url}")
             
             # 获取网站内容
-            html_content = await self._fetch_website_content(website_url)
+            html_content = await self._fetch_website_content(website_url, crawl_config)
+            if self.page_unchanged:
+                return []
             if not html_content:
                 logger.error(f"无法获取网站内容: {website_url}")
                 return []
@@ -225,23 +426,85 @@ class CrawlerService:
             logger.error(f"传统爬取方法失败: {str(e)}")
             return []
 
-    async def _fetch_website_content(self, url: str) -> Optional[str]:
-        """获取网站HTML内容"""
+    async def _fetch_website_content(self, url: str, crawl_config: Dict = None) -> Optional[str]:
+        """
+        获取网站HTML内容
+        
+        传入爬取配置时使用页面缓存：携带 If-None-Match/If-Modified-Since 发起条件请求，
+        返回304或内容哈希与上次相同时将 page_unchanged 置为True并返回None；
+        配置中 force_refresh 为True时忽略缓存
+        """
         try:
-            async with self.session.get(url, timeout=30) as response:
-                if response.status == 200:
+            loop = asyncio.get_running_loop()
+            config_hash, cached = await self._get_page_cache(url, crawl_config)
+            
+            async with self._host_slot(url):
+                async with self.session.get(url, headers=page_cache_service.conditional_headers(cached),
+                                            timeout=self.request_timeout) as response:
+                    etag = response.headers.get('ETag')
+                    last_modified = response.headers.get('Last-Modified')
+                    if response.status == 304 and cached:
+                        logger.info(f"页面未修改(304): {url}")
+                        self.page_unchanged = True
+                        await loop.run_in_executor(None, lambda: page_cache_service.mark_not_modified(
+                            url, etag=etag, last_modified=last_modified))
+                        return None
+                    if response.status != 200:
+                        logger.error(f"HTTP请求失败: {url}, 状态码: {response.status}")
+                        return None
+                    
+                    body = await response.read()
+                    if config_hash is None:
+                        return await response.text()
+                    
+                    content_hash = make_content_hash(body)
+                    if await self._check_unchanged(url, cached, content_hash, config_hash, etag, last_modified):
+                        return None
                     return await response.text()
-                else:
-                    logger.error(f"HTTP请求失败: {url}, 状态码: {response.status}")
-                    return None
         except Exception as e:
             logger.error(f"获取网站内容失败: {url}, 错误: {str(e)}")
             return None
     
+    async def _get_page_cache(self, url: str, crawl_config: Optional[Dict]):
+        """
+        查询页面缓存
+
+        Returns:
+            (配置哈希, 缓存校验信息)：未传入爬取配置时配置哈希为None（不使用缓存），force_refresh时缓存为None
+        """
+        if crawl_config is None:
+            return None, None
+        config_hash = make_config_hash(crawl_config)
+        if crawl_config.get('force_refresh'):
+            return config_hash, None
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, page_cache_service.get, url, config_hash)
+        return config_hash, cached
+    
+    async def _check_unchanged(self, url: str, cached: Optional[Dict], content_hash: str, config_hash: str,
+                               etag: str = None, last_modified: str = None) -> bool:
+        """
+        内容哈希与缓存相同时将 page_unchanged 置为True并返回True；
+        不同时把新的校验信息加入待写入列表（随爬取结果返回）
+        """
+        if cached and cached.get('content_hash') == content_hash:
+            logger.info(f"页面内容未变化: {url}")
+            self.page_unchanged = True
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, lambda: page_cache_service.mark_not_modified(
+                url, unchanged=True, etag=etag, last_modified=last_modified))
+            return True
+        self._pending_page_caches.append({
+            'url': url, 'content_hash': content_hash, 'config_hash': config_hash,
+            'etag': etag, 'last_modified': last_modified,
+        })
+        return False
+    
     async def _parse_videos(self, html_content: str, base_url: str, crawl_config: Dict) -> List[Dict]:
         """解析HTML中的视频信息"""
         videos = []
-        soup = BeautifulSoup(html_content, 'html.parser')
+        soup = make_soup(html_content)
+        self._last_soup = soup
         
         # 根据配置选择解析策略
         parse_strategy = crawl_config.get('parse_strategy', 'auto')
@@ -259,21 +522,19 @@ class CrawlerService:
         
         # 1. 首先查找所有视频相关标签（任何网站都应该优先查找）
         logger.info("优先查找视频相关标签")
-        video_selectors = [
-            'video', 'iframe[src*="youtube"]', 'iframe[src*="vimeo"]', 'iframe[src*="bilibili"]',
-            'iframe[src*="player"]', 'iframe[src*="embed"]', 'iframe[src*="watch"]',
-            'div[class*="video"]', 'div[class*="player"]', 'div[class*="media"]',
-            'a[href*="video"]', 'a[href*="watch"]', 'a[href*="play"]',
-            'object[type*="video"]', 'embed[type*="video"]',
-            '[data-type="video"]', '[data-video]', '[class*="video-player"]'
-        ]
+        # 一次遍历得到视频与媒体选择器的全部匹配，再按选择器顺序处理，结果顺序与逐个select相同
+        matches = AUTO_PLAN.select_all(soup)
+        # 同一元素可能匹配多个选择器，只提取一次
+        extracted = {}
         
-        for selector in video_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                video_info = await self._extract_video_info(element, base_url)
+        for selector in VIDEO_SELECTORS:
+            for element in matches[selector]:
+                key = id(element)
+                if key not in extracted:
+                    extracted[key] = await self._extract_video_info(element, base_url)
+                video_info = extracted[key]
                 if video_info:
-                    videos.append(video_info)
+                    videos.append(dict(video_info))
                     logger.info(f"找到视频元素: {video_info.get('video_title', 'Unknown')}")
         
         # 2. 如果找到视频，直接返回
@@ -298,19 +559,16 @@ class CrawlerService:
         
         # 4. 对于其他网站，尝试查找媒体内容
         logger.info("未找到视频元素，尝试查找其他媒体内容")
-        media_selectors = [
-            'img[src*="video"]', 'img[src*="thumb"]', 'img[src*="preview"]',
-            'div[class*="media"]', 'div[class*="content"]', 'div[class*="item"]',
-            'article', 'section', '.post', '.entry'
-        ]
-        
-        for selector in media_selectors:
-            elements = soup.select(selector)
-            for element in elements:
+        extracted = {}
+        for selector in MEDIA_SELECTORS:
+            for element in matches[selector]:
                 # 尝试从媒体元素中提取信息
-                media_info = self._extract_media_info(element, base_url)
+                key = id(element)
+                if key not in extracted:
+                    extracted[key] = self._extract_media_info(element, base_url)
+                media_info = extracted[key]
                 if media_info:
-                    videos.append(media_info)
+                    videos.append(dict(media_info))
         
         # 5. 如果仍然没有找到内容，尝试提取页面基本信息
         if not videos:
@@ -334,8 +592,10 @@ class CrawlerService:
         videos = []
         
         try:
+            matches = BASIC_PAGE_PLAN.select_all(soup)
+            
             # 提取页面标题
-            page_title = soup.find('title')
+            page_title = matches['title'][0] if matches['title'] else None
             if page_title:
                 title_text = page_title.get_text(strip=True)
                 if title_text and len(title_text) > 5:
@@ -354,7 +614,7 @@ class CrawlerService:
             
             # 提取主要标题
             for i in range(1, 7):
-                headings = soup.find_all(f'h{i}')
+                headings = matches[f'h{i}']
                 for heading in headings[:3]:  # 只取前3个
                     heading_text = heading.get_text(strip=True)
                     if heading_text and len(heading_text) > 5:
@@ -372,7 +632,7 @@ class CrawlerService:
                         })
             
             # 提取主要链接
-            main_links = soup.find_all('a', href=True)
+            main_links = matches['a[href]']
             link_count = 0
             for link in main_links:
                 if link_count >= 5:  # 限制数量
@@ -413,48 +673,42 @@ class CrawlerService:
         videos = []
         
         try:
+            # 一次遍历得到以下各步骤所有选择器的匹配
+            matches = MNB_PLAN.select_all(soup)
+            # 同一元素可能匹配多个选择器，媒体信息只提取一次
+            extracted = {}
+            
+            def media_info_of(element):
+                key = id(element)
+                if key not in extracted:
+                    extracted[key] = self._extract_media_info(element, base_url)
+                return extracted[key]
+            
             # 1. 优先查找直播和视频相关内容
             logger.info("查找直播和视频相关内容")
             
             # 查找直播相关元素
-            live_selectors = [
-                'div[class*="live"]', 'div[class*="stream"]', 'div[class*="broadcast"]',
-                'div[class*="tv"]', 'div[class*="radio"]', 'div[class*="channel"]',
-                'iframe[src*="live"]', 'iframe[src*="stream"]', 'iframe[src*="tv"]',
-                'video', 'audio', 'embed[type*="video"]', 'embed[type*="audio"]',
-                'object[type*="video"]', 'object[type*="audio"]'
-            ]
-            
-            for selector in live_selectors:
-                elements = soup.select(selector)
-                for element in elements:
-                    video_info = self._extract_media_info(element, base_url)
+            for selector in MNB_LIVE_SELECTORS:
+                for element in matches[selector]:
+                    video_info = media_info_of(element)
                     if video_info:
-                        videos.append(video_info)
+                        videos.append(dict(video_info))
             
             # 2. 查找节目时间表和新闻内容
             logger.info("查找节目时间表和新闻内容")
             
             # 查找所有可能的新闻和节目链接
-            news_selectors = [
-                'a[href*="/news"]', 'a[href*="/program"]', 'a[href*="/live"]',
-                'a[href*="/tv"]', 'a[href*="/radio"]', 'a[href*="/broadcast"]',
-                '.news-item', '.program-item', '.live-item', '.tv-item',
-                'div[class*="news"]', 'div[class*="program"]', 'div[class*="live"]'
-            ]
-            
-            for selector in news_selectors:
-                elements = soup.select(selector)
-                for element in elements:
-                    video_info = self._extract_media_info(element, base_url)
+            for selector in MNB_NEWS_SELECTORS:
+                for element in matches[selector]:
+                    video_info = media_info_of(element)
                     if video_info:
-                        videos.append(video_info)
+                        videos.append(dict(video_info))
             
             # 3. 查找新闻文章和链接
             logger.info("查找新闻文章和链接")
             
             # 查找所有链接，包括新闻标题
-            all_links = soup.find_all('a', href=True)
+            all_links = matches['a[href]']
             for link in all_links:
                 href = link.get('href', '')
                 text = link.get_text(strip=True)
@@ -478,14 +732,8 @@ class CrawlerService:
             logger.info("查找主要内容区域")
             
             # 查找主要内容容器
-            content_selectors = [
-                '.content', '.main-content', '.article', '.post',
-                '.news-content', '.program-content', '.live-content'
-            ]
-            
-            for selector in content_selectors:
-                elements = soup.select(selector)
-                for element in elements:
+            for selector in MNB_CONTENT_SELECTORS:
+                for element in matches[selector]:
                     # 查找元素内的所有文本内容
                     text_content = element.get_text(strip=True)
                     if len(text_content) > 20:  # 过滤太短的内容
@@ -502,14 +750,8 @@ class CrawlerService:
             logger.info("查找频道和媒体信息")
             
             # 查找频道信息
-            channel_selectors = [
-                '.channel', '.station', '.frequency', '.program-schedule',
-                '[class*="channel"]', '[class*="station"]', '[class*="frequency"]'
-            ]
-            
-            for selector in channel_selectors:
-                elements = soup.select(selector)
-                for element in elements:
+            for selector in MNB_CHANNEL_SELECTORS:
+                for element in matches[selector]:
                     text_content = element.get_text(strip=True)
                     if text_content and len(text_content) > 5:
                         video_info = {
@@ -525,14 +767,8 @@ class CrawlerService:
             logger.info("查找时间表信息")
             
             # 查找时间表
-            schedule_selectors = [
-                '.schedule', '.timetable', '.program-list', '.time-slot',
-                '[class*="schedule"]', '[class*="timetable"]', '[class*="time"]'
-            ]
-            
-            for selector in schedule_selectors:
-                elements = soup.select(selector)
-                for element in elements:
+            for selector in MNB_SCHEDULE_SELECTORS:
+                for element in matches[selector]:
                     text_content = element.get_text(strip=True)
                     if text_content and len(text_content) > 10:
                         video_info = {
@@ -548,14 +784,8 @@ class CrawlerService:
             logger.info("查找所有文本内容")
             
             # 查找所有段落和文本块
-            text_selectors = [
-                'p', 'div', 'span', 'li', 'td', 'th',
-                '[class*="text"]', '[class*="content"]', '[class*="info"]'
-            ]
-            
-            for selector in text_selectors:
-                elements = soup.select(selector)
-                for element in elements:
+            for selector in MNB_TEXT_SELECTORS:
+                for element in matches[selector]:
                     text_content = element.get_text(strip=True)
                     if text_content and len(text_content) > 15 and len(text_content) < 500:
                         # 过滤掉导航和重复内容
@@ -572,7 +802,7 @@ class CrawlerService:
             # 8. 查找所有链接，提取新闻和节目信息
             logger.info("查找所有链接信息")
             
-            all_links = soup.find_all('a', href=True)
+            all_links = matches['a[href]']
             for link in all_links:
                 href = link.get('href', '')
                 text = link.get_text(strip=True)
@@ -678,8 +908,11 @@ class CrawlerService:
         try:
             video_info = {}
             
+            # 一次遍历元素子树，得到标题、描述、缩略图各选择器的第一个匹配
+            firsts = FIELD_PLAN.select_first(element)
+            
             # 提取标题
-            title = self._extract_title(element)
+            title = self._extract_title(element, firsts)
             if title:
                 video_info['video_title'] = title
             
@@ -689,12 +922,12 @@ class CrawlerService:
                 video_info['video_url'] = url
             
             # 提取描述
-            description = self._extract_description(element)
+            description = self._extract_description(element, firsts)
             if description:
                 video_info['video_description'] = description
             
             # 提取缩略图
-            thumbnail = self._extract_thumbnail(element, base_url)
+            thumbnail = self._extract_thumbnail(element, base_url, firsts)
             if thumbnail:
                 video_info['thumbnail_url'] = thumbnail
             
@@ -717,8 +950,10 @@ class CrawlerService:
     def _extract_media_info(self, element, base_url: str) -> Optional[Dict]:
         """提取媒体信息（同步版本）"""
         try:
+            firsts = FIELD_PLAN.select_first(element)
+            
             # 提取标题
-            title = self._extract_title(element)
+            title = self._extract_title(element, firsts)
             if not title:
                 return None
             
@@ -733,7 +968,7 @@ class CrawlerService:
                 description = title
             
             # 提取缩略图
-            thumbnail = self._extract_thumbnail(element, base_url)
+            thumbnail = self._extract_thumbnail(element, base_url, firsts)
             
             return {
                 'video_title': title,
@@ -746,16 +981,14 @@ class CrawlerService:
             logger.warning(f"提取媒体信息失败: {str(e)}")
             return None
     
-    def _extract_title(self, element) -> Optional[str]:
-        """提取标题"""
-        # 尝试多种方式提取标题
-        title_selectors = [
-            'title', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
-            '[class*="title"]', '[class*="name"]', '[class*="heading"]'
-        ]
+    def _extract_title(self, element, firsts: Dict = None) -> Optional[str]:
+        """提取标题（firsts 为 FIELD_PLAN.select_first 的结果，为空时自行遍历）"""
+        if firsts is None:
+            firsts = FIELD_PLAN.select_first(element)
         
-        for selector in title_selectors:
-            title_elem = element.select_one(selector)
+        # 尝试多种方式提取标题
+        for selector in TITLE_SELECTORS:
+            title_elem = firsts[selector]
             if title_elem:
                 title = title_elem.get_text(strip=True)
                 if title and len(title) > 3:  # 过滤太短的标题
@@ -787,16 +1020,14 @@ class CrawlerService:
         
         return None
     
-    def _extract_description(self, element) -> Optional[str]:
+    def _extract_description(self, element, firsts: Dict = None) -> Optional[str]:
         """提取描述"""
-        # 尝试多种方式提取描述
-        desc_selectors = [
-            'p', 'span', 'div',
-            '[class*="description"]', '[class*="desc"]', '[class*="summary"]'
-        ]
+        if firsts is None:
+            firsts = FIELD_PLAN.select_first(element)
         
-        for selector in desc_selectors:
-            desc_elem = element.select_one(selector)
+        # 尝试多种方式提取描述
+        for selector in DESCRIPTION_SELECTORS:
+            desc_elem = firsts[selector]
             if desc_elem:
                 desc = desc_elem.get_text(strip=True)
                 if desc and len(desc) > 10:  # 过滤太短的描述
@@ -804,13 +1035,14 @@ class CrawlerService:
         
         return None
     
-    def _extract_thumbnail(self, element, base_url: str) -> Optional[str]:
+    def _extract_thumbnail(self, element, base_url: str, firsts: Dict = None) -> Optional[str]:
         """提取缩略图"""
-        # 尝试多种方式提取缩略图
-        img_selectors = ['img', '[class*="thumbnail"]', '[class*="thumb"]']
+        if firsts is None:
+            firsts = FIELD_PLAN.select_first(element)
         
-        for selector in img_selectors:
-            img_elem = element.select_one(selector)
+        # 尝试多种方式提取缩略图
+        for selector in THUMBNAIL_SELECTORS:
+            img_elem = firsts[selector]
             if img_elem:
                 src = img_elem.get('src') or img_elem.get('data-src')
                 if src:
@@ -824,37 +1056,26 @@ class CrawlerService:
             logger.warning("翻译服务不可用，跳过翻译")
             return videos
         
+        # 标题和描述合并为一次分批翻译
+        try:
+            texts = [video.get('video_title') for video in videos] + [video.get('video_description') for video in videos]
+            translations = self.translate_service.translate_batch(texts, target_language='zh-CN')
+        except Exception as e:
+            logger.error(f"翻译视频信息失败: {str(e)}")
+            translations = [None] * (len(videos) * 2)
+        
         translated_videos = []
-        for video in videos:
-            try:
-                # 翻译标题
-                if video.get('video_title'):
-                    translated_title = self.translate_service.translate_text(
-                        video['video_title'], 
-                        target_language='zh-CN'
-                    )
-                    video['translated_title'] = translated_title
-                
-                # 翻译描述
-                if video.get('video_description'):
-                    translated_description = self.translate_service.translate_text(
-                        video['video_description'], 
-                        target_language='zh-CN'
-                    )
-                    video['translated_description'] = translated_description
-                
-                # 设置语言标识
-                video['language'] = 'zh-CN' # 默认中文，根据实际语言调整
-                
-                translated_videos.append(video)
-                
-            except Exception as e:
-                logger.error(f"翻译视频信息失败: {str(e)}")
-                # 即使翻译失败，也保留原视频信息
-                video['translated_title'] = video.get('video_title', '')
-                video['translated_description'] = video.get('video_description', '')
-                video['language'] = 'zh-CN'
-                translated_videos.append(video)
+        count = len(videos)
+        for video, translated_title, translated_description in zip(videos, translations[:count], translations[count:]):
+            if video.get('video_title'):
+                video['translated_title'] = translated_title
+            if video.get('video_description'):
+                video['translated_description'] = translated_description
+            
+            # 设置语言标识
+            video['language'] = 'zh-CN' # 默认中文，根据实际语言调整
+            
+            translated_videos.append(video)
         
         return translated_videos
     
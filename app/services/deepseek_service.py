@@ -8,6 +8,15 @@ import os
 from typing import Dict, Any, Optional
 from openai import OpenAI
 from ..config import AppConfig
+from .rate_limit_service import rate_limit_registry
+
+# DeepSeek API调用保护（限流、并发上限、熔断）
+deepseek_api_guard = rate_limit_registry.register(
+    'deepseek',
+    rate=AppConfig.DEEPSEEK_API_RATE_PER_SEC,
+    burst=AppConfig.DEEPSEEK_API_BURST,
+    max_concurrency=AppConfig.DEEPSEEK_API_MAX_CONCURRENCY
+)
 
 
 class DeepSeekService:
@@ -65,7 +74,8 @@ class DeepSeekService:
             event_description = self._build_event_description(event_info)
             
             # 调用DeepSeek API生成关键词
-            response = self.client.chat.completions.create(
+            response = deepseek_api_guard.execute(
+                self.client.chat.completions.create,
                 model="deepseek-reasoner",  # 使用一致的模型
                 messages=[
                     {"role": "system", "content": self._get_system_prompt()},
@@ -144,7 +154,8 @@ class DeepSeekService:
             return False
         
         try:
-            response = self.client.chat.completions.create(
+            response = deepseek_api_guard.execute(
+                self.client.chat.completions.create,
                 model="deepseek-reasoner",
                 messages=[
                     {"role": "user", "content": "Hello"}
@@ -0,0 +1,434 @@
+# -*- coding: utf-8 -*-
+"""
+已下载文件索引服务
+下载完成时把文件写入索引，文件列表直接从索引分页排序，不再每次请求都遍历下载目录并逐个stat；
+索引按目录用 os.scandir 增量校正：目录修改时间未变化且未到扫描间隔时跳过扫描，
+扫描时只写入新增、大小或修改时间变化的文件，并删除已不存在的文件；
+索引同时用于下载去重：按（视频ID, 格式）查找同一目录中的已有文件，下载完成后按内容哈希合并
+同一目录中的重复文件，内容相同的其他（视频ID, 格式）记录为已有文件的别名，之后下载前即可直接复用
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from sqlalchemy import delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..config import AppConfig
+from ..database import db_manager
+from ..models import DownloadedFile, DownloadedFileAlias, get_east8_time
+
+# 下载中的临时文件不进入索引
+TEMP_SUFFIXES = ('.part', '.ytdl', '.temp', '.tmp')
+
+# 单条SQL绑定参数上限，批量删除按此大小分批
+DELETE_BATCH_SIZE = 500
+
+# 计算内容哈希时每次读取的字节数
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+SORT_FIELDS = {
+    'name': DownloadedFile.name,
+    'size': DownloadedFile.size,
+    'created_time': DownloadedFile.created_time,
+    'modified_time': DownloadedFile.modified_time,
+}
+
+
+def is_temp_file(name: str) -> bool:
+    """是否为下载中的临时文件（含分片文件 *.part-Frag*）"""
+    return name.endswith(TEMP_SUFFIXES) or '.part-Frag' in name
+
+
+def compute_checksum(path: str) -> str:
+    """流式计算文件的SHA-256，内存占用与文件大小无关"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_row(path: str, stat: os.stat_result, sha256: str = None) -> Dict[str, Any]:
+    # 扫描发现的新文件或内容变化的文件没有哈希，写入时清空旧哈希
+    return {
+        'path': path,
+        'directory': os.path.dirname(path),
+        'name': os.path.basename(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'created_time': datetime.fromtimestamp(stat.st_ctime),
+        'modified_time': datetime.fromtimestamp(stat.st_mtime),
+        'sha256': sha256,
+    }
+
+
+def _file_info(row: DownloadedFile) -> Dict[str, Any]:
+    """与下载结果中的文件信息格式相同"""
+    return {
+        'path': row.path,
+        'name': row.name,
+        'size': row.size,
+        'size_mb': round((row.size or 0) / (1024 * 1024), 2),
+        'created_time': row.created_time.isoformat() if row.created_time else None,
+    }
+
+
+class DownloadLibraryService:
+    """已下载文件索引服务"""
+
+    def __init__(self, scan_interval: int = None):
+        self.scan_interval = AppConfig.DOWNLOAD_LIBRARY_SCAN_INTERVAL if scan_interval is None else scan_interval
+        self._lock = threading.Lock()
+        # 目录 -> (上次扫描时的目录修改时间, 上次扫描的时间点)
+        self._dir_state = {}
+        self.stats = {'scans': 0, 'skipped_scans': 0, 'recorded': 0,
+                      'files_added': 0, 'files_updated': 0, 'files_removed': 0,
+                      'video_dedup_hits': 0, 'content_dedup_hits': 0, 'dedup_saved_bytes': 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _upsert(self, db, rows: List[Dict[str, Any]], link_fields: bool = False):
+        if not rows:
+            return
+        now = get_east8_time()
+        for row in rows:
+            row.setdefault('indexed_at', now)
+            row['updated_at'] = now
+        stmt = sqlite_insert(DownloadedFile)
+        set_ = {column: stmt.excluded[column]
+                for column in ('directory', 'name', 'size', 'mtime_ns', 'created_time', 'modified_time',
+                               'sha256', 'updated_at')}
+        if link_fields:
+            for column in ('video_id', 'job_id', 'format_id', 'last_accessed_at'):
+                set_[column] = stmt.excluded[column]
+        db.execute(stmt.on_conflict_do_update(index_elements=['path'], set_=set_), rows)
+
+    def record_files(self, files: List[Dict], video_id: str = None, job_id: str = None,
+                     format_id: str = None) -> List[Dict[str, Any]]:
+        """
+        下载完成时把文件写入索引，并流式计算内容哈希
+
+        启用去重时，内容与同一目录中已有文件完全相同的新文件在索引提交后删除，返回结果中替换为已有文件
+
+        Args:
+            files: 下载结果中的文件列表（包含 path）
+            video_id: 规范化视频ID
+            job_id: 下载任务ID
+            format_id: 下载格式
+
+        Returns:
+            List[Dict[str, Any]]: 去重后的文件列表
+        """
+        result = []
+        rows = []
+        redundant = []
+        now = datetime.now()
+        db = db_manager.get_session()
+        try:
+            for file_info in files or []:
+                path = os.path.abspath(file_info['path'])
+                try:
+                    sha256 = compute_checksum(path)
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+
+                duplicate = self._find_duplicate(db, path, sha256, stat.st_size) if AppConfig.DOWNLOAD_DEDUP_ENABLED else None
+                if duplicate is not None:
+                    # 同一内容已存在（如不同标题或带时间戳的文件名），复用已有文件，新文件在提交后删除
+                    redundant.append((path, duplicate.path))
+                    if not duplicate.video_id:
+                        duplicate.video_id = video_id
+                        duplicate.format_id = format_id
+                    elif video_id and (duplicate.video_id, duplicate.format_id) != (video_id, format_id):
+                        self._record_alias(db, duplicate, video_id, format_id)
+                    duplicate.last_accessed_at = now
+                    self._count('content_dedup_hits')
+                    self._count('dedup_saved_bytes', stat.st_size)
+                    result.append(_file_info(duplicate))
+                    continue
+
+                row = _file_row(path, stat, sha256)
+                row.update(video_id=video_id, job_id=job_id, format_id=format_id, last_accessed_at=now)
+                rows.append(row)
+                result.append(dict(file_info, path=path, sha256=sha256))
+
+            self._upsert(db, rows, link_fields=True)
+            db.commit()
+            self._count('recorded', len(rows))
+        except Exception as e:
+            db.rollback()
+            print(f"写入已下载文件索引失败: {e}")
+            return files or []
+        finally:
+            db.close()
+
+        for path, existing_path in redundant:
+            try:
+                os.remove(path)
+                print(f"下载的文件与已有文件内容相同，已删除: {path} -> {existing_path}")
+            except OSError as e:
+                print(f"删除重复文件失败: {path}: {e}")
+        return result
+
+    def _find_duplicate(self, db, path: str, sha256: str, size: int) -> Optional[DownloadedFile]:
+        """查找同一目录中内容相同、且仍在磁盘上的其他文件"""
+        candidates = db.query(DownloadedFile).filter(
+            DownloadedFile.sha256 == sha256,
+            DownloadedFile.size == size,
+            DownloadedFile.directory == os.path.dirname(path),
+            DownloadedFile.path != path
+        ).all()
+        for candidate in candidates:
+            if os.path.isfile(candidate.path) and os.path.getsize(candidate.path) == size:
+                return candidate
+        return None
+
+    def _record_alias(self, db, file_row: DownloadedFile, video_id: str, format_id: str):
+        """把（视频ID, 格式）记录为已有文件的别名（已存在时改为指向该文件）"""
+        stmt = sqlite_insert(DownloadedFileAlias).values(
+            file_id=file_row.id, video_id=video_id, format_id=format_id,
+            sha256=file_row.sha256, created_at=get_east8_time())
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=['video_id', 'format_id'],
+            set_={'file_id': stmt.excluded.file_id, 'sha256': stmt.excluded.sha256,
+                  'created_at': stmt.excluded.created_at}
+        ))
+
+    def find_reusable(self, video_id: str, format_id: str, directory: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        查找同一视频同一格式已下载到目标目录的文件（仍在磁盘上且大小未变化），找到时更新最近使用时间
+
+        先按文件本身的（视频ID, 格式）查找，再按别名查找内容相同的文件；其他目录中的文件不复用
+
+        Args:
+            video_id: 规范化视频ID
+            format_id: 下载格式
+            directory: 本次下载的目标目录
+
+        Returns:
+            Optional[List[Dict[str, Any]]]: 已有文件列表，没有时返回None
+        """
+        if not video_id or not AppConfig.DOWNLOAD_DEDUP_ENABLED:
+            return None
+        directory = os.path.abspath(directory)
+        db = db_manager.get_session()
+        try:
+            format_id = format_id or 'best'
+            rows = db.query(DownloadedFile).filter(
+                DownloadedFile.video_id == video_id,
+                DownloadedFile.format_id == format_id,
+                DownloadedFile.directory == directory
+            ).all()
+            files = []
+            stale_ids = []
+            for row in rows:
+                try:
+                    if os.path.getsize(row.path) == row.size:
+                        files.append(row)
+                        continue
+                except OSError:
+                    pass
+                stale_ids.append(row.id)
+            if stale_ids:
+                db.execute(delete(DownloadedFile).where(DownloadedFile.id.in_(stale_ids)))
+
+            if not files:
+                aliases = db.query(DownloadedFileAlias, DownloadedFile).outerjoin(
+                    DownloadedFile, DownloadedFile.id == DownloadedFileAlias.file_id
+                ).filter(
+                    DownloadedFileAlias.video_id == video_id,
+                    DownloadedFileAlias.format_id == format_id
+                ).all()
+                stale_alias_ids = []
+                for alias, row in aliases:
+                    if row is not None and row.directory != directory:
+                        continue
+                    # 文件已删除、内容已变化或已不在磁盘上时别名失效
+                    if (row is not None and row.id not in stale_ids and row.sha256 == alias.sha256
+                            and os.path.isfile(row.path) and os.path.getsize(row.path) == row.size):
+                        files.append(row)
+                    else:
+                        stale_alias_ids.append(alias.id)
+                if stale_alias_ids:
+                    db.execute(delete(DownloadedFileAlias).where(DownloadedFileAlias.id.in_(stale_alias_ids)))
+            now = datetime.now()
+            for row in files:
+                row.last_accessed_at = now
+            db.commit()
+            if not files:
+                return None
+            self._count('video_dedup_hits')
+            self._count('dedup_saved_bytes', sum(row.size or 0 for row in files))
+            return [_file_info(row) for row in files]
+        except Exception as e:
+            db.rollback()
+            print(f"查找已下载文件失败: {e}")
+            return None
+        finally:
+            db.close()
+
+    def touch(self, path: str):
+        """文件被下载时更新最近使用时间"""
+        db = db_manager.get_session()
+        try:
+            db.query(DownloadedFile).filter(DownloadedFile.path == os.path.abspath(path)).update(
+                {'last_accessed_at': datetime.now()}, synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"更新文件使用时间失败: {e}")
+        finally:
+            db.close()
+
+    def reconcile(self, directory: str, force: bool = False) -> Dict[str, int]:
+        """
+        按文件系统校正目录的索引
+
+        目录的修改时间在新增、删除、重命名文件时变化；未变化且距上次扫描不足扫描间隔时跳过，
+        超过扫描间隔时仍完整扫描一次，以发现原地修改的文件
+
+        Args:
+            directory: 目录
+            force: 是否忽略目录修改时间和扫描间隔强制扫描
+
+        Returns:
+            Dict[str, int]: 新增、更新、删除的文件数；跳过扫描时返回 skipped=1
+        """
+        directory = os.path.abspath(directory)
+        try:
+            dir_mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            dir_mtime_ns = None
+
+        with self._lock:
+            state = self._dir_state.get(directory)
+            if (not force and state and dir_mtime_ns is not None and state[0] == dir_mtime_ns
+                    and time.monotonic() - state[1] < self.scan_interval):
+                self.stats['skipped_scans'] += 1
+                return {'added': 0, 'updated': 0, 'removed': 0, 'skipped': 1}
+            # 先记录扫描前的目录修改时间，扫描期间发生的变化会在下次触发重新扫描
+            self._dir_state[directory] = (dir_mtime_ns, time.monotonic())
+
+        db = db_manager.get_session()
+        try:
+            known = {
+                name: (file_id, size, mtime_ns)
+                for file_id, name, size, mtime_ns in db.query(
+                    DownloadedFile.id, DownloadedFile.name, DownloadedFile.size, DownloadedFile.mtime_ns
+                ).filter(DownloadedFile.directory == directory).all()
+            }
+
+            changed_rows = []
+            added = 0
+            seen = set()
+            if dir_mtime_ns is not None:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if is_temp_file(entry.name) or not entry.is_file():
+                            continue
+                        seen.add(entry.name)
+                        stat = entry.stat()
+                        indexed = known.get(entry.name)
+                        if indexed is None:
+                            added += 1
+                        elif indexed[1] == stat.st_size and indexed[2] == stat.st_mtime_ns:
+                            continue
+                        changed_rows.append(_file_row(os.path.join(directory, entry.name), stat))
+
+            removed_ids = [file_id for name, (file_id, _, _) in known.items() if name not in seen]
+            self._upsert(db, changed_rows)
+            for i in range(0, len(removed_ids), DELETE_BATCH_SIZE):
+                db.execute(delete(DownloadedFile).where(DownloadedFile.id.in_(removed_ids[i:i + DELETE_BATCH_SIZE])))
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                self._dir_state.pop(directory, None)
+            raise
+        finally:
+            db.close()
+
+        result = {'added': added, 'updated': len(changed_rows) - added, 'removed': len(removed_ids), 'skipped': 0}
+        with self._lock:
+            self.stats['scans'] += 1
+            self.stats['files_added'] += result['added']
+            self.stats['files_updated'] += result['updated']
+            self.stats['files_removed'] += result['removed']
+        if added or result['updated'] or removed_ids:
+            print(f"已下载文件索引已校正: {directory}，新增 {added}，更新 {result['updated']}，删除 {len(removed_ids)}")
+        return result
+
+    def list_files(self, directory: str, page: int = 1, per_page: int = 100,
+                   sort: str = 'created_time', order: str = 'desc') -> Dict[str, Any]:
+        """
+        从索引分页获取目录中的文件
+
+        Args:
+            directory: 目录
+            page: 页码（从1开始）
+            per_page: 每页文件数
+            sort: 排序字段：name / size / created_time / modified_time
+            order: asc / desc
+
+        Returns:
+            Dict[str, Any]: files / total / page / per_page / pages
+        """
+        directory = os.path.abspath(directory)
+        column = SORT_FIELDS.get(sort, DownloadedFile.created_time)
+        ordering = [column.asc(), DownloadedFile.id.asc()] if order == 'asc' else [column.desc(), DownloadedFile.id.desc()]
+        page = max(page, 1)
+
+        db = db_manager.get_session()
+        try:
+            query = db.query(DownloadedFile).filter(DownloadedFile.directory == directory)
+            total = query.count()
+            rows = query.order_by(*ordering).offset((page - 1) * per_page).limit(per_page).all()
+            files = [{
+                'name': row.name,
+                'path': row.path,
+                'size': row.size,
+                'size_mb': round((row.size or 0) / (1024 * 1024), 2),
+                'created_time': row.created_time.isoformat() if row.created_time else None,
+                'modified_time': row.modified_time.isoformat() if row.modified_time else None,
+                'video_id': row.video_id,
+            } for row in rows]
+        finally:
+            db.close()
+
+        return {
+            'files': files,
+            'total': total,
+            'page': page,
+            'per_page': per_page,
+            'pages': (total + per_page - 1) // per_page,
+        }
+
+    def remove(self, path: str):
+        """文件删除后移出索引"""
+        db = db_manager.get_session()
+        try:
+            db.execute(delete(DownloadedFile).where(DownloadedFile.path == os.path.abspath(path)))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"删除已下载文件索引失败: {e}")
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取索引统计：扫描与跳过次数、新增/更新/删除的文件数"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['directories'] = len(self._dir_state)
+        stats['scan_interval'] = self.scan_interval
+        return stats
+
+
+# 单例服务
+download_library = DownloadLibraryService()
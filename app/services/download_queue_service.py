@@ -0,0 +1,469 @@
+# -*- coding: utf-8 -*-
+"""
+视频下载任务队列服务
+下载任务持久化在SQLite中，由固定大小的工作线程池按提交顺序领取，同一主机同时下载的任务数受限；
+取消正在下载的任务时由 yt-dlp 进度回调抛出 DownloadCancelled 中止下载，
+停机时被中断的任务在下次启动时重新排队；
+同一视频同一格式已下载过时直接复用已有文件，下载完成后按磁盘配额清理下载目录
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse
+from sqlalchemy import update, func
+from yt_dlp.utils import DownloadCancelled
+from ..config import AppConfig
+from ..database import db_manager
+from ..models import DownloadJob, get_east8_time
+from .youtube_downloader import get_youtube_downloader
+from .rate_limit_service import TokenBucket
+from .download_library_service import download_library
+from .download_quota_service import download_quota
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_DOWNLOADING = 'downloading'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+# 取消请求已发出、等待下载线程中止
+JOB_CANCELLING = 'cancelling'
+
+
+def get_host(url: str) -> str:
+    """按主机限流时使用的主机名（youtu.be 与 youtube.com 视为同一主机）"""
+    host = urlparse(url if '://' in url else f'https://{url}').netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    if host == 'youtu.be' or host.endswith('.youtube.com'):
+        host = 'youtube.com'
+    return host
+
+
+class DownloadQueue:
+    """视频下载任务队列"""
+
+    def __init__(self, workers: int = None, per_host_limit: int = None):
+        self.workers = workers or AppConfig.DOWNLOAD_WORKERS
+        self.per_host_limit = per_host_limit or AppConfig.DOWNLOAD_PER_HOST_LIMIT
+        self.poll_interval = 30
+        # 下载进度写入数据库的最小间隔（秒），实时进度保存在内存中
+        self.progress_interval = 5
+        self._threads = []
+        self._running = False
+        self._start_lock = threading.Lock()
+        # 领取任务、主机计数、取消事件的修改都在该条件变量内完成
+        self._cond = threading.Condition()
+        self._active_hosts = Counter()
+        self._cancel_events = {}
+        self._live = {}
+        self._metrics_lock = threading.Lock()
+        self._metrics = {'submitted': 0, 'completed': 0, 'deduplicated': 0, 'failed': 0, 'cancelled': 0, 'requeued': 0,
+                         'transferred_bytes': 0, 'throttled_seconds': 0.0}
+        # 所有下载合计的带宽上限（按已传输字节数计量，超出时在进度回调中等待）
+        global_rate = AppConfig.DOWNLOAD_GLOBAL_RATE_LIMIT
+        self._bandwidth = TokenBucket(rate=global_rate, capacity=global_rate) if global_rate > 0 else None
+
+    def _count(self, name: str, amount: int = 1):
+        with self._metrics_lock:
+            self._metrics[name] += amount
+
+    def submit(self, urls: List[str], format_id: str = 'best', download_path: str = '',
+               rate_limit: int = None) -> List[str]:
+        """
+        提交下载任务，立即返回
+
+        Args:
+            urls: 视频URL列表
+            format_id: 下载格式
+            download_path: 保存目录，为空时使用下载器默认目录
+            rate_limit: 单个任务的带宽上限（字节/秒），为空时使用配置的默认上限
+
+        Returns:
+            List[str]: 与urls顺序一致的任务ID
+        """
+        now = get_east8_time()
+        jobs = [
+            DownloadJob(job_id=f"download_{uuid.uuid4().hex}", url=url, host=get_host(url),
+                        format_id=format_id or 'best', download_path=download_path or None,
+                        rate_limit=rate_limit or None, status=JOB_QUEUED, progress=0, attempts=0,
+                        created_at=now, updated_at=now)
+            for url in urls
+        ]
+        job_ids = [job.job_id for job in jobs]
+        db = db_manager.get_session()
+        try:
+            db.add_all(jobs)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        self._count('submitted', len(job_ids))
+        self.start()
+        self.notify()
+        return job_ids
+
+    def notify(self):
+        """唤醒空闲的工作线程"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def start(self):
+        """启动工作线程，并把上次停机时中断的下载重新排队"""
+        with self._start_lock:
+            if self._running:
+                return
+            recovered = self._requeue_interrupted_jobs()
+            self._running = True
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, name=f'download-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            print(f"下载任务队列已启动，工作线程 {self.workers} 个，单主机并发 {self.per_host_limit}，"
+                  f"恢复中断任务 {recovered} 个")
+
+    def stop(self):
+        """停止工作线程；正在进行的下载被中止，下次启动时重新排队"""
+        with self._start_lock:
+            if not self._running:
+                return
+            self._running = False
+            self.notify()
+            for thread in self._threads:
+                thread.join(timeout=10)
+            self._threads = []
+            print("下载任务队列已停止")
+
+    def _requeue_interrupted_jobs(self) -> int:
+        """上次停机时处于下载中的任务重新置为排队"""
+        db = db_manager.get_session()
+        try:
+            result = db.execute(
+                update(DownloadJob)
+                .where(DownloadJob.status == JOB_DOWNLOADING)
+                .values(status=JOB_QUEUED, updated_at=get_east8_time())
+            )
+            db.commit()
+            return result.rowcount or 0
+        except Exception as e:
+            db.rollback()
+            print(f"恢复下载任务失败: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """
+        取消下载任务
+
+        排队中的任务直接取消；正在下载的任务由进度回调中止，下载线程退出后状态变为 cancelled
+
+        Returns:
+            Optional[str]: cancelled / cancelling；任务已结束时返回其状态；任务不存在返回None
+        """
+        db = db_manager.get_session()
+        try:
+            job = db.query(DownloadJob).filter(DownloadJob.job_id == job_id).first()
+            if not job:
+                return None
+            if job.status == JOB_QUEUED:
+                now = get_east8_time()
+                result = db.execute(
+                    update(DownloadJob)
+                    .where(DownloadJob.job_id == job_id, DownloadJob.status == JOB_QUEUED)
+                    .values(status=JOB_CANCELLED, finished_at=now, updated_at=now)
+                )
+                db.commit()
+                if result.rowcount:
+                    self._count('cancelled')
+                    # 工作线程可能刚好在领取该任务时失败，唤醒后重新领取
+                    self.notify()
+                    return JOB_CANCELLED
+            # 领取任务时在锁内登记取消事件，排队状态更新失败说明任务已被领取或已结束
+            with self._cond:
+                event = self._cancel_events.get(job_id)
+                if event:
+                    event.set()
+                    return JOB_CANCELLING
+            db.expire_all()
+            job = db.query(DownloadJob).filter(DownloadJob.job_id == job_id).first()
+            return job.status if job else None
+        finally:
+            db.close()
+
+    def _claim_next(self) -> Optional[Dict[str, Any]]:
+        """领取最早提交、且所属主机未达到并发上限的排队任务"""
+        with self._cond:
+            full_hosts = [host for host, count in self._active_hosts.items() if count >= self.per_host_limit]
+            db = db_manager.get_session()
+            try:
+                query = db.query(DownloadJob).filter(DownloadJob.status == JOB_QUEUED)
+                if full_hosts:
+                    query = query.filter(DownloadJob.host.notin_(full_hosts))
+                job = query.order_by(DownloadJob.id).first()
+                if not job:
+                    return None
+                now = get_east8_time()
+                result = db.execute(
+                    update(DownloadJob)
+                    .where(DownloadJob.id == job.id, DownloadJob.status == JOB_QUEUED)
+                    .values(status=JOB_DOWNLOADING, progress=0, error=None, started_at=now, updated_at=now,
+                            attempts=DownloadJob.attempts + 1),
+                    execution_options={'synchronize_session': False}
+                )
+                db.commit()
+                if not result.rowcount:
+                    return None
+                claimed = {'id': job.job_id, 'url': job.url, 'host': job.host,
+                           'format_id': job.format_id, 'download_path': job.download_path,
+                           'rate_limit': job.rate_limit}
+            finally:
+                db.close()
+
+            self._active_hosts[claimed['host']] += 1
+            self._cancel_events[claimed['id']] = threading.Event()
+            self._live[claimed['id']] = {'progress': 0}
+            return claimed
+
+    def _release(self, job: Dict[str, Any]):
+        with self._cond:
+            self._active_hosts[job['host']] -= 1
+            if self._active_hosts[job['host']] <= 0:
+                del self._active_hosts[job['host']]
+            self._cancel_events.pop(job['id'], None)
+            self._live.pop(job['id'], None)
+            self._cond.notify_all()
+
+    def _worker_loop(self):
+        """工作线程主循环：领取任务并下载，无可领取任务时等待通知或轮询"""
+        while self._running:
+            try:
+                job = self._claim_next()
+            except Exception as e:
+                print(f"领取下载任务失败: {e}")
+                job = None
+            if job is None:
+                with self._cond:
+                    if self._running:
+                        self._cond.wait(timeout=self.poll_interval)
+                continue
+            try:
+                self._run_job(job)
+            except Exception as e:
+                print(f"下载任务 {job['id']} 处理失败: {e}")
+            finally:
+                self._release(job)
+
+    def _make_progress_hook(self, job_id: str, cancel_event: threading.Event):
+        """
+        生成进度回调：统计字节数与吞吐量，按全局带宽上限限速，按间隔写入数据库；取消或停机时中止下载
+
+        一个任务可能包含多个文件（如 bestvideo+bestaudio），downloaded_bytes 为已完成文件与当前文件之和；
+        transferred_bytes 只统计本次实际传输的字节（不含断点续传前已下载的部分），用于计算平均吞吐量
+        """
+        state = {'done_bytes': 0, 'done_total': 0, 'current': None, 'transferred': 0,
+                 'started_at': time.monotonic(), 'saved_at': 0.0}
+
+        def hook(d: Dict):
+            if cancel_event.is_set() or not self._running:
+                raise DownloadCancelled('下载任务已取消')
+            status = d.get('status')
+            delta = 0
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+
+            if status == 'finished':
+                state['done_bytes'] += total or downloaded or (state['current'] or 0)
+                state['done_total'] += total or downloaded or (state['current'] or 0)
+                state['current'] = None
+            elif status == 'downloading':
+                # 每个文件的第一次回调作为基准：断点续传时已下载的部分不计入传输量
+                delta = 0 if state['current'] is None else max(downloaded - state['current'], 0)
+                state['current'] = downloaded
+                state['transferred'] += delta
+                if delta and self._bandwidth:
+                    wait = self._bandwidth.consume(delta)
+                    if wait:
+                        self._count('throttled_seconds', wait)
+            else:
+                return
+
+            self._count('transferred_bytes', delta)
+            elapsed = time.monotonic() - state['started_at']
+            current = state['current'] or 0
+            live = {
+                'downloaded_bytes': state['done_bytes'] + current,
+                'total_bytes': state['done_total'] + (total if status == 'downloading' else 0),
+                'transferred_bytes': state['transferred'],
+                'speed': d.get('speed') if status == 'downloading' else None,
+                'avg_speed': int(state['transferred'] / elapsed) if elapsed > 0 else 0,
+                'eta': d.get('eta') if status == 'downloading' else None,
+                'elapsed': round(elapsed, 1),
+                'fragment_index': d.get('fragment_index'),
+                'fragment_count': d.get('fragment_count'),
+            }
+            if status == 'downloading' and total:
+                live['progress'] = min(int(downloaded / total * 90) + 10, 99)
+            if job_id in self._live:
+                self._live[job_id].update(live)
+
+            now = time.monotonic()
+            if now - state['saved_at'] >= self.progress_interval:
+                state['saved_at'] = now
+                self._update_job(job_id, **{
+                    key: live[key] for key in ('progress', 'downloaded_bytes', 'total_bytes',
+                                               'transferred_bytes', 'avg_speed') if key in live
+                })
+
+        return hook
+
+    def _run_job(self, job: Dict[str, Any]):
+        """执行一个下载任务并保存结果"""
+        cancel_event = self._cancel_events[job['id']]
+        downloader = get_youtube_downloader()
+        options = {
+            'format': job['format_id'],
+            'progress_hooks': [self._make_progress_hook(job['id'], cancel_event)]
+        }
+        if job['rate_limit']:
+            options['ratelimit'] = job['rate_limit']
+        # 文件名不含时间戳，重新排队的任务会找到上次的 .part 文件继续下载
+        if job['download_path']:
+            options['outtmpl'] = os.path.join(job['download_path'], '%(title)s.%(ext)s')
+        else:
+            options['outtmpl'] = os.path.join(downloader.download_path, '%(title)s_%(id)s.%(ext)s')
+
+        format_id = job['format_id'] or 'best'
+        if AppConfig.DOWNLOAD_DEDUP_ENABLED:
+            video_id = downloader.get_video_id(job['url'])
+            files = download_library.find_reusable(video_id, format_id,
+                                                   job['download_path'] or downloader.download_path)
+            if files and not cancel_event.is_set():
+                result = {'success': True, 'deduplicated': True, 'video_id': video_id,
+                          'message': '视频已下载过，复用已有文件', 'files': files}
+                self._update_job(job['id'], status=JOB_COMPLETED, progress=100, finished_at=get_east8_time(),
+                                 result=json.dumps(result, ensure_ascii=False))
+                self._count('deduplicated')
+                print(f"下载任务 {job['id']} 复用已下载的文件: {video_id}")
+                return
+
+        print(f"开始下载任务 {job['id']}: {job['url']}")
+        try:
+            result = downloader.download_video(job['url'], options)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+
+        now = get_east8_time()
+        accounting = {
+            key: value for key, value in (self._live.get(job['id']) or {}).items()
+            if key in ('downloaded_bytes', 'total_bytes', 'transferred_bytes', 'avg_speed')
+        }
+        if cancel_event.is_set():
+            self._update_job(job['id'], status=JOB_CANCELLED, progress=0, finished_at=now, **accounting)
+            self._count('cancelled')
+            print(f"下载任务 {job['id']} 已取消")
+        elif not self._running and not result.get('success'):
+            # 停机中断的任务保留 .part 文件，重新排队后继续下载
+            self._update_job(job['id'], status=JOB_QUEUED, **accounting)
+            self._count('requeued')
+        elif result.get('success'):
+            result['files'] = download_library.record_files(result.get('files'), result.get('video_id'),
+                                                            job['id'], format_id)
+            download_quota.enforce(protect_paths=[f['path'] for f in result['files']])
+            self._update_job(job['id'], status=JOB_COMPLETED, progress=100, finished_at=now,
+                             result=json.dumps(result, ensure_ascii=False), **accounting)
+            self._count('completed')
+            print(f"下载任务 {job['id']} 完成")
+        else:
+            self._update_job(job['id'], status=JOB_FAILED, finished_at=now, error=result.get('error'), **accounting)
+            self._count('failed')
+            print(f"下载任务 {job['id']} 失败: {result.get('error')}")
+
+    def _update_job(self, job_id: str, **values):
+        db = db_manager.get_session()
+        try:
+            values['updated_at'] = get_east8_time()
+            db.execute(update(DownloadJob).where(DownloadJob.job_id == job_id).values(**values))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"更新下载任务 {job_id} 失败: {e}")
+        finally:
+            db.close()
+
+    def _to_dict(self, job: DownloadJob) -> Dict[str, Any]:
+        data = {
+            'id': job.job_id,
+            'url': job.url,
+            'format': job.format_id,
+            'download_path': job.download_path,
+            'status': job.status,
+            'progress': job.progress or 0,
+            'rate_limit': job.rate_limit,
+            'downloaded_bytes': job.downloaded_bytes or 0,
+            'total_bytes': job.total_bytes or 0,
+            'transferred_bytes': job.transferred_bytes or 0,
+            'avg_speed': job.avg_speed or 0,
+            'attempts': job.attempts or 0,
+            'error': job.error,
+            'result': json.loads(job.result) if job.result else None,
+            'start_time': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        }
+        # 下载中的任务使用内存中的实时进度
+        live = self._live.get(job.job_id)
+        if live is not None and job.status == JOB_DOWNLOADING:
+            data.update(live)
+        if job.job_id in self._cancel_events and self._cancel_events[job.job_id].is_set():
+            data['status'] = JOB_CANCELLING
+        return data
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取单个下载任务"""
+        db = db_manager.get_session()
+        try:
+            job = db.query(DownloadJob).filter(DownloadJob.job_id == job_id).first()
+            return self._to_dict(job) if job else None
+        finally:
+            db.close()
+
+    def list_jobs(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """获取最近提交的下载任务"""
+        db = db_manager.get_session()
+        try:
+            jobs = db.query(DownloadJob).order_by(DownloadJob.id.desc()).limit(limit).all()
+            return [self._to_dict(job) for job in jobs]
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列统计：各状态任务数、各主机正在下载数与处理计数"""
+        db = db_manager.get_session()
+        try:
+            rows = db.query(DownloadJob.status, func.count(DownloadJob.id)).group_by(DownloadJob.status).all()
+        finally:
+            db.close()
+        with self._metrics_lock:
+            stats = dict(self._metrics)
+        with self._cond:
+            stats['active_hosts'] = dict(self._active_hosts)
+        stats['by_status'] = {status: count for status, count in rows}
+        stats['workers'] = self.workers if self._running else 0
+        stats['per_host_limit'] = self.per_host_limit
+        stats['global_rate_limit'] = self._bandwidth.rate if self._bandwidth else 0
+        stats['active_speed'] = sum(live.get('speed') or 0 for live in list(self._live.values()))
+        return stats
+
+
+# 单例服务
+download_queue = DownloadQueue()
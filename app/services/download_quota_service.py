@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+下载目录磁盘配额服务
+按已下载文件索引统计占用空间：超过保留天数的文件先被清理，总大小超过配额时
+按策略淘汰文件（lru：最久未使用的优先；age：最早下载的优先），直到回到配额以内；
+只管理下载器默认目录中的文件，保存到自定义目录的文件不计入配额也不会被删除
+"""
+
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Any, Iterable, List, Tuple
+from sqlalchemy import delete, func
+from ..config import AppConfig
+from ..database import db_manager
+from ..models import DownloadedFile
+from .youtube_downloader import get_youtube_downloader
+
+EVICTION_POLICIES = ('lru', 'age')
+
+FILE_COLUMNS = (DownloadedFile.id, DownloadedFile.path, DownloadedFile.size)
+
+
+class DownloadQuotaManager:
+    """下载目录磁盘配额管理"""
+
+    def __init__(self, quota_gb: float = None, policy: str = None, max_age_days: int = None):
+        quota_gb = AppConfig.DOWNLOAD_QUOTA_GB if quota_gb is None else quota_gb
+        self.quota_bytes = int(quota_gb * 1024 ** 3) if quota_gb > 0 else 0
+        self.policy = policy or AppConfig.DOWNLOAD_EVICTION_POLICY
+        if self.policy not in EVICTION_POLICIES:
+            print(f"未知的淘汰策略 {self.policy}，使用 lru")
+            self.policy = 'lru'
+        self.max_age_days = AppConfig.DOWNLOAD_MAX_AGE_DAYS if max_age_days is None else max_age_days
+        # 同一时间只执行一次清理，避免多个下载线程重复淘汰
+        self._enforce_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.stats = {'runs': 0, 'expired_files': 0, 'evicted_files': 0, 'freed_bytes': 0}
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def _eviction_order(self):
+        if self.policy == 'age':
+            return [DownloadedFile.created_time.asc(), DownloadedFile.id.asc()]
+        # 扫描发现、从未被使用过的文件按创建时间参与排序
+        return [func.coalesce(DownloadedFile.last_accessed_at, DownloadedFile.created_time).asc(),
+                DownloadedFile.id.asc()]
+
+    @staticmethod
+    def _managed_directory() -> str:
+        """配额管理的目录：下载器默认下载目录"""
+        return os.path.abspath(get_youtube_downloader().download_path)
+
+    def _delete_files(self, db, rows: List) -> Tuple[int, int]:
+        """删除文件及其索引，返回删除的文件数和释放的字节数"""
+        freed = 0
+        deleted_ids = []
+        for row in rows:
+            try:
+                os.remove(row.path)
+                freed += row.size or 0
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"删除文件失败: {row.path}: {e}")
+                continue
+            deleted_ids.append(row.id)
+        if deleted_ids:
+            db.execute(delete(DownloadedFile).where(DownloadedFile.id.in_(deleted_ids)))
+        return len(deleted_ids), freed
+
+    def enforce(self, protect_paths: Iterable[str] = ()) -> Dict[str, int]:
+        """
+        清理过期文件并把下载目录占用控制在配额以内
+
+        Args:
+            protect_paths: 不参与淘汰的文件（如刚下载完成的文件）
+
+        Returns:
+            Dict[str, int]: expired / evicted 文件数和 freed_bytes
+        """
+        result = {'expired': 0, 'evicted': 0, 'freed_bytes': 0}
+        if not self.quota_bytes and self.max_age_days <= 0:
+            return result
+        protected = {os.path.abspath(path) for path in protect_paths if path}
+
+        directory = self._managed_directory()
+
+        with self._enforce_lock:
+            db = db_manager.get_session()
+            try:
+                if self.max_age_days > 0:
+                    cutoff = datetime.now() - timedelta(days=self.max_age_days)
+                    expired = [row for row in db.query(*FILE_COLUMNS).filter(
+                        DownloadedFile.directory == directory,
+                        DownloadedFile.created_time < cutoff).all() if row.path not in protected]
+                    result['expired'], freed = self._delete_files(db, expired)
+                    result['freed_bytes'] += freed
+                    db.commit()
+
+                if self.quota_bytes:
+                    used = db.query(func.coalesce(func.sum(DownloadedFile.size), 0)).filter(
+                        DownloadedFile.directory == directory).scalar()
+                    if used > self.quota_bytes:
+                        victims = []
+                        for row in db.query(*FILE_COLUMNS).filter(DownloadedFile.directory == directory).order_by(
+                                *self._eviction_order()).all():
+                            if used <= self.quota_bytes:
+                                break
+                            if row.path in protected:
+                                continue
+                            victims.append(row)
+                            used -= row.size or 0
+                        result['evicted'], freed = self._delete_files(db, victims)
+                        result['freed_bytes'] += freed
+                        db.commit()
+            except Exception as e:
+                db.rollback()
+                print(f"下载目录配额清理失败: {e}")
+            finally:
+                db.close()
+
+        self._count('runs')
+        self._count('expired_files', result['expired'])
+        self._count('evicted_files', result['evicted'])
+        self._count('freed_bytes', result['freed_bytes'])
+        if result['expired'] or result['evicted']:
+            print(f"下载目录配额清理: 过期 {result['expired']} 个，淘汰 {result['evicted']} 个，"
+                  f"释放 {result['freed_bytes'] / (1024 * 1024):.1f} MB")
+        return result
+
+    def get_usage(self) -> Dict[str, Any]:
+        """获取下载目录占用：索引中的文件数和总大小、配额、所在磁盘的容量"""
+        directory = self._managed_directory()
+        db = db_manager.get_session()
+        try:
+            files, used = db.query(func.count(DownloadedFile.id),
+                                   func.coalesce(func.sum(DownloadedFile.size), 0)).filter(
+                DownloadedFile.directory == directory).one()
+        finally:
+            db.close()
+
+        usage = {
+            'directory': directory,
+            'files': files,
+            'used_bytes': used,
+            'used_gb': round(used / 1024 ** 3, 3),
+            'quota_bytes': self.quota_bytes,
+            'quota_gb': round(self.quota_bytes / 1024 ** 3, 3),
+            'usage_percent': round(used * 100 / self.quota_bytes, 1) if self.quota_bytes else None,
+            'policy': self.policy,
+            'max_age_days': self.max_age_days,
+        }
+        try:
+            disk = shutil.disk_usage(directory)
+            usage['disk'] = {'total_bytes': disk.total, 'used_bytes': disk.used, 'free_bytes': disk.free}
+        except OSError:
+            usage['disk'] = None
+        return usage
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取清理统计：执行次数、过期与淘汰的文件数、释放的字节数"""
+        with self._lock:
+            return dict(self.stats)
+
+
+# 单例服务
+download_quota = DownloadQuotaManager()
@@ -9,6 +9,16 @@ import lark_oapi as lark
 from lark_oapi.api.im.v1 import *
 from typing import List, Dict, Any
 from ..models import VideoInfo
+from ..config import AppConfig
+from .rate_limit_service import rate_limit_registry
+
+# 飞书开放平台API调用保护（限流、并发上限、熔断）
+feishu_api_guard = rate_limit_registry.register(
+    'feishu',
+    rate=AppConfig.FEISHU_API_RATE_PER_SEC,
+    burst=AppConfig.FEISHU_API_BURST,
+    max_concurrency=AppConfig.FEISHU_API_MAX_CONCURRENCY
+)
 
 
 class FeishuService:
@@ -68,11 +78,7 @@ class FeishuService:
                     .build()) \
                 .build()
             
-            response = client.im.v1.message.create(request)
-            
-            if not response.success():
-                print(f"发送飞书消息失败: {response.code}, {response.msg}")
-                return False
+            response = feishu_api_guard.execute(self._create_message, client, request)
             
             print(f"飞书消息发送成功，消息ID: {response.data.message_id}")
             return True
@@ -81,6 +87,14 @@ class FeishuService:
             print(f"发送飞书消息时出错: {e}")
             return False
     
+    @staticmethod
+    def _create_message(client, request):
+        """发送消息，接口返回失败时抛出异常，使熔断器把业务失败也计入失败次数"""
+        response = client.im.v1.message.create(request)
+        if not response.success():
+            raise RuntimeError(f"发送飞书消息失败: {response.code}, {response.msg}")
+        return response
+    
     def _build_message_content(self, task_name: str, videos: List[VideoInfo], 
                              execution_time: str, total_count: int, new_count: int = None) -> Dict[str, Any]:
         """
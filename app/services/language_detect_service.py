@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+本地语言识别服务
+在文本发送给翻译接口前做一次本地预判：去掉链接、话题标签、@提及、表情和数字后按文字体系统计占比，
+已经是目标语言或没有可翻译内容的文本直接跳过，并统计跳过比例
+"""
+
+import re
+import threading
+from typing import Dict, Any, Optional, Tuple
+from ..config import AppConfig
+
+# 不需要翻译的片段：链接、话题标签、@提及
+_URL_RE = re.compile(r'(?:https?://|www\.)\S+', re.IGNORECASE)
+_TAG_RE = re.compile(r'[#@\uff03][^\s#@\uff03]+')
+
+# 各文字体系（汉字、假名、韩文按字计数，拼音文字按词计数，使两者大致可比）
+_SCRIPT_PATTERNS = {
+    'han': re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]'),
+    'kana': re.compile(r'[\u3040-\u30ff\u31f0-\u31ff]'),
+    'hangul': re.compile(r'[\u1100-\u11ff\u3130-\u318f\uac00-\ud7af]'),
+    'latin': re.compile(r'[A-Za-z\u00c0-\u024f]+'),
+    'cyrillic': re.compile(r'[\u0400-\u04ff]+'),
+    'arabic': re.compile(r'[\u0600-\u06ff\u0750-\u077f]+'),
+    'thai': re.compile(r'[\u0e00-\u0e7f]+'),
+    'devanagari': re.compile(r'[\u0900-\u097f]+'),
+}
+
+# 目标语言对应的文字体系（拉丁字母无法区分具体语言，不做跳过判断）
+_TARGET_SCRIPTS = {
+    'zh': ('han',),
+    'ja': ('kana', 'han'),
+    'ko': ('hangul',),
+    'ru': ('cyrillic',),
+    'ar': ('arabic',),
+    'th': ('thai',),
+    'hi': ('devanagari',),
+}
+
+# 跳过原因
+SKIP_ALREADY_TARGET = 'already_target'
+SKIP_NO_TEXT = 'no_text'
+
+
+def strip_untranslatable(text: str) -> str:
+    """去掉链接、话题标签和@提及"""
+    return _TAG_RE.sub(' ', _URL_RE.sub(' ', text))
+
+
+def count_scripts(text: str) -> Dict[str, int]:
+    """统计各文字体系的单位数（汉字/假名/韩文按字，其余按词）"""
+    counts = {}
+    for script, pattern in _SCRIPT_PATTERNS.items():
+        count = len(pattern.findall(text))
+        if count:
+            counts[script] = count
+    return counts
+
+
+class LanguageDetectService:
+    """本地语言识别服务"""
+
+    def __init__(self, target_ratio: float = None):
+        # 目标语言文字占比达到该值即视为已是目标语言
+        self.target_ratio = target_ratio or AppConfig.TRANSLATION_SKIP_TARGET_RATIO
+        self._lock = threading.Lock()
+        self.stats = {'checked': 0, 'passed': 0, SKIP_ALREADY_TARGET: 0, SKIP_NO_TEXT: 0}
+
+    def detect_script(self, text: str) -> Optional[str]:
+        """识别文本的主要文字体系，无可识别文字时返回None"""
+        if not text:
+            return None
+        counts = count_scripts(strip_untranslatable(text))
+        if not counts:
+            return None
+        # 日文中常夹杂汉字，出现假名即视为日文
+        if counts.get('kana'):
+            return 'kana'
+        return max(counts, key=counts.get)
+
+    def is_in_language(self, text: str, language: str) -> bool:
+        """判断文本是否已经主要由目标语言的文字组成"""
+        scripts = _TARGET_SCRIPTS.get((language or '').lower().split('-')[0])
+        if not text or not scripts:
+            return False
+        counts = count_scripts(strip_untranslatable(text))
+        total = sum(counts.values())
+        if not total:
+            return False
+        # 日文假名与中文汉字共用汉字区，目标为中文时出现假名不算中文
+        if scripts == ('han',) and counts.get('kana'):
+            return False
+        return sum(counts.get(script, 0) for script in scripts) / total >= self.target_ratio
+
+    def check(self, text: str, target_language: str) -> Tuple[bool, Optional[str]]:
+        """
+        判断文本是否需要发送给翻译接口
+
+        Args:
+            text: 原文
+            target_language: 目标语言
+
+        Returns:
+            Tuple[bool, Optional[str]]: (是否需要翻译, 跳过原因)
+        """
+        if not text:
+            return False, SKIP_NO_TEXT
+
+        stripped = strip_untranslatable(text)
+        if not count_scripts(stripped):
+            # 只有链接、标签、表情、数字或标点
+            reason = SKIP_NO_TEXT
+        elif self.is_in_language(stripped, target_language):
+            reason = SKIP_ALREADY_TARGET
+        else:
+            reason = None
+
+        with self._lock:
+            self.stats['checked'] += 1
+            self.stats[reason or 'passed'] += 1
+        return reason is None, reason
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取预判统计：检查数、放行数、各原因跳过数及跳过比例"""
+        with self._lock:
+            stats = dict(self.stats)
+        checked = stats['checked']
+        stats['skip_ratio'] = (checked - stats['passed']) / checked if checked else 0.0
+        return stats
+
+
+# 单例服务
+language_detect_service = LanguageDetectService()
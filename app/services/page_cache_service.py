@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+爬取页面缓存服务
+按URL记录ETag、Last-Modified和页面内容哈希：请求时携带条件请求头，
+服务器返回304或内容哈希未变化时跳过解析和翻译；
+页面变化后的校验信息与该次爬取的视频在同一事务中写入，视频未保存时下次仍会重新解析
+"""
+
+import hashlib
+import json
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..database import db_manager
+from ..models import CrawlPageCache
+
+# 不影响解析结果的配置项，不计入配置哈希
+_VOLATILE_CONFIG_KEYS = ('force_refresh',)
+
+
+def make_content_hash(content: bytes) -> str:
+    """计算页面内容的哈希"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def make_config_hash(crawl_config: Optional[Dict]) -> str:
+    """计算解析配置的哈希（配置变化后即使页面未变也需要重新解析）"""
+    config = {k: v for k, v in (crawl_config or {}).items() if k not in _VOLATILE_CONFIG_KEYS}
+    return hashlib.sha256(json.dumps(config, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+
+
+class PageCacheService:
+    """爬取页面缓存服务"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {'fetched': 0, 'not_modified': 0, 'unchanged': 0, 'changed': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def get(self, url: str, config_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        查询URL的缓存校验信息
+
+        Returns:
+            Optional[Dict]: etag/last_modified/content_hash；无缓存或解析配置已变化时返回None
+        """
+        db = db_manager.get_session()
+        try:
+            entry = db.query(CrawlPageCache).filter(CrawlPageCache.url == url).first()
+            if not entry or entry.config_hash != config_hash:
+                return None
+            return {
+                'etag': entry.etag,
+                'last_modified': entry.last_modified,
+                'content_hash': entry.content_hash,
+            }
+        finally:
+            db.close()
+
+    @staticmethod
+    def conditional_headers(cached: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """根据缓存校验信息构造条件请求头"""
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+        return headers
+
+    def mark_not_modified(self, url: str, unchanged: bool = False,
+                          etag: str = None, last_modified: str = None):
+        """
+        记录页面未变化（304或内容哈希相同）
+
+        Args:
+            url: 页面URL
+            unchanged: True表示返回了200但内容哈希相同，False表示304
+            etag: 新的ETag（为空时保留原值）
+            last_modified: 新的Last-Modified（为空时保留原值）
+        """
+        self._count('fetched')
+        self._count('unchanged' if unchanged else 'not_modified')
+        values = {
+            'fetch_count': CrawlPageCache.fetch_count + 1,
+            'last_checked_at': datetime.utcnow(),
+        }
+        if unchanged:
+            values['unchanged_count'] = CrawlPageCache.unchanged_count + 1
+        else:
+            values['not_modified_count'] = CrawlPageCache.not_modified_count + 1
+        if etag:
+            values['etag'] = etag
+        if last_modified:
+            values['last_modified'] = last_modified
+        try:
+            with db_manager.session_scope() as db:
+                db.execute(update(CrawlPageCache).where(CrawlPageCache.url == url).values(**values))
+        except Exception as e:
+            print(f"更新页面缓存失败: {url}, {e}")
+
+    def record(self, db, entries: List[Dict[str, Any]]):
+        """
+        在调用方的事务中写入页面变化后的缓存校验信息（与爬取到的视频同时提交）
+
+        Args:
+            db: 调用方的数据库会话
+            entries: 爬取结果中的页面缓存校验信息（url/content_hash/config_hash/etag/last_modified）
+        """
+        if not entries:
+            return
+        now = datetime.utcnow()
+        rows = [{
+            'url': entry['url'], 'etag': entry.get('etag'), 'last_modified': entry.get('last_modified'),
+            'content_hash': entry['content_hash'], 'config_hash': entry['config_hash'],
+            'last_checked_at': now, 'last_changed_at': now,
+            'fetch_count': 1, 'not_modified_count': 0, 'unchanged_count': 0,
+        } for entry in entries]
+        stmt = sqlite_insert(CrawlPageCache)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['url'],
+            set_={
+                **{column: stmt.excluded[column] for column in
+                   ('etag', 'last_modified', 'content_hash', 'config_hash', 'last_checked_at', 'last_changed_at')},
+                'fetch_count': CrawlPageCache.fetch_count + 1,
+            }
+        )
+        db.execute(stmt, rows)
+        for _ in rows:
+            self._count('fetched')
+            self._count('changed')
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计：请求数、304数、内容未变数及跳过比例"""
+        with self._lock:
+            stats = dict(self.stats)
+        fetched = stats['fetched']
+        stats['skip_ratio'] = (stats['not_modified'] + stats['unchanged']) / fetched if fetched else 0.0
+        return stats
+
+
+# 单例服务
+page_cache_service = PageCacheService()
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""
+YouTube配额管理服务
+按调用类型计算配额消耗，按太平洋时间自然日持久化到SQLite，
+并为定时任务提供基于剩余配额的准入决策（正常执行、降级、延后、跳过）
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Tuple
+from ..config import AppConfig
+from ..database import db_manager
+from ..models import YouTubeQuotaUsage
+
+try:
+    from zoneinfo import ZoneInfo
+    PACIFIC_TZ = ZoneInfo('America/Los_Angeles')
+except Exception:
+    # 缺少时区数据时退化为固定UTC-8
+    PACIFIC_TZ = timezone(timedelta(hours=-8))
+
+# YouTube Data API v3 各接口的配额消耗
+QUOTA_COSTS = {
+    'search.list': 100,
+    'videos.list': 1,
+    'channels.list': 1,
+    'playlistItems.list': 1,
+    'i18nLanguages.list': 1,
+    'i18nRegions.list': 1,
+}
+
+# 准入决策
+ADMIT_RUN = 'run'
+ADMIT_DOWNGRADE = 'downgrade'
+ADMIT_DEFER = 'defer'
+ADMIT_SKIP = 'skip'
+
+
+class QuotaExceededError(Exception):
+    """当日配额不足"""
+    pass
+
+
+def get_quota_date(now: datetime = None) -> str:
+    """获取当前配额日（太平洋时间日期）"""
+    now = now or datetime.now(timezone.utc)
+    return now.astimezone(PACIFIC_TZ).date().isoformat()
+
+
+def get_next_reset_time(now: datetime = None) -> datetime:
+    """获取下一次配额重置时间（太平洋时间零点，返回UTC时间）"""
+    now = (now or datetime.now(timezone.utc)).astimezone(PACIFIC_TZ)
+    next_day = (now + timedelta(days=1)).date()
+    reset = datetime(next_day.year, next_day.month, next_day.day, tzinfo=PACIFIC_TZ)
+    return reset.astimezone(timezone.utc)
+
+
+class QuotaManager:
+    """YouTube配额管理器"""
+
+    def __init__(self, daily_limit: int = None):
+        self.daily_limit = daily_limit or AppConfig.YT_DAILY_QUOTA
+        self._lock = threading.Lock()
+        self._cache_date = None
+        self._cache_used = 0
+
+    def get_cost(self, call_type: str) -> int:
+        """获取指定调用类型的配额消耗"""
+        return QUOTA_COSTS.get(call_type, 1)
+
+    def _load_used(self, quota_date: str) -> int:
+        """从数据库加载指定配额日的已用配额（带内存缓存）"""
+        if self._cache_date == quota_date:
+            return self._cache_used
+
+        db = db_manager.get_session()
+        try:
+            rows = db.query(YouTubeQuotaUsage.units).filter(
+                YouTubeQuotaUsage.quota_date == quota_date
+            ).all()
+            self._cache_date = quota_date
+            self._cache_used = sum(units or 0 for (units,) in rows)
+            return self._cache_used
+        finally:
+            db.close()
+
+    def get_used(self) -> int:
+        """获取今日已用配额"""
+        with self._lock:
+            return self._load_used(get_quota_date())
+
+    def remaining(self) -> int:
+        """获取今日剩余配额"""
+        return max(0, self.daily_limit - self.get_used())
+
+    def check(self, call_type: str, calls: int = 1):
+        """调用前检查配额是否足够，不足时抛出 QuotaExceededError"""
+        cost = self.get_cost(call_type) * calls
+        if cost > self.remaining():
+            raise QuotaExceededError(f"YouTube API今日配额不足：{call_type} 需要 {cost}，剩余 {self.remaining()}")
+
+    def charge(self, call_type: str, calls: int = 1) -> int:
+        """
+        记录一次（或多次）API调用的配额消耗
+
+        Args:
+            call_type: 调用类型，如 search.list
+            calls: 调用次数
+
+        Returns:
+            int: 本次记录的配额单位
+        """
+        units = self.get_cost(call_type) * calls
+        quota_date = get_quota_date()
+        with self._lock:
+            self._load_used(quota_date)
+            self._record(quota_date, call_type, calls, units)
+        return units
+
+    def reserve(self, call_type: str, calls: int = 1) -> int:
+        """
+        在同一把锁内检查并记录配额消耗，并发调用不会同时通过检查而超支
+
+        Returns:
+            int: 本次记录的配额单位
+
+        Raises:
+            QuotaExceededError: 今日剩余配额不足
+        """
+        units = self.get_cost(call_type) * calls
+        quota_date = get_quota_date()
+        with self._lock:
+            remaining = max(0, self.daily_limit - self._load_used(quota_date))
+            if units > remaining:
+                raise QuotaExceededError(f"YouTube API今日配额不足：{call_type} 需要 {units}，剩余 {remaining}")
+            self._record(quota_date, call_type, calls, units)
+        return units
+
+    def _record(self, quota_date: str, call_type: str, calls: int, units: int):
+        """写入配额消耗并更新缓存（调用方需持有锁并已加载当日用量）"""
+        db = db_manager.get_session()
+        try:
+            usage = db.query(YouTubeQuotaUsage).filter_by(
+                quota_date=quota_date, call_type=call_type
+            ).first()
+            if usage:
+                usage.calls = (usage.calls or 0) + calls
+                usage.units = (usage.units or 0) + units
+            else:
+                db.add(YouTubeQuotaUsage(
+                    quota_date=quota_date, call_type=call_type, calls=calls, units=units
+                ))
+            db.commit()
+            self._cache_used += units
+        except Exception as e:
+            db.rollback()
+            print(f"记录配额使用失败: {e}")
+        finally:
+            db.close()
+
+    def mark_exhausted(self):
+        """API返回quotaExceeded时，将今日剩余配额记为耗尽"""
+        remaining = self.remaining()
+        if remaining > 0:
+            quota_date = get_quota_date()
+            with self._lock:
+                db = db_manager.get_session()
+                try:
+                    usage = db.query(YouTubeQuotaUsage).filter_by(
+                        quota_date=quota_date, call_type='exhausted'
+                    ).first()
+                    if usage:
+                        usage.units = (usage.units or 0) + remaining
+                    else:
+                        db.add(YouTubeQuotaUsage(
+                            quota_date=quota_date, call_type='exhausted', calls=0, units=remaining
+                        ))
+                    db.commit()
+                    self._cache_date = None
+                except Exception as e:
+                    db.rollback()
+                    print(f"记录配额耗尽失败: {e}")
+                finally:
+                    db.close()
+        print("YouTube API今日配额已耗尽，将在太平洋时间零点重置")
+
+    def _reserve_for(self, priority: str) -> int:
+        """不同优先级任务执行后需保留的配额"""
+        if priority == 'high':
+            return 0
+        if priority == 'low':
+            return int(self.daily_limit * AppConfig.YT_QUOTA_RESERVE_LOW)
+        return int(self.daily_limit * AppConfig.YT_QUOTA_RESERVE_NORMAL)
+
+    def admit(self, priority: str, requested_pages: int, page_cost: int = None) -> Tuple[str, int]:
+        """
+        定时任务准入决策
+
+        Args:
+            priority: 任务优先级 high/normal/low
+            requested_pages: 任务预计需要的搜索页数
+            page_cost: 每页预计消耗（默认为一次search.list加一次videos.list）
+
+        Returns:
+            Tuple[str, int]: (决策, 允许的页数)
+        """
+        priority = priority or 'normal'
+        page_cost = page_cost or (self.get_cost('search.list') + self.get_cost('videos.list'))
+        requested_pages = max(1, requested_pages)
+        available = self.remaining() - self._reserve_for(priority)
+        affordable_pages = max(0, available // page_cost)
+
+        if affordable_pages >= requested_pages:
+            return ADMIT_RUN, requested_pages
+        if affordable_pages > 0:
+            return ADMIT_DOWNGRADE, affordable_pages
+        if priority == 'low':
+            return ADMIT_SKIP, 0
+        return ADMIT_DEFER, 0
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取配额状态（供API展示）"""
+        quota_date = get_quota_date()
+        db = db_manager.get_session()
+        try:
+            rows = db.query(YouTubeQuotaUsage).filter(
+                YouTubeQuotaUsage.quota_date == quota_date
+            ).all()
+            breakdown = {row.call_type: {'calls': row.calls or 0, 'units': row.units or 0} for row in rows}
+        finally:
+            db.close()
+
+        used = self.get_used()
+        return {
+            'quota_date': quota_date,
+            'daily_limit': self.daily_limit,
+            'used': used,
+            'remaining': max(0, self.daily_limit - used),
+            'next_reset': get_next_reset_time().isoformat(),
+            'breakdown': breakdown,
+        }
+
+
+# 单例服务
+quota_manager = QuotaManager()
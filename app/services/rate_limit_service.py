@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+外部API限流与熔断服务
+为YouTube、火山引擎翻译、DeepSeek、飞书等客户端提供按服务商划分的令牌桶限流、并发上限和熔断器；
+某个服务商持续失败时快速失败（熔断），冷却后放行少量探测请求（半开），避免重试风暴拖住调度线程
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+from ..config import AppConfig
+
+# 熔断器状态
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+
+class RateLimitedError(Exception):
+    """等待令牌或并发名额超时"""
+    pass
+
+
+class CircuitOpenError(Exception):
+    """服务商处于熔断状态，请求被直接拒绝"""
+    pass
+
+
+class TokenBucket:
+    """令牌桶：按固定速率补充令牌，允许不超过容量的突发请求"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def acquire(self, timeout: float) -> float:
+        """
+        获取一个令牌
+
+        Args:
+            timeout: 最长等待秒数
+
+        Returns:
+            float: 实际等待的秒数
+
+        Raises:
+            RateLimitedError: 超时仍未获得令牌
+        """
+        start = time.monotonic()
+        deadline = start + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return time.monotonic() - start
+                wait = (1 - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                raise RateLimitedError(f"等待令牌超时（{timeout}秒）")
+            time.sleep(wait)
+
+    def consume(self, amount: float) -> float:
+        """
+        扣除指定数量的令牌（允许透支），透支时等待补足后返回；用于按已传输字节数事后计量的带宽限制
+
+        Returns:
+            float: 实际等待的秒数
+        """
+        with self._lock:
+            self._refill()
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class CircuitBreaker:
+    """熔断器：连续失败达到阈值后打开，冷却后半开放行探测请求，探测成功则关闭"""
+
+    def __init__(self, failure_threshold: int, recovery_timeout: float, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """判断当前是否允许请求通过"""
+        with self._lock:
+            if self.state == CIRCUIT_OPEN:
+                if time.monotonic() - self.opened_at < self.recovery_timeout:
+                    return False
+                self.state = CIRCUIT_HALF_OPEN
+                self.half_open_calls = 0
+            if self.state == CIRCUIT_HALF_OPEN:
+                if self.half_open_calls >= self.half_open_max_calls:
+                    return False
+                self.half_open_calls += 1
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = CIRCUIT_CLOSED
+            self.consecutive_failures = 0
+            self.half_open_calls = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = CIRCUIT_OPEN
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """半开探测请求未计入成败（如被判定为客户端错误）时归还探测名额"""
+        with self._lock:
+            if self.state == CIRCUIT_HALF_OPEN and self.half_open_calls > 0:
+                self.half_open_calls -= 1
+
+
+class ProviderGuard:
+    """单个服务商的调用保护：熔断 -> 令牌桶 -> 并发上限 -> 执行"""
+
+    def __init__(self, name: str, rate: float, burst: float, max_concurrency: int,
+                 failure_threshold: int = None, recovery_timeout: float = None,
+                 acquire_timeout: float = None, is_failure: Callable[[Exception], bool] = None):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.breaker = CircuitBreaker(
+            failure_threshold or AppConfig.CIRCUIT_FAILURE_THRESHOLD,
+            recovery_timeout or AppConfig.CIRCUIT_RECOVERY_SECONDS
+        )
+        self.max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.acquire_timeout = acquire_timeout or AppConfig.API_ACQUIRE_TIMEOUT
+        # 判断异常是否计入熔断（如4xx参数错误不代表服务商故障）
+        self.is_failure = is_failure or (lambda e: True)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'calls': 0, 'successes': 0, 'failures': 0,
+            'throttled': 0, 'short_circuited': 0,
+            'total_wait_seconds': 0.0, 'in_flight': 0,
+        }
+
+    def _count(self, name: str, amount=1):
+        with self._metrics_lock:
+            self._metrics[name] += amount
+
+    def execute(self, func: Callable, *args, **kwargs):
+        """
+        在限流与熔断保护下执行一次调用
+
+        Raises:
+            CircuitOpenError: 服务商处于熔断状态
+            RateLimitedError: 等待令牌或并发名额超时
+            Exception: 调用本身抛出的异常
+        """
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpenError(f"{self.name} 服务暂时不可用（熔断中），请稍后重试")
+
+        try:
+            waited = self.bucket.acquire(self.acquire_timeout)
+            start = time.monotonic()
+            if not self._semaphore.acquire(timeout=self.acquire_timeout):
+                raise RateLimitedError(f"{self.name} 并发请求过多，等待超时")
+            waited += time.monotonic() - start
+        except RateLimitedError:
+            self.breaker.release_probe()
+            self._count('throttled')
+            raise
+
+        self._count('total_wait_seconds', waited)
+        self._count('calls')
+        self._count('in_flight')
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.breaker.record_failure()
+                self._count('failures')
+            else:
+                self.breaker.release_probe()
+            raise
+        else:
+            self.breaker.record_success()
+            self._count('successes')
+            return result
+        finally:
+            self._count('in_flight', -1)
+            self._semaphore.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._metrics_lock:
+            stats = dict(self._metrics)
+        stats['state'] = self.breaker.state
+        stats['consecutive_failures'] = self.breaker.consecutive_failures
+        stats['rate_per_second'] = self.bucket.rate
+        stats['max_concurrency'] = self.max_concurrency
+        return stats
+
+
+class RateLimitRegistry:
+    """各服务商调用保护的注册表"""
+
+    def __init__(self):
+        self._guards = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, **kwargs) -> ProviderGuard:
+        """注册（或替换）一个服务商的调用保护"""
+        with self._lock:
+            guard = ProviderGuard(name, **kwargs)
+            self._guards[name] = guard
+            return guard
+
+    def get(self, name: str) -> Optional[ProviderGuard]:
+        return self._guards.get(name)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {name: guard.get_stats() for name, guard in self._guards.items()}
+
+
+# 单例服务
+rate_limit_registry = RateLimitRegistry()
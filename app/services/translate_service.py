@@ -5,21 +5,37 @@
 """
 
 import json
-import re
 from typing import List, Dict, Any, Optional
 from volcengine.ApiInfo import ApiInfo
 from volcengine.Credentials import Credentials
 from volcengine.ServiceInfo import ServiceInfo
 from volcengine.base.Service import Service
 from ..config import AppConfig
+from .translation_memory_service import translation_memory_service
+from .rate_limit_service import rate_limit_registry, CircuitOpenError
+from .language_detect_service import language_detect_service
+
+# 火山引擎 TranslateText 单次请求限制：TextList 最多16条，总长度不超过5000字符
+TRANSLATE_BATCH_MAX_ITEMS = 16
+TRANSLATE_BATCH_MAX_CHARS = 5000
+
+# 火山引擎翻译API调用保护（限流、并发上限、熔断）
+volc_api_guard = rate_limit_registry.register(
+    'volcengine',
+    rate=AppConfig.VOLC_API_RATE_PER_SEC,
+    burst=AppConfig.VOLC_API_BURST,
+    max_concurrency=AppConfig.VOLC_API_MAX_CONCURRENCY
+)
 
 
 class TranslateService:
     """翻译服务"""
     
-    def __init__(self):
+    def __init__(self, memory=None, detector=None):
         """初始化翻译服务"""
         self.service = None
+        self.memory = memory or translation_memory_service
+        self.detector = detector or language_detect_service
         self._init_service()
     
     def _init_service(self):
@@ -68,21 +84,28 @@ class TranslateService:
             return None
         
         try:
-            # 检测文本语言，如果是中文则跳过翻译
-            if self._is_chinese_text(text):
+            # 本地预判：已是目标语言或只有链接、标签、表情的文本不调用API
+            needs_translation, _ = self.detector.check(text, target_language)
+            if not needs_translation:
                 return text
             
+            # 先查翻译记忆，命中则不调用API
+            cached = self.memory.get(text, target_language)
+            if cached is not None:
+                return cached
+            
             body = {
                 'TargetLanguage': target_language,
                 'TextList': [text],
             }
             
-            response = self.service.json('translate', {}, json.dumps(body))
+            response = volc_api_guard.execute(self.service.json, 'translate', {}, json.dumps(body))
             result = json.loads(response)
             
             if 'TranslationList' in result and len(result['TranslationList']) > 0:
                 translated_text = result['TranslationList'][0].get('Translation', '')
                 print(f"翻译成功: '{text}' -> '{translated_text}'")
+                self.memory.put(text, target_language, translated_text)
                 return translated_text
             else:
                 print(f"翻译失败: {result}")
@@ -103,47 +126,128 @@ class TranslateService:
         Returns:
             List[Optional[str]]: 翻译后的文本列表，失败的项目为None
         """
-        if not texts or not self.service:
-            return [None] * len(texts)
+        return self.translate_batch(texts, target_language, keep_skipped=False)
+    
+    def translate_batch(self, texts: List[str], target_language: str = 'zh', keep_skipped: bool = True) -> List[Optional[str]]:
+        """
+        分批翻译一次执行中收集到的全部文本
         
-        try:
-            # 过滤掉空文本和中文文本
-            valid_texts = []
-            text_indices = []
-            
-            for i, text in enumerate(texts):
-                if text and not self._is_chinese_text(text):
-                    valid_texts.append(text)
-                    text_indices.append(i)
-            
-            if not valid_texts:
-                return [None] * len(texts)
-            
-            body = {
-                'TargetLanguage': target_language,
-                'TextList': valid_texts,
-            }
-            
-            response = self.service.json('translate', {}, json.dumps(body))
-            result = json.loads(response)
-            
-            # 构建结果列表
-            results = [None] * len(texts)
-            
-            if 'TranslationList' in result:
-                for i, translation_item in enumerate(result['TranslationList']):
-                    original_index = text_indices[i]
-                    translated_text = translation_item.get('Translation', '')
-                    results[original_index] = translated_text
-                    
-                    if i < len(valid_texts):
-                        print(f"批量翻译成功: '{valid_texts[i]}' -> '{translated_text}'")
+        去重并查询翻译记忆后，按 TextList 条数和总字符数限制打包请求，按下标映射回结果；
+        某一批请求失败时逐条重试，单条失败只影响该条
+        
+        Args:
+            texts: 要翻译的文本列表
+            target_language: 目标语言，默认为中文
+            keep_skipped: 本地预判无需翻译的文本是否原样返回（与 translate_text 一致），否则返回None
             
+        Returns:
+            List[Optional[str]]: 与输入一一对应的译文，失败的项目为None
+        """
+        results = [None] * len(texts)
+        if not texts or not self.service:
             return results
-                
-        except Exception as e:
-            print(f"批量翻译文本时出错: {e}")
-            return [None] * len(texts)
+        
+        # 相同文本只翻译一次
+        pending = {}
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            # 本地预判：已是目标语言或只有链接、标签、表情的文本不发送给API
+            needs_translation, _ = self.detector.check(text, target_language)
+            if not needs_translation:
+                results[i] = text if keep_skipped else None
+                continue
+            pending.setdefault(text, []).append(i)
+        if not pending:
+            return results
+        
+        translations = self.memory.get_many(list(pending.keys()), target_language)
+        to_translate = [text for text in pending if text not in translations]
+        
+        new_translations = {}
+        failed = 0
+        batches = self._pack_batches(to_translate)
+        for batch_index, batch in enumerate(batches):
+            try:
+                batch_results = self._request_translations(batch, target_language)
+            except CircuitOpenError as e:
+                # 翻译服务熔断中，剩余批次不再请求
+                print(f"批量翻译中止: {e}")
+                failed += sum(len(remaining) for remaining in batches[batch_index:])
+                break
+            except Exception as e:
+                print(f"批量翻译请求失败，改为逐条翻译: {e}")
+                batch_results = []
+                for text in batch:
+                    try:
+                        batch_results.extend(self._request_translations([text], target_language))
+                    except CircuitOpenError as item_error:
+                        print(f"翻译文本时出错: {item_error}")
+                        batch_results.extend([None] * (len(batch) - len(batch_results)))
+                        break
+                    except Exception as item_error:
+                        print(f"翻译文本时出错: {item_error}")
+                        batch_results.append(None)
+            for text, translated in zip(batch, batch_results):
+                if translated:
+                    new_translations[text] = translated
+                else:
+                    failed += 1
+        
+        if new_translations:
+            self.memory.put_many(new_translations, target_language)
+            translations.update(new_translations)
+        
+        for text, indices in pending.items():
+            for i in indices:
+                results[i] = translations.get(text)
+        
+        print(f"批量翻译完成：{len(texts)} 条文本，去重后 {len(pending)} 条，"
+              f"记忆命中 {len(pending) - len(to_translate)} 条，请求 {len(batches)} 次，失败 {failed} 条")
+        return results
+    
+    def _pack_batches(self, texts: List[str]) -> List[List[str]]:
+        """按 TextList 条数和总字符数限制打包（超长的单条文本单独成批）"""
+        batches = []
+        current = []
+        current_chars = 0
+        for text in texts:
+            if current and (len(current) >= TRANSLATE_BATCH_MAX_ITEMS
+                            or current_chars + len(text) > TRANSLATE_BATCH_MAX_CHARS):
+                batches.append(current)
+                current = []
+                current_chars = 0
+            current.append(text)
+            current_chars += len(text)
+        if current:
+            batches.append(current)
+        return batches
+    
+    def _request_translations(self, texts: List[str], target_language: str) -> List[Optional[str]]:
+        """
+        发送一次 TextList 翻译请求
+        
+        Returns:
+            List[Optional[str]]: 与输入一一对应的译文，缺失的项目为None
+        
+        Raises:
+            Exception: 请求失败或返回错误信息
+        """
+        body = {
+            'TargetLanguage': target_language,
+            'TextList': texts,
+        }
+        response = volc_api_guard.execute(self.service.json, 'translate', {}, json.dumps(body))
+        result = json.loads(response)
+        
+        if 'TranslationList' not in result:
+            raise ValueError(f"翻译接口返回异常: {result.get('ResponseMetadata', {}).get('Error', result)}")
+        
+        translation_list = result['TranslationList']
+        return [
+            (translation_list[i].get('Translation') or None) if i < len(translation_list) else None
+            for i in range(len(texts))
+        ]
     
     def _is_chinese_text(self, text: str) -> bool:
         """
@@ -155,12 +259,8 @@ class TranslateService:
         Returns:
             bool: 是否为中文文本
         """
-        if not text:
-            return False
-        
-        # 中文字符的Unicode范围
-        chinese_pattern = re.compile(r'[\u4e00-\u9fff]')
-        return bool(chinese_pattern.search(text))
+        # 按汉字占比判断，夹杂个别汉字的外文不算中文
+        return language_detect_service.is_in_language(text, 'zh')
     
     def create_bilingual_text(self, original_text: str, translated_text: str = None) -> str:
         """
@@ -243,9 +343,10 @@ class TranslateService:
             titles = [video.get('title', '') for video in video_list]
             descriptions = [video.get('description', '') for video in video_list]
             
-            # 批量翻译
-            translated_titles = self.translate_texts(titles)
-            translated_descriptions = self.translate_texts(descriptions)
+            # 标题和描述合并为一次分批翻译
+            translated = self.translate_texts(titles + descriptions)
+            translated_titles = translated[:len(titles)]
+            translated_descriptions = translated[len(titles):]
             
             # 更新每个视频的信息
             result = []
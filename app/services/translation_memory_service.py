@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+翻译记忆服务
+按（规范化原文, 目标语言）的哈希缓存翻译结果：进程内LRU在前，SQLite持久化在后，
+频道名、重复标题、固定格式的简介等跨执行重复出现的文本不再重复调用翻译API
+"""
+
+import hashlib
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any
+from sqlalchemy import update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..config import AppConfig
+from ..database import db_manager
+from ..models import TranslationMemory, get_east8_time
+
+# 规范化时合并连续空白
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# 单条SQL绑定参数上限，IN查询按此大小分批
+IN_QUERY_BATCH_SIZE = 500
+
+
+def normalize_text(text: str) -> str:
+    """规范化原文：Unicode NFC、合并空白、去除首尾空白"""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def make_text_hash(text: str) -> str:
+    """计算规范化原文的哈希"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class TranslationMemoryService:
+    """翻译记忆服务"""
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or AppConfig.TRANSLATION_CACHE_SIZE
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'lru_hits': 0, 'db_hits': 0, 'misses': 0, 'stores': 0}
+
+    def _lru_get(self, key):
+        with self._lock:
+            value = self._lru.get(key)
+            if value is not None:
+                self._lru.move_to_end(key)
+            return value
+
+    def _lru_put(self, key, value: str):
+        with self._lock:
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def get(self, text: str, target_language: str) -> Optional[str]:
+        """查询单条翻译记忆，未命中返回None"""
+        return self.get_many([text], target_language).get(text)
+
+    def get_many(self, texts: List[str], target_language: str) -> Dict[str, str]:
+        """
+        批量查询翻译记忆
+
+        Args:
+            texts: 原文列表
+            target_language: 目标语言
+
+        Returns:
+            Dict[str, str]: 命中的 原文 -> 译文
+        """
+        target_language = (target_language or '').lower()
+        found = {}
+        pending = {}
+        for text in dict.fromkeys(t for t in texts if t):
+            text_hash = make_text_hash(text)
+            cached = self._lru_get((text_hash, target_language))
+            if cached is not None:
+                found[text] = cached
+            else:
+                pending.setdefault(text_hash, []).append(text)
+        self._count('lru_hits', len(found))
+        if not pending:
+            return found
+
+        db_found = {}
+        db = db_manager.get_session()
+        try:
+            hashes = list(pending.keys())
+            for start in range(0, len(hashes), IN_QUERY_BATCH_SIZE):
+                rows = db.query(TranslationMemory.text_hash, TranslationMemory.translated_text).filter(
+                    TranslationMemory.target_language == target_language,
+                    TranslationMemory.text_hash.in_(hashes[start:start + IN_QUERY_BATCH_SIZE])
+                ).all()
+                db_found.update({text_hash: translated for text_hash, translated in rows})
+
+            if db_found:
+                db.execute(
+                    update(TranslationMemory)
+                    .where(TranslationMemory.target_language == target_language,
+                           TranslationMemory.text_hash.in_(list(db_found.keys())))
+                    .values(hit_count=TranslationMemory.hit_count + 1, last_used_at=get_east8_time())
+                )
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"查询翻译记忆失败: {e}")
+        finally:
+            db.close()
+
+        hits = 0
+        for text_hash, translated in db_found.items():
+            self._lru_put((text_hash, target_language), translated)
+            for text in pending[text_hash]:
+                found[text] = translated
+                hits += 1
+        self._count('db_hits', hits)
+        self._count('misses', sum(len(group) for group in pending.values()) - hits)
+        return found
+
+    def put(self, text: str, target_language: str, translated_text: str):
+        """保存单条翻译结果"""
+        self.put_many({text: translated_text}, target_language)
+
+    def put_many(self, translations: Dict[str, str], target_language: str):
+        """
+        批量保存翻译结果（已存在的记录以新译文覆盖）
+
+        Args:
+            translations: 原文 -> 译文
+            target_language: 目标语言
+        """
+        target_language = (target_language or '').lower()
+        rows = {}
+        now = get_east8_time()
+        for text, translated in translations.items():
+            if not text or not translated:
+                continue
+            text_hash = make_text_hash(text)
+            self._lru_put((text_hash, target_language), translated)
+            rows[text_hash] = {
+                'text_hash': text_hash,
+                'target_language': target_language,
+                'source_text': normalize_text(text),
+                'translated_text': translated,
+                'hit_count': 0,
+                'created_at': now,
+                'last_used_at': now,
+            }
+        if not rows:
+            return
+
+        db = db_manager.get_session()
+        try:
+            stmt = sqlite_insert(TranslationMemory)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['text_hash', 'target_language'],
+                set_={'translated_text': stmt.excluded.translated_text, 'last_used_at': stmt.excluded.last_used_at}
+            )
+            db.execute(stmt, list(rows.values()))
+            db.commit()
+            self._count('stores', len(rows))
+        except Exception as e:
+            db.rollback()
+            print(f"保存翻译记忆失败: {e}")
+        finally:
+            db.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['lru_size'] = len(self._lru)
+        stats['lru_capacity'] = self.max_entries
+        lookups = stats['lru_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['lru_hits'] + stats['db_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+# 单例服务
+translation_memory_service = TranslationMemoryService()
@@ -0,0 +1,273 @@
+# -*- coding: utf-8 -*-
+"""
+翻译任务队列服务
+视频保存时在同一事务中写入翻译任务，由固定大小的工作线程池分批领取并调用批量翻译；
+失败按指数退避重试，状态持久化在SQLite中，重启后继续处理未完成的任务
+"""
+
+import threading
+import uuid
+from datetime import timedelta
+from typing import List, Dict, Any
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..config import AppConfig
+from ..database import db_manager
+from ..models import TranslationJob, VideoInfo, get_east8_time
+from .translate_service import get_translate_service
+
+# 任务状态
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+# 限制描述长度，避免翻译过长的文本
+DESCRIPTION_MAX_CHARS = 500
+
+
+class TranslationQueue:
+    """翻译任务队列"""
+
+    def __init__(self, workers: int = None, batch_size: int = None):
+        self.workers = workers or AppConfig.TRANSLATION_WORKERS
+        self.batch_size = batch_size or AppConfig.TRANSLATION_BATCH_SIZE
+        self.max_attempts = AppConfig.TRANSLATION_MAX_ATTEMPTS
+        self.backoff_seconds = AppConfig.TRANSLATION_BACKOFF_SECONDS
+        self.poll_interval = 30
+        self._threads = []
+        self._running = False
+        # 有新任务入队或一批任务处理完成时通知等待方
+        self._cond = threading.Condition()
+        self._metrics_lock = threading.Lock()
+        self._metrics = {'claimed': 0, 'done': 0, 'retried': 0, 'failed': 0}
+
+    def enqueue(self, db, video_info_ids: List[int]):
+        """
+        在调用方的事务中为视频写入翻译任务（已存在的任务重置为待处理）
+
+        Args:
+            db: 调用方的数据库会话，由调用方负责提交
+            video_info_ids: VideoInfo 主键列表
+        """
+        now = get_east8_time()
+        rows = [
+            {'video_info_id': video_info_id, 'status': JOB_PENDING, 'attempts': 0,
+             'next_attempt_at': now, 'created_at': now, 'updated_at': now}
+            for video_info_id in dict.fromkeys(vid for vid in video_info_ids if vid)
+        ]
+        if not rows:
+            return
+        stmt = sqlite_insert(TranslationJob)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['video_info_id'],
+            set_={'status': JOB_PENDING, 'attempts': 0, 'next_attempt_at': now,
+                  'last_error': None, 'updated_at': now},
+            where=TranslationJob.status != JOB_RUNNING
+        )
+        db.execute(stmt, rows)
+
+    def notify(self):
+        """唤醒空闲的工作线程（调用方提交事务后调用）"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def start(self):
+        """启动工作线程，并恢复上次停机时未完成的任务"""
+        if self._running:
+            return
+        recovered = self._recover_running_jobs()
+        self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f'translation-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"翻译任务队列已启动，工作线程 {self.workers} 个，恢复未完成任务 {recovered} 个")
+
+    def stop(self):
+        """停止工作线程（正在处理的批次完成后退出）"""
+        self._running = False
+        self.notify()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        print("翻译任务队列已停止")
+
+    def _recover_running_jobs(self) -> int:
+        """上次停机时处于处理中的任务重新置为待处理"""
+        db = db_manager.get_session()
+        try:
+            result = db.execute(
+                update(TranslationJob)
+                .where(TranslationJob.status == JOB_RUNNING)
+                .values(status=JOB_PENDING, claim_token=None, next_attempt_at=get_east8_time())
+            )
+            db.commit()
+            return result.rowcount or 0
+        except Exception as e:
+            db.rollback()
+            print(f"恢复翻译任务失败: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def _worker_loop(self):
+        """工作线程主循环：领取一批任务并处理，无任务时等待通知或轮询"""
+        while self._running:
+            try:
+                processed = self._process_next_batch()
+            except Exception as e:
+                print(f"翻译工作线程出错: {e}")
+                processed = 0
+            if not processed:
+                with self._cond:
+                    if self._running:
+                        self._cond.wait(timeout=self.poll_interval)
+
+    def _claim_batch(self, db) -> List[TranslationJob]:
+        """原子地领取一批到期的待处理任务"""
+        token = str(uuid.uuid4())
+        due_ids = select(TranslationJob.id).where(
+            TranslationJob.status == JOB_PENDING,
+            TranslationJob.next_attempt_at <= get_east8_time()
+        ).order_by(TranslationJob.next_attempt_at, TranslationJob.id).limit(self.batch_size)
+        # 单条UPDATE在SQLite写锁内完成，多个工作线程不会领取到同一任务
+        db.execute(
+            update(TranslationJob)
+            .where(TranslationJob.id.in_(due_ids.scalar_subquery()), TranslationJob.status == JOB_PENDING)
+            .values(status=JOB_RUNNING, claim_token=token, updated_at=get_east8_time()),
+            execution_options={'synchronize_session': False}
+        )
+        db.commit()
+        return db.query(TranslationJob).filter(TranslationJob.claim_token == token).all()
+
+    def _process_next_batch(self) -> int:
+        """处理一批翻译任务，返回处理的任务数"""
+        translate_service = get_translate_service()
+        if not translate_service:
+            return 0
+
+        db = db_manager.get_session()
+        try:
+            jobs = self._claim_batch(db)
+            if not jobs:
+                return 0
+            with self._metrics_lock:
+                self._metrics['claimed'] += len(jobs)
+
+            videos = {
+                video.id: video for video in
+                db.query(VideoInfo).filter(VideoInfo.id.in_([job.video_info_id for job in jobs])).all()
+            }
+
+            # 收集整批视频中未翻译的标题和描述，一次分批翻译
+            fields = []
+            texts = []
+            for job in jobs:
+                video = videos.get(job.video_info_id)
+                if not video:
+                    continue
+                if video.title and not video.translated_title:
+                    fields.append((job, video, 'translated_title'))
+                    texts.append(video.title)
+                if video.description and not video.translated_description:
+                    fields.append((job, video, 'translated_description'))
+                    texts.append(video.description[:DESCRIPTION_MAX_CHARS])
+
+            error = None
+            try:
+                translations = translate_service.translate_batch(texts)
+            except Exception as e:
+                error = str(e)
+                translations = [None] * len(texts)
+
+            failed_job_ids = set()
+            now = get_east8_time()
+            for (job, video, field), translated in zip(fields, translations):
+                if translated:
+                    setattr(video, field, translated)
+                    video.translation_updated_at = now
+                else:
+                    failed_job_ids.add(job.id)
+
+            for job in jobs:
+                job.claim_token = None
+                if job.id not in failed_job_ids:
+                    job.status = JOB_DONE
+                    job.last_error = None
+                    continue
+                job.attempts = (job.attempts or 0) + 1
+                job.last_error = error or '部分字段翻译失败'
+                if job.attempts >= self.max_attempts:
+                    job.status = JOB_FAILED
+                else:
+                    # 指数退避：backoff * 2^(attempts-1)
+                    job.status = JOB_PENDING
+                    job.next_attempt_at = now + timedelta(seconds=self.backoff_seconds * (2 ** (job.attempts - 1)))
+
+            db.commit()
+
+            failed = sum(1 for job in jobs if job.status == JOB_FAILED)
+            retried = len(failed_job_ids) - failed
+            with self._metrics_lock:
+                self._metrics['done'] += len(jobs) - len(failed_job_ids)
+                self._metrics['retried'] += retried
+                self._metrics['failed'] += failed
+            print(f"翻译任务批次完成：{len(jobs)} 个视频，成功 {len(jobs) - len(failed_job_ids)}，重试 {retried}，失败 {failed}")
+            return len(jobs)
+        except Exception as e:
+            db.rollback()
+            print(f"处理翻译任务批次失败: {e}")
+            return 0
+        finally:
+            db.close()
+            self.notify()
+
+    def wait_for(self, video_info_ids: List[int], timeout: float) -> bool:
+        """
+        等待指定视频的翻译任务结束（完成或最终失败）
+
+        Args:
+            video_info_ids: VideoInfo 主键列表
+            timeout: 最长等待秒数
+
+        Returns:
+            bool: 是否在超时前全部结束
+        """
+        if not video_info_ids or timeout <= 0 or not self._running:
+            return False
+        deadline = get_east8_time() + timedelta(seconds=timeout)
+        while True:
+            db = db_manager.get_session()
+            try:
+                unfinished = db.query(func.count(TranslationJob.id)).filter(
+                    TranslationJob.video_info_id.in_(video_info_ids),
+                    TranslationJob.status.in_([JOB_PENDING, JOB_RUNNING])
+                ).scalar()
+            finally:
+                db.close()
+            remaining = (deadline - get_east8_time()).total_seconds()
+            if not unfinished:
+                return True
+            if remaining <= 0:
+                return False
+            with self._cond:
+                self._cond.wait(timeout=min(remaining, 1.0))
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取队列统计：各状态任务数与处理计数"""
+        db = db_manager.get_session()
+        try:
+            rows = db.query(TranslationJob.status, func.count(TranslationJob.id)).group_by(TranslationJob.status).all()
+        finally:
+            db.close()
+        with self._metrics_lock:
+            stats = dict(self._metrics)
+        stats['by_status'] = {status: count for status, count in rows}
+        stats['workers'] = self.workers if self._running else 0
+        stats['batch_size'] = self.batch_size
+        return stats
+
+
+# 单例服务
+translation_queue = TranslationQueue()
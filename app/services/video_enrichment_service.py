@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+视频信息补全服务
+search接口不返回统计数据和时长，这里在一次执行结束后收集视频ID，
+通过videos.list批量获取（每50个ID消耗1配额单位），并一次性批量写回VideoInfo
+"""
+
+from typing import List, Dict, Any
+from ..database import db_manager
+from ..models import VideoInfo
+from .youtube_service import youtube_service
+
+
+def _to_int(value) -> int:
+    """将API返回的字符串计数转换为整数"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class VideoEnrichmentService:
+    """视频信息补全服务"""
+
+    def __init__(self, youtube_api=None):
+        self.youtube_api = youtube_api or youtube_service
+
+    def enrich_videos(self, video_ids: List[str]) -> int:
+        """
+        补全视频的观看数、点赞数、评论数和时长
+
+        Args:
+            video_ids: YouTube视频ID列表（VideoInfo.video_id）
+
+        Returns:
+            int: 成功更新的视频数量
+        """
+        if not video_ids:
+            return 0
+
+        details = self.youtube_api.get_video_details(video_ids)
+        if not details:
+            return 0
+
+        db = db_manager.get_session()
+        try:
+            rows = db.query(VideoInfo.id, VideoInfo.video_id).filter(
+                VideoInfo.video_id.in_(list(details.keys()))
+            ).all()
+
+            mappings = []
+            for row_id, video_id in rows:
+                mappings.append(self._build_mapping(row_id, details[video_id]))
+
+            if mappings:
+                # 按主键批量UPDATE，一条executemany语句完成
+                db.bulk_update_mappings(VideoInfo, mappings)
+                db.commit()
+
+            print(f"视频信息补全完成，更新了 {len(mappings)} 条记录")
+            return len(mappings)
+        except Exception as e:
+            db.rollback()
+            print(f"视频信息补全失败: {e}")
+            return 0
+        finally:
+            db.close()
+
+    def _build_mapping(self, row_id: int, item: Dict[str, Any]) -> Dict[str, Any]:
+        """将videos.list返回的item转换为VideoInfo的更新字段"""
+        statistics = item.get('statistics', {})
+        content_details = item.get('contentDetails', {})
+        snippet = item.get('snippet', {})
+
+        mapping = {
+            'id': row_id,
+            'view_count': _to_int(statistics.get('viewCount')),
+            'like_count': _to_int(statistics.get('likeCount')),
+            'comment_count': _to_int(statistics.get('commentCount')),
+            'duration': content_details.get('duration'),
+        }
+        # search接口的snippet不包含以下字段，videos.list的snippet中有则一并补全
+        if snippet.get('tags'):
+            mapping['tags'] = snippet['tags']
+        if snippet.get('categoryId'):
+            mapping['category_id'] = snippet['categoryId']
+        if snippet.get('defaultLanguage'):
+            mapping['default_language'] = snippet['defaultLanguage']
+        if snippet.get('defaultAudioLanguage'):
+            mapping['default_audio_language'] = snippet['defaultAudioLanguage']
+        return mapping
+
+
+# 单例服务
+video_enrichment_service = VideoEnrichmentService()
@@ -1,17 +1,27 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import copy
+import glob
 import os
 import re
+import shutil
+import threading
+import time
 import yt_dlp
+from collections import OrderedDict
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 import logging
+from ..config import AppConfig
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 从YouTube链接中提取11位视频ID（watch、youtu.be、embed、v、shorts）
+_YOUTUBE_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/embed/|/v/|/shorts/)([\w-]{11})(?![\w-])')
+
 class YouTubeDownloader:
     """YouTube视频下载器"""
     
@@ -25,6 +35,14 @@ class YouTubeDownloader:
         self.download_path = download_path
         self._ensure_download_path()
         
+        # 视频信息缓存：规范化视频ID -> (过期时间, yt-dlp信息字典, 格式表)；下载时复用，避免重复解析
+        self.info_cache_ttl = AppConfig.DOWNLOAD_INFO_CACHE_TTL
+        self.info_cache_size = AppConfig.DOWNLOAD_INFO_CACHE_SIZE
+        self._info_cache = OrderedDict()
+        self._info_cache_lock = threading.Lock()
+        self._info_cache_stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0,
+                                  'download_reuses': 0, 'download_refetches': 0}
+        
         # 默认下载选项
         self.default_options = {
             'format': 'best',  # 最佳质量
@@ -33,9 +51,37 @@ class YouTubeDownloader:
             'writeautomaticsub': False,
             'ignoreerrors': True,
             'no_warnings': False,
-            'quiet': False,
-            'verbose': True
+            'quiet': True,
+            'noprogress': True,
+            # 断点续传：保留 .part 文件，重启后从已下载的位置继续
+            'continuedl': True,
+            'nopart': False,
+            'retries': AppConfig.DOWNLOAD_RETRIES,
+            'fragment_retries': AppConfig.DOWNLOAD_RETRIES,
+            # 分片并发下载（HLS/DASH），普通HTTP下载按块请求，避免单个长连接被限速
+            'concurrent_fragment_downloads': AppConfig.DOWNLOAD_CONCURRENT_FRAGMENTS,
         }
+        if AppConfig.DOWNLOAD_HTTP_CHUNK_SIZE > 0:
+            self.default_options['http_chunk_size'] = AppConfig.DOWNLOAD_HTTP_CHUNK_SIZE
+        if AppConfig.DOWNLOAD_RATE_LIMIT > 0:
+            self.default_options['ratelimit'] = AppConfig.DOWNLOAD_RATE_LIMIT
+        self.default_options.update(self._external_downloader_options())
+    
+    def _external_downloader_options(self) -> Dict:
+        """外部下载器选项（配置了且已安装时启用）"""
+        name = AppConfig.DOWNLOAD_EXTERNAL_DOWNLOADER.strip()
+        if not name:
+            return {}
+        if not shutil.which(name):
+            logger.warning(f"外部下载器 {name} 未安装，使用内置下载器")
+            return {}
+        connections = str(max(AppConfig.DOWNLOAD_CONCURRENT_FRAGMENTS, 1))
+        options = {'external_downloader': {'default': name}}
+        if os.path.basename(name).startswith('aria2c'):
+            options['external_downloader_args'] = {
+                'aria2c': ['-x', connections, '-s', connections, '-k', '1M', '--continue=true']
+            }
+        return options
     
     def _ensure_download_path(self):
         """确保下载路径存在"""
@@ -43,6 +89,69 @@ class YouTubeDownloader:
             os.makedirs(self.download_path)
             logger.info(f"创建下载目录: {self.download_path}")
     
+    @staticmethod
+    def get_cache_key(url: str) -> str:
+        """视频信息缓存键：YouTube链接规范化为 youtube:<视频ID>，同一视频的不同链接形式共用缓存"""
+        match = _YOUTUBE_ID_RE.search(url or '')
+        if match:
+            return f"youtube:{match.group(1)}"
+        return (url or '').strip()
+    
+    def _count_cache(self, name: str):
+        with self._info_cache_lock:
+            self._info_cache_stats[name] += 1
+    
+    def _get_cached_info(self, url: str) -> Optional[Dict]:
+        """获取未过期的缓存条目"""
+        if self.info_cache_ttl <= 0:
+            return None
+        key = self.get_cache_key(url)
+        with self._info_cache_lock:
+            entry = self._info_cache.get(key)
+            if entry is None:
+                self._info_cache_stats['misses'] += 1
+                return None
+            if entry['expires_at'] <= time.monotonic():
+                # 格式中的下载地址带有过期签名，过期后必须重新解析
+                del self._info_cache[key]
+                self._info_cache_stats['expired'] += 1
+                self._info_cache_stats['misses'] += 1
+                return None
+            self._info_cache.move_to_end(key)
+            self._info_cache_stats['hits'] += 1
+            return entry
+    
+    def _store_cached_info(self, url: str, info: Dict, video_info: Dict):
+        if self.info_cache_ttl <= 0:
+            return
+        key = self.get_cache_key(url)
+        with self._info_cache_lock:
+            self._info_cache[key] = {
+                'expires_at': time.monotonic() + self.info_cache_ttl,
+                'info': info,
+                'video_info': video_info,
+            }
+            self._info_cache.move_to_end(key)
+            while len(self._info_cache) > self.info_cache_size:
+                self._info_cache.popitem(last=False)
+                self._info_cache_stats['evictions'] += 1
+    
+    def invalidate_cached_info(self, url: str):
+        """删除视频信息缓存"""
+        with self._info_cache_lock:
+            self._info_cache.pop(self.get_cache_key(url), None)
+    
+    def get_info_cache_stats(self) -> Dict:
+        """获取视频信息缓存统计：命中、未命中、过期、淘汰次数及下载复用次数"""
+        with self._info_cache_lock:
+            stats = dict(self._info_cache_stats)
+            stats['size'] = len(self._info_cache)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['ttl_seconds'] = self.info_cache_ttl
+        stats['max_size'] = self.info_cache_size
+        return stats
+    
     def extract_video_info(self, url: str) -> Dict:
         """
         提取视频信息
@@ -53,6 +162,14 @@ class YouTubeDownloader:
         Returns:
             包含视频信息的字典
         """
+        cached = self._get_cached_info(url)
+        if cached:
+            return {
+                'success': True,
+                'cached': True,
+                'video_info': copy.deepcopy(cached['video_info'])
+            }
+        
         try:
             ydl_opts = {
                 'quiet': True,
@@ -62,6 +179,8 @@ class YouTubeDownloader:
             
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
                 info = ydl.extract_info(url, download=False)
+                # 与 --load-info-json 相同，去掉下载过程中生成的私有字段后缓存，下载时交给 process_ie_result 复用
+                raw_info = ydl.sanitize_info(info, remove_private_keys=True)
                 
                 # 提取基本信息
                 video_info = {
@@ -102,9 +221,12 @@ class YouTubeDownloader:
                 # 添加预定义格式选项
                 video_info['predefined_formats'] = self._get_predefined_formats()
                 
+                self._store_cached_info(url, raw_info, video_info)
+                
                 return {
                     'success': True,
-                    'video_info': video_info
+                    'cached': False,
+                    'video_info': copy.deepcopy(video_info)
                 }
                 
         except Exception as e:
@@ -171,19 +293,38 @@ class YouTubeDownloader:
             
             logger.info(f"开始下载视频: {url}")
             logger.info(f"下载选项: {download_options}")
+
             
             # 创建下载器
             with yt_dlp.YoutubeDL(download_options) as ydl:
-                # 下载视频
-                result = ydl.download([url])
+                cached = self._get_cached_info(url)
+                if cached:
+                    # 复用预览时解析的信息，跳过重新解析，按本次的下载选项重新选择格式
+                    self._count_cache('download_reuses')
+                    info = ydl.process_ie_result(copy.deepcopy(cached['info']), download=True)
+                    # 与 ydl.download() 的返回值相同：出错时（ignoreerrors 下错误只记录不抛出）为非0
+                    result = ydl._download_retcode
+                    if result != 0:
+                        # 缓存的下载地址可能已失效，重新解析后下载一次
+                        logger.warning(f"使用缓存的视频信息下载失败，重新解析: {url}")
+                        self.invalidate_cached_info(url)
+                        self._count_cache('download_refetches')
+                        ydl._download_retcode = 0
+                        info = ydl.extract_info(url, download=True)
+                        result = ydl._download_retcode
+                else:
+                    # 下载视频（extract_info 与 ydl.download() 流程相同，但会返回包含最终文件路径的信息）
+                    info = ydl.extract_info(url, download=True)
+                    result = ydl._download_retcode
                 
                 if result == 0:
-                    # 获取下载后的文件信息
-                    downloaded_files = self._get_downloaded_files(download_options['outtmpl'])
+                    # 获取下载后的文件信息：优先使用 yt-dlp 记录的最终文件路径，避免扫描整个目录
+                    downloaded_files = self._collect_downloaded_files(info) or self._get_downloaded_files(ydl, info)
                     
                     return {
                         'success': True,
                         'message': '视频下载成功',
+                        'video_id': self._canonical_video_id(info, url),
                         'files': downloaded_files
                     }
                 else:
@@ -199,27 +340,73 @@ class YouTubeDownloader:
                 'error': f"下载失败: {str(e)}"
             }
     
-    def _get_downloaded_files(self, outtmpl: str) -> List[Dict]:
-        """获取下载的文件信息"""
+    def get_video_id(self, url: str) -> Optional[str]:
+        """
+        下载前获取规范化视频ID，用于查找已下载的文件
+
+        未缓存时先解析一次视频信息（结果进入缓存，随后的下载直接复用）；
+        信息缓存关闭时不提前解析（否则每次下载都要解析两次），
+        此时以及解析失败时YouTube链接仍可从链接中取得视频ID，其他链接返回None
+        """
+        if self.info_cache_ttl <= 0:
+            key = self.get_cache_key(url)
+            return key if key.startswith('youtube:') else None
+        entry = self._get_cached_info(url)
+        if entry is None:
+            self.extract_video_info(url)
+            entry = self._get_cached_info(url)
+        if entry is not None:
+            return self._canonical_video_id(entry['info'], url)
+        key = self.get_cache_key(url)
+        return key if key.startswith('youtube:') else None
+
+    def _canonical_video_id(self, info: Optional[Dict], url: str) -> str:
+        """规范化视频ID（extractor:id，YouTube视频与信息缓存键一致，为 youtube:<视频ID>）"""
+        if info and info.get('id') and info.get('extractor_key'):
+            return f"{info['extractor_key'].lower()}:{info['id']}"
+        return self.get_cache_key(url)
+    
+    def _file_info(self, file_path: str) -> Dict:
+        stat = os.stat(file_path)
+        return {
+            'path': file_path,
+            'name': os.path.basename(file_path),
+            'size': stat.st_size,
+            'size_mb': round(stat.st_size / (1024 * 1024), 2),
+            'created_time': datetime.fromtimestamp(stat.st_ctime).isoformat()
+        }
+    
+    def _collect_downloaded_files(self, info: Optional[Dict]) -> List[Dict]:
+        """从下载结果信息中取出最终文件（合并、后处理之后的路径）"""
+        files = []
+        entries = (info.get('entries') or []) if info and info.get('_type') == 'playlist' else [info]
+        for entry in entries:
+            for download in (entry or {}).get('requested_downloads') or []:
+                file_path = download.get('filepath') or download.get('_filename')
+                if file_path and os.path.isfile(file_path) and file_path not in [f['path'] for f in files]:
+                    files.append(self._file_info(file_path))
+        return files
+    
+    def _get_downloaded_files(self, ydl, info: Optional[Dict]) -> List[Dict]:
+        """
+        下载结果中没有最终文件路径时，按本视频实际生成的文件名查找下载的文件
+
+        模板字段用本视频的信息填充后只替换扩展名为通配符（合并、转码后扩展名可能变化），
+        不会匹配到目录中其他视频的文件
+        """
         files = []
         try:
-            # 从输出模板推断文件名模式
-            if '%(title)s' in outtmpl and '%(ext)s' in outtmpl:
-                # 查找匹配的文件
-                import glob
-                pattern = outtmpl.replace('%(title)s', '*').replace('%(ext)s', '*')
-                matching_files = glob.glob(pattern)
-                
-                for file_path in matching_files:
-                    if os.path.exists(file_path):
-                        file_info = {
-                            'path': file_path,
-                            'name': os.path.basename(file_path),
-                            'size': os.path.getsize(file_path),
-                            'size_mb': round(os.path.getsize(file_path) / (1024 * 1024), 2),
-                            'created_time': datetime.fromtimestamp(os.path.getctime(file_path)).isoformat()
-                        }
-                        files.append(file_info)
+            entries = (info.get('entries') or []) if info and info.get('_type') == 'playlist' else [info]
+            for entry in entries:
+                if not entry:
+                    continue
+                stem = os.path.splitext(ydl.prepare_filename(entry))[0]
+                for file_path in glob.glob(glob.escape(stem) + '.*'):
+                    # 排除未完成的临时文件与分片文件
+                    if file_path.endswith(('.part', '.ytdl')) or '.part-Frag' in file_path:
+                        continue
+                    if os.path.isfile(file_path) and file_path not in [f['path'] for f in files]:
+                        files.append(self._file_info(file_path))
         except Exception as e:
             logger.error(f"获取下载文件信息失败: {str(e)}")
         
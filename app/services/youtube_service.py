@@ -1,68 +1,333 @@
 # -*- coding: utf-8 -*-
 
 import time
+import hashlib
+import threading
+import httplib2
+import google_auth_httplib2
 import googleapiclient.discovery
 import googleapiclient.errors
 import os # Added for os.environ
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from ..config import AppConfig
 from ..utils.datetime_utils import normalize_rfc3339_date, parse_rfc3339_datetime
+from .quota_service import QuotaManager, QuotaExceededError, quota_manager
+from .rate_limit_service import rate_limit_registry, CircuitOpenError, RateLimitedError
 
+# search.list 每页最多返回50条，每次调用消耗100配额单位
+SEARCH_PAGE_SIZE = 50
+SEARCH_LIST_COST = 100
+# videos.list 每次最多查询50个ID，每次调用消耗1配额单位
+VIDEOS_BATCH_SIZE = 50
+VIDEOS_LIST_COST = 1
+
+
+def _is_youtube_failure(error: Exception) -> bool:
+    """判断异常是否计入熔断：4xx（429除外）是参数或配额问题，不代表服务故障"""
+    if isinstance(error, QuotaExceededError):
+        return False
+    if isinstance(error, googleapiclient.errors.HttpError):
+        status = getattr(error.resp, 'status', 500)
+        return status >= 500 or status == 429
+    return True
+
+
+# YouTube Data API 调用保护（限流、并发上限、熔断）
+youtube_api_guard = rate_limit_registry.register(
+    'youtube',
+    rate=AppConfig.YT_API_RATE_PER_SEC,
+    burst=AppConfig.YT_API_BURST,
+    max_concurrency=AppConfig.YT_API_MAX_CONCURRENCY,
+    is_failure=_is_youtube_failure
+)
+
+
+class YouTubeClientPool:
+    """YouTube API客户端池
+
+    按凭证指纹缓存已构建的discovery客户端，避免每次执行都重新解析discovery文档、
+    重新建立HTTPS连接。只有当凭证的access token发生变化（即被刷新）时才重建客户端。
+    httplib2连接对象不是线程安全的，因此每个线程持有各自的AuthorizedHttp，
+    discovery客户端本身在线程间共享。
+    """
 
-class YouTubeSearchAPI:
     def __init__(self):
-        self.youtube = None
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stats = {'hits': 0, 'builds': 0, 'rebuilds': 0}
 
-    def authenticate(self, credentials) -> bool:
-        try:
-            # 检查系统代理设置并配置环境变量
-            try:
-                import winreg
-                key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                                    r"Software\Microsoft\Windows\CurrentVersion\Internet Settings")
-                proxy_enable, _ = winreg.QueryValueEx(key, "ProxyEnable")
-                if proxy_enable:
-                    proxy_server, _ = winreg.QueryValueEx(key, "ProxyServer")
-                    winreg.CloseKey(key)
-                    
-                    # 设置环境变量来配置代理
-                    if ':' in proxy_server:
-                        host, port = proxy_server.split(':', 1)
-                        proxy_url = f"http://{host}:{port}"
-                        os.environ['HTTP_PROXY'] = proxy_url
-                        os.environ['HTTPS_PROXY'] = proxy_url
-                        print(f"检测到系统代理: {proxy_server}，已配置环境变量")
-                    else:
-                        print(f"代理地址格式不正确: {proxy_server}")
-                else:
-                    winreg.CloseKey(key)
-                    print("未检测到系统代理")
-            except Exception as e:
-                print(f"无法检测系统代理设置: {e}")
-            
-            # 使用标准的认证方法，让googleapiclient自动处理代理
-            self.youtube = googleapiclient.discovery.build(
+    @staticmethod
+    def fingerprint(credentials) -> str:
+        """计算凭证指纹（client_id + refresh_token + scopes），不包含会变化的access token"""
+        raw = '|'.join([
+            getattr(credentials, 'client_id', None) or '',
+            getattr(credentials, 'refresh_token', None) or getattr(credentials, 'token', None) or '',
+            ','.join(sorted(getattr(credentials, 'scopes', None) or [])),
+        ])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+    def get_client(self, credentials):
+        """获取凭证对应的客户端，命中缓存时直接复用"""
+        key = self.fingerprint(credentials)
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry and entry['token'] == credentials.token:
+                self.stats['hits'] += 1
+                return entry['client']
+
+            client = googleapiclient.discovery.build(
                 AppConfig.YT_API_SERVICE_NAME,
                 AppConfig.YT_API_VERSION,
                 credentials=credentials,
                 cache_discovery=False
             )
+            self._clients[key] = {
+                'client': client,
+                'credentials': credentials,
+                'token': credentials.token,
+                'built_at': time.time(),
+            }
+            if entry:
+                self.stats['rebuilds'] += 1
+                print(f"YouTube客户端凭证已刷新，重建客户端: {key}")
+            else:
+                self.stats['builds'] += 1
+                print(f"YouTube客户端已构建: {key}")
+            return client
+
+    def get_http(self, credentials):
+        """获取当前线程专用的授权HTTP对象，供 request.execute(http=...) 使用"""
+        key = self.fingerprint(credentials)
+        cache = getattr(self._local, 'http', None)
+        if cache is None:
+            cache = self._local.http = {}
+        cached = cache.get(key)
+        if cached and cached[0] == credentials.token:
+            return cached[1]
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+        cache[key] = (credentials.token, http)
+        return http
+
+    @staticmethod
+    def is_usable(credentials) -> bool:
+        """在本地检查凭证是否可用，不发起任何API请求、不消耗配额"""
+        if credentials is None or not getattr(credentials, 'token', None):
+            return False
+        if getattr(credentials, 'valid', False):
+            return True
+        # token已过期但可以刷新，AuthorizedHttp会在请求时自动刷新
+        return bool(getattr(credentials, 'refresh_token', None))
+
+    def invalidate(self, credentials=None):
+        """移除指定凭证（或全部）的缓存客户端"""
+        with self._lock:
+            if credentials is None:
+                self._clients.clear()
+            else:
+                self._clients.pop(self.fingerprint(credentials), None)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {**self.stats, 'clients': len(self._clients)}
+
+
+_proxy_configured = False
+
+
+def _configure_system_proxy():
+    """检查Windows系统代理设置并配置环境变量（每个进程只检查一次）"""
+    global _proxy_configured
+    if _proxy_configured:
+        return
+    _proxy_configured = True
+    try:
+        import winreg
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
+                            r"Software\Microsoft\Windows\CurrentVersion\Internet Settings")
+        proxy_enable, _ = winreg.QueryValueEx(key, "ProxyEnable")
+        if proxy_enable:
+            proxy_server, _ = winreg.QueryValueEx(key, "ProxyServer")
+            winreg.CloseKey(key)
             
-            # 测试连接
-            try:
-                # 尝试一个简单的API调用来验证连接
-                test_request = self.youtube.search().list(part='snippet', q='test', maxResults=1)
-                test_request.execute()
-                print("YouTube API认证成功，连接测试通过")
-                return True
-            except Exception as test_error:
-                print(f"连接测试失败: {test_error}")
+            # 设置环境变量来配置代理
+            if ':' in proxy_server:
+                host, port = proxy_server.split(':', 1)
+                proxy_url = f"http://{host}:{port}"
+                os.environ['HTTP_PROXY'] = proxy_url
+                os.environ['HTTPS_PROXY'] = proxy_url
+                print(f"检测到系统代理: {proxy_server}，已配置环境变量")
+            else:
+                print(f"代理地址格式不正确: {proxy_server}")
+        else:
+            winreg.CloseKey(key)
+            print("未检测到系统代理")
+    except Exception as e:
+        print(f"无法检测系统代理设置: {e}")
+
+
+class YouTubeSearchAPI:
+    def __init__(self, client_pool: YouTubeClientPool = None, quota: QuotaManager = None):
+        # 单例被路由与定时任务线程共享，认证得到的客户端和凭证按线程保存，互不覆盖
+        self._auth = threading.local()
+        self.client_pool = client_pool or youtube_client_pool
+        self.quota_manager = quota or quota_manager
+
+    @property
+    def youtube(self):
+        """当前线程认证得到的API客户端"""
+        return getattr(self._auth, 'youtube', None)
+
+    @property
+    def credentials(self):
+        """当前线程认证使用的凭证"""
+        return getattr(self._auth, 'credentials', None)
+
+    def authenticate(self, credentials) -> bool:
+        try:
+            _configure_system_proxy()
+            
+            # 本地校验凭证，不再发送消耗100配额的测试搜索
+            if not self.client_pool.is_usable(credentials):
+                print("YouTube API凭证无效或已过期且无法刷新")
                 return False
+            
+            # 从客户端池获取（复用）已构建的客户端
+            self._auth.youtube = self.client_pool.get_client(credentials)
+            self._auth.credentials = credentials
+            return True
                 
         except Exception as e:
             print(f"认证失败: {e}")
             return False
 
+    def _execute(self, request, call_type: str):
+        """在限流与熔断保护下执行API请求（熔断或限流时不发送请求，也不消耗配额）"""
+        # 配额明显不足时不占用限流令牌；实际扣减在 _send 中原子完成
+        self.quota_manager.check(call_type)
+        return youtube_api_guard.execute(self._send, request, call_type)
+
+    def _send(self, request, call_type: str):
+        """预留本次调用的配额（不足时抛出 QuotaExceededError），再使用当前线程的授权连接执行API请求"""
+        self.quota_manager.reserve(call_type)
+        if self.credentials is None:
+            return request.execute()
+        return request.execute(http=self.client_pool.get_http(self.credentials))
+
+    @staticmethod
+    def _is_quota_error(error: googleapiclient.errors.HttpError) -> bool:
+        """判断HttpError是否为配额耗尽（403 quotaExceeded / dailyLimitExceeded）"""
+        content = getattr(error, 'content', b'') or b''
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', errors='ignore')
+        return 'quotaExceeded' in content or 'dailyLimitExceeded' in content
+
+    def _build_search_params(self, query, max_results=25, published_after=None,
+                             published_before=None, region_code=None, relevance_language=None,
+                             video_duration=None, video_definition=None, video_embeddable=None,
+                             video_license=None, video_syndicated=None, video_type=None,
+                             order_by='relevance', page_token=None) -> Tuple[Optional[dict], Optional[str]]:
+        """构建search.list请求参数，返回 (参数, 错误信息)"""
+        search_params = {
+            'part': 'snippet',
+            'q': query,
+            'maxResults': max_results,
+            'type': 'video',
+            'order': order_by  # 新增：排序参数
+        }
+
+        if published_after:
+            search_params['publishedAfter'] = normalize_rfc3339_date(published_after, end_of_day=False)
+        if published_before:
+            search_params['publishedBefore'] = normalize_rfc3339_date(published_before, end_of_day=True)
+
+        pa = search_params.get('publishedAfter')
+        pb = search_params.get('publishedBefore')
+        if pa and pb:
+            d_pa = parse_rfc3339_datetime(pa)
+            d_pb = parse_rfc3339_datetime(pb)
+            if d_pa and d_pb and d_pa > d_pb:
+                return None, "published_after 不应晚于 published_before，请调整日期范围"
+
+        if region_code:
+            search_params['regionCode'] = region_code
+        if relevance_language:
+            search_params['relevanceLanguage'] = relevance_language
+        if video_duration:
+            search_params['videoDuration'] = video_duration
+        if video_definition:
+            search_params['videoDefinition'] = video_definition
+        if video_embeddable:
+            search_params['videoEmbeddable'] = video_embeddable
+        if video_license:
+            search_params['videoLicense'] = video_license
+        if video_syndicated:
+            search_params['videoSyndicated'] = video_syndicated
+        if video_type:
+            search_params['videoType'] = video_type
+        if page_token:
+            search_params['pageToken'] = page_token
+
+        return search_params, None
+
+    def _execute_search(self, search_params: dict) -> dict:
+        """
+        执行一次search.list请求
+
+        不在调用线程中等待重试：失败由限流熔断器计数，错误直接返回给调用方，
+        定时任务按下一次调度重新执行
+        """
+        try:
+            # 记录实际发送给API的参数
+            print(f"YouTube API搜索参数:")
+            for key, value in search_params.items():
+                print(f"  {key}: {value}")
+
+            request = self.youtube.search().list(**search_params)
+            response = self._execute(request, 'search.list')
+
+            return {
+                "success": True,
+                "data": response,
+                "total_results": response.get('pageInfo', {}).get('totalResults', 0)
+            }
+
+        except QuotaExceededError as e:
+            # 本地配额预算不足，不发送请求
+            return {"error": str(e), "quota_exceeded": True}
+
+        except (CircuitOpenError, RateLimitedError) as e:
+            # 服务熔断或限流等待超时
+            return {"error": str(e), "circuit_open": isinstance(e, CircuitOpenError)}
+
+        except googleapiclient.errors.HttpError as e:
+            error_msg = f"API请求失败: {e}"
+            if self._is_quota_error(e):
+                # 配额耗尽，记录后直接返回
+                self.quota_manager.mark_exhausted()
+                return {"error": error_msg, "quota_exceeded": True}
+            return {"error": error_msg}
+
+        except Exception as e:
+            error_msg = f"搜索失败: {e}"
+            error_str = str(e)
+            
+            # 详细的网络错误诊断
+            if "WinError 10061" in error_str:
+                error_msg = "连接被拒绝 (WinError 10061)。可能原因：1) 代理配置问题 2) 防火墙阻止 3) 网络配置问题。请检查系统代理设置或联系网络管理员。"
+            elif "WinError 10060" in error_str or "timeout" in error_str.lower():
+                error_msg = "网络连接超时，请检查网络设置或稍后重试"
+            elif "WinError 10065" in error_str:
+                error_msg = "目标主机无法访问 (WinError 10065)。请检查网络连接和DNS设置。"
+            elif "WinError 10054" in error_str:
+                error_msg = "连接被远程主机关闭 (WinError 10054)。请稍后重试。"
+            elif "WinError 10013" in error_str:
+                error_msg = "权限被拒绝 (WinError 10013)。请检查防火墙设置。"
+            
+            print(f"网络错误详情: {error_str}")
+            return {"error": error_msg}
+
     def search_videos(self, query, max_results=25, published_after=None,
                       published_before=None, region_code=None, relevance_language=None,
                       video_duration=None, video_definition=None, video_embeddable=None,
@@ -70,98 +335,139 @@ class YouTubeSearchAPI:
         if not self.youtube:
             return {"error": "API未认证"}
 
-        max_retries = 3
-        retry_delay = 2
+        search_params, error = self._build_search_params(
+            query, max_results=max_results, published_after=published_after,
+            published_before=published_before, region_code=region_code,
+            relevance_language=relevance_language, video_duration=video_duration,
+            video_definition=video_definition, video_embeddable=video_embeddable,
+            video_license=video_license, video_syndicated=video_syndicated,
+            video_type=video_type, order_by=order_by
+        )
+        if error:
+            return {"error": error}
 
-        for attempt in range(max_retries):
-            try:
-                search_params = {
-                    'part': 'snippet',
-                    'q': query,
-                    'maxResults': max_results,
-                    'type': 'video',
-                    'order': order_by  # 新增：排序参数
-                }
-
-                if published_after:
-                    search_params['publishedAfter'] = normalize_rfc3339_date(published_after, end_of_day=False)
-                if published_before:
-                    search_params['publishedBefore'] = normalize_rfc3339_date(published_before, end_of_day=True)
-
-                pa = search_params.get('publishedAfter')
-                pb = search_params.get('publishedBefore')
-                if pa and pb:
-                    d_pa = parse_rfc3339_datetime(pa)
-                    d_pb = parse_rfc3339_datetime(pb)
-                    if d_pa and d_pb and d_pa > d_pb:
-                        return {"error": "published_after 不应晚于 published_before，请调整日期范围"}
-
-                if region_code:
-                    search_params['regionCode'] = region_code
-                if relevance_language:
-                    search_params['relevanceLanguage'] = relevance_language
-                if video_duration:
-                    search_params['videoDuration'] = video_duration
-                if video_definition:
-                    search_params['videoDefinition'] = video_definition
-                if video_embeddable:
-                    search_params['videoEmbeddable'] = video_embeddable
-                if video_license:
-                    search_params['videoLicense'] = video_license
-                if video_syndicated:
-                    search_params['videoSyndicated'] = video_syndicated
-                if video_type:
-                    search_params['videoType'] = video_type
-
-                # 记录实际发送给API的参数
-                print(f"YouTube API搜索参数:")
-                for key, value in search_params.items():
-                    print(f"  {key}: {value}")
-
-                request = self.youtube.search().list(**search_params)
-                response = request.execute()
-
-                return {
-                    "success": True,
-                    "data": response,
-                    "total_results": response.get('pageInfo', {}).get('totalResults', 0)
-                }
-
-            except googleapiclient.errors.HttpError as e:
-                error_msg = f"API请求失败: {e}"
-                if attempt < max_retries - 1:
-                    print(f"遇到错误 :{error_msg} 尝试 {attempt + 1}/{max_retries} 失败，{retry_delay}秒后重试...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
-                    continue
-                return {"error": error_msg}
+        return self._execute_search(search_params)
+
+    def iter_search_pages(self, query, max_total=None, quota_budget=None, **search_kwargs) -> Iterator[dict]:
+        """
+        分页深度搜索，按nextPageToken逐页产出结果
 
+        Args:
+            query: 搜索关键词
+            max_total: 最多获取的视频总数，默认取 AppConfig.YT_SEARCH_MAX_TOTAL
+            quota_budget: 本次搜索可消耗的配额上限（每页消耗 SEARCH_LIST_COST，不足一页时不发起搜索），
+                默认取 AppConfig.YT_SEARCH_QUOTA_BUDGET
+            **search_kwargs: 其余传给 search.list 的过滤参数（同 search_videos）
+
+        Yields:
+            dict: 每页结果 {"success", "data", "page", "quota_used"}；出错时产出 {"error"} 后结束
+        """
+        if not self.youtube:
+            yield {"error": "API未认证"}
+            return
+
+        max_total = max_total or AppConfig.YT_SEARCH_MAX_TOTAL
+        if quota_budget is None:
+            quota_budget = AppConfig.YT_SEARCH_QUOTA_BUDGET
+        max_pages = quota_budget // SEARCH_LIST_COST
+
+        page_token = None
+        fetched = 0
+        page = 0
+        while fetched < max_total and page < max_pages:
+            page_size = min(SEARCH_PAGE_SIZE, max_total - fetched)
+            search_params, error = self._build_search_params(
+                query, max_results=page_size, page_token=page_token, **search_kwargs
+            )
+            if error:
+                yield {"error": error}
+                return
+
+            result = self._execute_search(search_params)
+            if not result.get('success'):
+                yield result
+                return
+
+            page += 1
+            data = result['data']
+            items = data.get('items', [])
+            fetched += len(items)
+            result['page'] = page
+            result['quota_used'] = page * SEARCH_LIST_COST
+            yield result
+
+            page_token = data.get('nextPageToken')
+            if not page_token or not items:
+                break
+
+    def search_videos_deep(self, query, max_total=None, quota_budget=None, **search_kwargs) -> dict:
+        """分页深度搜索并合并为单个结果，返回格式与 search_videos 一致"""
+        merged = None
+        pages = 0
+        for result in self.iter_search_pages(query, max_total=max_total, quota_budget=quota_budget, **search_kwargs):
+            if not result.get('success'):
+                if merged is None:
+                    return result
+                # 已获取的页面仍然有效，保留部分结果
+                print(f"分页搜索在第 {pages + 1} 页失败: {result.get('error')}")
+                break
+            pages = result['page']
+            if merged is None:
+                merged = dict(result['data'])
+                merged['items'] = list(merged.get('items', []))
+            else:
+                merged['items'].extend(result['data'].get('items', []))
+                merged['nextPageToken'] = result['data'].get('nextPageToken')
+
+        if merged is None:
+            return {"error": "搜索失败，未获取到任何结果"}
+
+        merged['pagesFetched'] = pages
+        return {
+            "success": True,
+            "data": merged,
+            "total_results": merged.get('pageInfo', {}).get('totalResults', 0),
+            "pages": pages,
+            "quota_used": pages * SEARCH_LIST_COST
+        }
+
+    def get_video_details(self, video_ids: List[str]) -> Dict[str, dict]:
+        """
+        批量获取视频统计与时长信息（videos.list，每批50个ID）
+
+        Args:
+            video_ids: YouTube视频ID列表
+
+        Returns:
+            Dict[str, dict]: 视频ID -> videos.list返回的item（含snippet/statistics/contentDetails）
+        """
+        if not self.youtube or not video_ids:
+            return {}
+
+        unique_ids = list(dict.fromkeys(vid for vid in video_ids if vid))
+        details = {}
+        for i in range(0, len(unique_ids), VIDEOS_BATCH_SIZE):
+            batch = unique_ids[i:i + VIDEOS_BATCH_SIZE]
+            try:
+                request = self.youtube.videos().list(
+                    part='snippet,statistics,contentDetails',
+                    id=','.join(batch),
+                    maxResults=len(batch)
+                )
+                response = self._execute(request, 'videos.list')
+                for item in response.get('items', []):
+                    details[item['id']] = item
+            except (QuotaExceededError, CircuitOpenError) as e:
+                print(f"获取视频详情中止: {e}")
+                break
             except Exception as e:
-                error_msg = f"搜索失败: {e}"
-                error_str = str(e)
-                
-                # 详细的网络错误诊断
-                if "WinError 10061" in error_str:
-                    error_msg = "连接被拒绝 (WinError 10061)。可能原因：1) 代理配置问题 2) 防火墙阻止 3) 网络配置问题。请检查系统代理设置或联系网络管理员。"
-                elif "WinError 10060" in error_str or "timeout" in error_str.lower():
-                    if attempt < max_retries - 1:
-                        print(f"网络超时，尝试 {attempt + 1}/{max_retries}，{retry_delay}秒后重试...")
-                        time.sleep(retry_delay)
-                        retry_delay *= 2
-                        continue
-                    error_msg = "网络连接超时，请检查网络设置或稍后重试"
-                elif "WinError 10065" in error_str:
-                    error_msg = "目标主机无法访问 (WinError 10065)。请检查网络连接和DNS设置。"
-                elif "WinError 10054" in error_str:
-                    error_msg = "连接被远程主机关闭 (WinError 10054)。请稍后重试。"
-                elif "WinError 10013" in error_str:
-                    error_msg = "权限被拒绝 (WinError 10013)。请检查防火墙设置。"
-                
-                print(f"网络错误详情: {error_str}")
-                return {"error": error_msg}
+                print(f"获取视频详情失败（第 {i // VIDEOS_BATCH_SIZE + 1} 批，{len(batch)} 个ID）: {e}")
+                continue
 
-        return {"error": "搜索失败，已达到最大重试次数"}
+        print(f"获取视频详情完成: 请求 {len(unique_ids)} 个，返回 {len(details)} 个")
+        return details
 
 
 # 单例服务
+youtube_client_pool = YouTubeClientPool()
 youtube_service = YouTubeSearchAPI()
@@ -3,11 +3,12 @@
 import uuid
 import datetime
 from typing import List, Optional
-from sqlalchemy.orm import Session
 
 from ..database import db_manager
-from ..models import Task, ExecutionResult, VideoInfo, VideoExecutionResult
-from ..services.translate_service import get_translate_service
+from ..models import Task, ExecutionResult, VideoInfo
+from ..services.translation_queue_service import translation_queue
+from ..services.video_enrichment_service import video_enrichment_service
+from .video_store import save_search_results
 
 # 东八区时区
 EAST_8_TZ = datetime.timezone(datetime.timedelta(hours=8))
@@ -113,27 +114,27 @@ def mark_task_completed(task_id: str, results: dict):
             db.add(execution_result)
             db.flush()  # 确保execution_result.id被设置
             
-            # 保存视频信息（不包含翻译）
-            video_id_list = []  # 改为保存视频ID列表
-            if 'items' in results:
-                for i, video_data in enumerate(results['items']):
-                    video_info = _save_video_info_basic(video_data, db)
-                    if video_info:
-                        # 创建视频与执行结果的关联
-                        video_execution = VideoExecutionResult(
-                            video_id=video_info.id,
-                            execution_result_id=execution_result.id,
-                            scheduled_execution_result_id=None,  # 明确设置为None
-                            rank=i + 1
-                        )
-                        db.add(video_execution)
-                        video_id_list.append(video_info.id)  # 保存视频ID而不是对象
+            # 批量保存视频信息及关联（不包含翻译），与执行结果同一事务
+            video_id_list, _ = save_search_results(
+                db,
+                results.get('items', []),
+                execution_result_id=execution_result.id,
+                first_seen_task_id=task.id
+            )
+            
+            # 翻译任务同一事务写入，由翻译队列在后台处理
+            translation_queue.enqueue(db, video_id_list)
             
             # 提交数据库事务，确保所有数据都被保存
             db.commit()
+            translation_queue.notify()
             
-            # 在单独的会话中进行翻译操作，传递视频ID列表
-            _translate_videos_async(video_id_list)
+            # search接口不返回统计和时长，批量调用videos.list补全（在调度器线程池中执行，不阻塞请求）
+            youtube_video_ids = [item.get('id', {}).get('videoId') for item in results.get('items', [])]
+            youtube_video_ids = [vid for vid in youtube_video_ids if vid]
+            if youtube_video_ids:
+                from ..scheduler import task_scheduler
+                task_scheduler.submit_background(video_enrichment_service.enrich_videos, youtube_video_ids)
             
     except Exception as e:
         db.rollback()
@@ -250,112 +251,3 @@ def get_task_with_results(task_id: str) -> Optional[dict]:
         return task_dict
     finally:
         db.close()
-
-
-def _save_video_info_basic(video_data: dict, db: Session) -> Optional[VideoInfo]:
-    """保存视频基本信息到数据库（不包含翻译）"""
-    try:
-        video_id = video_data.get('id', {}).get('videoId')
-        if not video_id:
-            return None
-        
-        # 检查视频是否已存在
-        existing_video = db.query(VideoInfo).filter(VideoInfo.video_id == video_id).first()
-        if existing_video:
-            return existing_video
-        
-        # 创建新的视频信息
-        snippet = video_data.get('snippet', {})
-        statistics = video_data.get('statistics', {})
-        
-        video_info = VideoInfo(
-            video_id=video_id,
-            title=snippet.get('title'),
-            description=snippet.get('description'),
-            channel_title=snippet.get('channelTitle'),
-            channel_id=snippet.get('channelId'),
-            published_at=datetime.datetime.fromisoformat(snippet.get('publishedAt').replace('Z', '+00:00')).replace(tzinfo=EAST_8_TZ) if snippet.get('publishedAt') else None,
-            thumbnails=snippet.get('thumbnails'),
-            duration=snippet.get('duration'),
-            view_count=int(statistics.get('viewCount', 0)) if statistics.get('viewCount') else 0,
-            like_count=int(statistics.get('likeCount', 0)) if statistics.get('likeCount') else 0,
-            comment_count=int(statistics.get('commentCount', 0)) if statistics.get('commentCount') else 0,
-            tags=snippet.get('tags'),
-            category_id=snippet.get('categoryId'),
-            default_language=snippet.get('defaultLanguage'),
-            default_audio_language=snippet.get('defaultAudioLanguage')
-        )
-        
-        db.add(video_info)
-        db.flush()  # 获取ID但不提交
-        return video_info
-        
-    except Exception as e:
-        print(f"保存视频基本信息失败: {e}")
-        return None
-
-
-def _translate_videos_async(video_id_list: List[int]):
-    """异步翻译视频信息"""
-    if not video_id_list:
-        return
-    
-    # 在新线程中执行翻译，避免阻塞主流程
-    import threading
-    
-    def translate_worker():
-        try:
-            translate_service = get_translate_service()
-            if not translate_service:
-                return
-            
-            # 创建新的数据库会话进行翻译更新
-            db = db_manager.get_session()
-            try:
-                for video_db_id in video_id_list:
-                    current_video = None
-                    try:
-                        # 重新查询视频信息，确保在正确的会话中
-                        # 这里应该用数据库主键ID查询，不是video_id字段
-                        current_video = db.query(VideoInfo).filter(VideoInfo.id == video_db_id).first()
-                        if not current_video:
-                            print(f"视频ID {video_db_id} 在数据库中不存在，跳过翻译")
-                            continue
-                        
-                        # 翻译标题
-                        if current_video.title and not current_video.translated_title:
-                            translated_title = translate_service.translate_text(current_video.title, 'zh')
-                            if translated_title:
-                                current_video.translated_title = translated_title
-                                print(f"标题翻译: '{current_video.title}' -> '{translated_title}'")
-                        
-                        # 翻译描述
-                        if current_video.description and not current_video.translated_description:
-                            # 限制描述长度，避免翻译过长的文本
-                            description_text = current_video.description[:500] if len(current_video.description) > 500 else current_video.description
-                            translated_description = translate_service.translate_text(description_text, 'zh')
-                            if translated_description:
-                                current_video.translated_description = translated_description
-                                print(f"描述翻译: '{description_text[:50]}...' -> '{translated_description[:50]}...'")
-                        
-                    except Exception as video_error:
-                        print(f"翻译视频ID {video_db_id} 时出错: {video_error}")
-                        continue
-                
-                # 提交翻译结果
-                db.commit()
-                print(f"成功翻译 {len(video_id_list)} 个视频")
-                
-            except Exception as e:
-                print(f"翻译过程中出错: {e}")
-                db.rollback()
-            finally:
-                db.close()
-                
-        except Exception as e:
-            print(f"翻译服务初始化失败: {e}")
-    
-    # 启动翻译线程
-    translate_thread = threading.Thread(target=translate_worker)
-    translate_thread.daemon = True
-    translate_thread.start()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+搜索结果批量持久化
+普通任务与定时任务共用：一次IN查询解析已存在的视频，新视频通过SQLite upsert批量插入，
+视频与执行结果的关联行一条语句批量写入，全部在调用方的同一事务中完成（不在此处提交）
+"""
+
+import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from sqlalchemy import insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..models import VideoInfo, VideoExecutionResult
+
+# 东八区时区
+EAST_8_TZ = datetime.timezone(datetime.timedelta(hours=8))
+
+# 单条SQL的绑定参数上限较低（旧版SQLite为999），IN查询按此大小分批
+IN_QUERY_BATCH_SIZE = 500
+
+
+def _to_int(value) -> int:
+    """将API返回的字符串计数转换为整数"""
+    try:
+        return int(value) if value else 0
+    except (TypeError, ValueError):
+        return 0
+
+
+def build_video_row(video_data: dict, first_seen_task_id: int = None,
+                    first_seen_scheduled_task_id: int = None) -> Optional[Dict[str, Any]]:
+    """将搜索结果条目转换为VideoInfo的插入字段（所有行字段一致，便于executemany）"""
+    video_id = video_data.get('id', {}).get('videoId')
+    if not video_id:
+        return None
+
+    snippet = video_data.get('snippet', {})
+    statistics = video_data.get('statistics', {})
+    published_at = snippet.get('publishedAt')
+
+    return {
+        'video_id': video_id,
+        'title': snippet.get('title'),
+        'description': snippet.get('description'),
+        'channel_title': snippet.get('channelTitle'),
+        'channel_id': snippet.get('channelId'),
+        'published_at': datetime.datetime.fromisoformat(published_at.replace('Z', '+00:00')).replace(tzinfo=EAST_8_TZ) if published_at else None,
+        'thumbnails': snippet.get('thumbnails'),
+        'duration': snippet.get('duration'),
+        'view_count': _to_int(statistics.get('viewCount')),
+        'like_count': _to_int(statistics.get('likeCount')),
+        'comment_count': _to_int(statistics.get('commentCount')),
+        'tags': snippet.get('tags'),
+        'category_id': snippet.get('categoryId'),
+        'default_language': snippet.get('defaultLanguage'),
+        'default_audio_language': snippet.get('defaultAudioLanguage'),
+        'first_seen_task_id': first_seen_task_id,
+        'first_seen_scheduled_task_id': first_seen_scheduled_task_id,
+    }
+
+
+def get_video_pk_map(db: Session, video_ids: List[str]) -> Dict[str, int]:
+    """按YouTube视频ID批量查询数据库主键"""
+    pk_map = {}
+    for start in range(0, len(video_ids), IN_QUERY_BATCH_SIZE):
+        batch = video_ids[start:start + IN_QUERY_BATCH_SIZE]
+        rows = db.query(VideoInfo.video_id, VideoInfo.id).filter(VideoInfo.video_id.in_(batch)).all()
+        pk_map.update({video_id: pk for video_id, pk in rows})
+    return pk_map
+
+
+def save_search_results(db: Session, items: List[dict],
+                        execution_result_id: int = None,
+                        scheduled_execution_result_id: int = None,
+                        first_seen_task_id: int = None,
+                        first_seen_scheduled_task_id: int = None,
+                        rank_offset: int = 0) -> Tuple[List[int], List[str]]:
+    """
+    批量保存一页（或多页）搜索结果及其与执行结果的关联
+
+    Args:
+        db: 调用方的数据库会话，由调用方负责提交
+        items: 搜索结果条目列表（按排名顺序）
+        execution_result_id: 普通任务执行结果ID
+        scheduled_execution_result_id: 定时任务执行结果ID
+        first_seen_task_id: 新视频的首次发现任务ID
+        first_seen_scheduled_task_id: 新视频的首次发现定时任务ID
+        rank_offset: 排名起始偏移（逐页保存时为之前各页已保存的条目数）
+
+    Returns:
+        Tuple[List[int], List[str]]: (按排名顺序的视频主键列表, 本次新插入的YouTube视频ID列表)
+    """
+    rows = {}
+    ranks = []
+    for i, video_data in enumerate(items):
+        row = build_video_row(video_data, first_seen_task_id, first_seen_scheduled_task_id)
+        if not row:
+            continue
+        ranks.append((row['video_id'], rank_offset + i + 1))
+        rows.setdefault(row['video_id'], row)
+    if not rows:
+        return [], []
+
+    # 一次IN查询解析已存在的视频
+    pk_map = get_video_pk_map(db, list(rows.keys()))
+    missing_rows = [row for video_id, row in rows.items() if video_id not in pk_map]
+
+    # 新视频批量插入；并发任务先写入同一视频时忽略冲突，首次发现信息保留先写入者
+    if missing_rows:
+        db.execute(sqlite_insert(VideoInfo).on_conflict_do_nothing(index_elements=['video_id']), missing_rows)
+        pk_map.update(get_video_pk_map(db, [row['video_id'] for row in missing_rows]))
+
+    # 关联行一条语句批量写入（同一视频在结果中重复出现时只关联一次）
+    link_rows = []
+    linked = set()
+    for video_id, rank in ranks:
+        if video_id in linked or video_id not in pk_map:
+            continue
+        linked.add(video_id)
+        link_rows.append({
+            'video_id': pk_map[video_id],
+            'execution_result_id': execution_result_id,
+            'scheduled_execution_result_id': scheduled_execution_result_id,
+            'rank': rank,
+        })
+    if link_rows:
+        db.execute(insert(VideoExecutionResult), link_rows)
+
+    return [row['video_id'] for row in link_rows], [row['video_id'] for row in missing_rows]
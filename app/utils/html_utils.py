@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+HTML解析工具
+- make_soup: 按配置选择解析后端（默认内置 html.parser，可切换为 lxml；lxml 未安装时回退）
+- SelectorPlan: 把一组简单CSS选择器编译为匹配函数，一次遍历文档即可得到每个选择器的匹配结果，
+  结果顺序与逐个调用 soup.select() 相同
+"""
+
+import re
+from typing import Callable, Dict, List, Optional
+
+import soupsieve
+from bs4 import BeautifulSoup, Tag
+
+from ..config import AppConfig
+
+try:
+    import lxml  # noqa: F401
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+# 可直接编译的简单选择器：tag、tag[attr]、tag[attr="v"]、tag[attr*="v"]、[attr...]、.class
+_SIMPLE_SELECTOR_RE = re.compile(
+    r'^(?P<tag>[a-zA-Z][a-zA-Z0-9-]*)?'
+    r'(?:\[(?P<attr>[a-zA-Z_][a-zA-Z0-9_-]*)(?:(?P<op>\*?=)"(?P<value>[^"]*)")?\])?$'
+)
+_CLASS_SELECTOR_RE = re.compile(r'^\.(?P<cls>[a-zA-Z_-][a-zA-Z0-9_-]*)$')
+
+
+def get_parser_backend() -> str:
+    """获取实际使用的解析后端"""
+    backend = (AppConfig.CRAWL_HTML_PARSER or 'html.parser').lower()
+    if backend == 'auto':
+        return 'lxml' if LXML_AVAILABLE else 'html.parser'
+    if backend == 'lxml' and not LXML_AVAILABLE:
+        return 'html.parser'
+    return backend
+
+
+def make_soup(html: str, backend: str = None) -> BeautifulSoup:
+    """使用配置的解析后端解析HTML"""
+    return BeautifulSoup(html, backend or get_parser_backend())
+
+
+def _attr_text(value) -> str:
+    # 与 soupsieve 一致：多值属性（如class）以空格拼接后比较
+    if isinstance(value, (list, tuple)):
+        return ' '.join(value)
+    return value
+
+
+def compile_selector(selector: str) -> Callable[[Tag], bool]:
+    """
+    将单个CSS选择器编译为匹配函数
+
+    常见的简单选择器直接编译为属性比较（语义与 soupsieve 相同：type 属性值不区分大小写），
+    其余选择器交给 soupsieve 匹配
+    """
+    m = _CLASS_SELECTOR_RE.match(selector)
+    if m:
+        cls = m.group('cls')
+
+        def match_class(el: Tag) -> bool:
+            classes = el.get('class') or ()
+            if isinstance(classes, str):
+                classes = classes.split()
+            return cls in classes
+
+        return match_class
+
+    m = _SIMPLE_SELECTOR_RE.match(selector)
+    if not m or not (m.group('tag') or m.group('attr')):
+        return soupsieve.compile(selector).match
+
+    tag = m.group('tag').lower() if m.group('tag') else None
+    attr = m.group('attr').lower() if m.group('attr') else None
+    op = m.group('op')
+    value = m.group('value')
+    ignore_case = attr == 'type'
+    if ignore_case and value is not None:
+        value = value.lower()
+
+    def match(el: Tag) -> bool:
+        if tag and el.name != tag:
+            return False
+        if not attr:
+            return True
+        raw = el.get(attr)
+        if raw is None:
+            return False
+        if not op:
+            return True
+        text = _attr_text(raw)
+        if ignore_case:
+            text = text.lower()
+        if op == '=':
+            return text == value
+        # *= 空值不匹配任何元素
+        return bool(value) and value in text
+
+    return match
+
+
+def _selector_tag(selector: str) -> Optional[str]:
+    """简单选择器限定的标签名，其他选择器返回None"""
+    m = _SIMPLE_SELECTOR_RE.match(selector)
+    return m.group('tag').lower() if m and m.group('tag') else None
+
+
+class SelectorPlan:
+    """一组选择器的编译结果，一次遍历完成所有选择器的匹配"""
+
+    def __init__(self, selectors: List[str]):
+        self.selectors = list(dict.fromkeys(selectors))
+        self._matchers = [(selector, compile_selector(selector)) for selector in self.selectors]
+        # 限定标签名的选择器按标签分组，遍历时只尝试与元素标签相同的那一组
+        self._by_tag = {}
+        self._untagged = []
+        for selector, match in self._matchers:
+            tag = _selector_tag(selector)
+            if tag:
+                self._by_tag.setdefault(tag, []).append((selector, match))
+            else:
+                self._untagged.append((selector, match))
+
+    def select_all(self, root) -> Dict[str, List[Tag]]:
+        """
+        遍历root的所有后代元素，按选择器分组
+
+        Returns:
+            Dict[str, List[Tag]]: 选择器 -> 匹配元素列表（文档顺序，与 root.select(selector) 相同）
+        """
+        buckets = {selector: [] for selector in self.selectors}
+        by_tag = self._by_tag
+        untagged = self._untagged
+        for el in root.find_all(True):
+            for selector, match in by_tag.get(el.name, ()):
+                if match(el):
+                    buckets[selector].append(el)
+            for selector, match in untagged:
+                if match(el):
+                    buckets[selector].append(el)
+        return buckets
+
+    def select_first(self, root) -> Dict[str, Optional[Tag]]:
+        """
+        遍历root的后代元素，返回每个选择器的第一个匹配（与 root.select_one(selector) 相同），
+        全部选择器都找到后提前结束遍历
+        """
+        found = {}
+        pending = list(self._matchers)
+        for el in root.descendants:
+            if not isinstance(el, Tag):
+                continue
+            remaining = []
+            for selector, match in pending:
+                if match(el):
+                    found[selector] = el
+                else:
+                    remaining.append((selector, match))
+            pending = remaining
+            if not pending:
+                break
+        for selector, _ in pending:
+            found[selector] = None
+        return found
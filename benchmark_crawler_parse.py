@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+爬虫HTML解析基准脚本
+对保存的页面样本比较各解析后端的耗时，并核对解析结果是否一致：
+- 单次遍历的选择器计划与逐个 soup.select() 的匹配结果
+- 各解析后端（html.parser / lxml）的最终爬取结果
+
+用法:
+    python benchmark_crawler_parse.py --save https://www.mnb.mn/ https://example.com/   # 保存页面样本
+    python benchmark_crawler_parse.py                                                # 对样本目录做基准测试
+    python benchmark_crawler_parse.py page1.html page2.html --repeat 5
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from urllib.parse import urlparse
+
+try:
+    from load_env import load_env_file
+    load_env_file()
+except Exception:
+    pass
+
+from app.services.crawler_service import CrawlerService, AUTO_PLAN, MNB_PLAN, BASIC_PAGE_PLAN
+from app.utils.html_utils import LXML_AVAILABLE, make_soup
+
+# 默认的页面样本目录；样本文件名第一行注释中记录原始URL
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'crawler')
+URL_MARKER = '<!-- url: '
+
+
+def save_fixtures(urls, fixture_dir):
+    """下载页面并保存为样本"""
+    import requests
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+    for url in urls:
+        try:
+            response = requests.get(url, headers=headers, timeout=30)
+            response.raise_for_status()
+        except Exception as e:
+            print(f"✗ 下载失败: {url}, {e}")
+            continue
+        name = urlparse(url).netloc.replace(':', '_') + (urlparse(url).path.strip('/').replace('/', '_') or '') + '.html'
+        path = os.path.join(fixture_dir, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f"{URL_MARKER}{url} -->\n")
+            f.write(response.text)
+        print(f"✓ 已保存: {url} -> {path}")
+
+
+def load_fixture(path):
+    """读取样本，返回 (原始URL, HTML)"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        html = f.read()
+    base_url = 'http://localhost/'
+    if html.startswith(URL_MARKER):
+        first_line, _, html = html.partition('\n')
+        base_url = first_line[len(URL_MARKER):].rstrip(' ->')
+    return base_url, html
+
+
+def time_it(func, repeat):
+    """重复执行并返回 (最短耗时, 最后一次结果)"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def check_selector_plans(soup):
+    """核对选择器计划与逐个select的匹配结果，返回 (不一致的选择器列表, 逐个select耗时, 单次遍历耗时)"""
+    mismatches = []
+    select_time = 0.0
+    plan_time = 0.0
+    for plan in (AUTO_PLAN, MNB_PLAN, BASIC_PAGE_PLAN):
+        start = time.perf_counter()
+        expected = {selector: soup.select(selector) for selector in plan.selectors}
+        select_time += time.perf_counter() - start
+        start = time.perf_counter()
+        actual = plan.select_all(soup)
+        plan_time += time.perf_counter() - start
+        for selector in plan.selectors:
+            if [id(el) for el in expected[selector]] != [id(el) for el in actual[selector]]:
+                mismatches.append(selector)
+    return mismatches, select_time, plan_time
+
+
+def benchmark(paths, repeat):
+    logging.disable(logging.CRITICAL)
+    crawler_service = CrawlerService()
+    backends = ['html.parser'] + (['lxml'] if LXML_AVAILABLE else [])
+    all_consistent = True
+
+    for path in paths:
+        base_url, html = load_fixture(path)
+        print(f"\n=== {os.path.basename(path)} ({len(html) // 1024} KB, {base_url}) ===")
+
+        results = {}
+        for backend in backends:
+            parse_time, soup = time_it(lambda: make_soup(html, backend), repeat)
+            mismatches, select_time, plan_time = check_selector_plans(soup)
+            if mismatches:
+                all_consistent = False
+                print(f"  ✗ [{backend}] 选择器计划与 soup.select 不一致: {mismatches}")
+            extract_time, videos = time_it(
+                lambda: asyncio.run(crawler_service._auto_parse_videos(soup, base_url)), repeat)
+            results[backend] = videos
+            print(f"  [{backend:11}] 解析 {parse_time * 1000:8.1f} ms | 提取 {extract_time * 1000:8.1f} ms | "
+                  f"选择器 逐个select {select_time * 1000:7.1f} ms / 单次遍历 {plan_time * 1000:7.1f} ms | "
+                  f"结果 {len(videos)} 条")
+
+        if len(results) > 1:
+            if all(videos == results['html.parser'] for videos in results.values()):
+                print("  ✓ 各解析后端结果一致")
+            else:
+                print("  ✗ 各解析后端结果不一致（该页面HTML不规范，lxml的容错方式不同）")
+
+    return all_consistent
+
+
+def main():
+    parser = argparse.ArgumentParser(description='爬虫HTML解析基准测试')
+    parser.add_argument('paths', nargs='*', help='样本文件或目录（默认 fixtures/crawler）')
+    parser.add_argument('--save', nargs='+', metavar='URL', help='下载页面保存为样本')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数，取最短耗时')
+    args = parser.parse_args()
+
+    if args.save:
+        save_fixtures(args.save, FIXTURE_DIR)
+        return
+
+    paths = []
+    for path in args.paths or [FIXTURE_DIR]:
+        if os.path.isdir(path):
+            paths.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.html')))
+        elif os.path.isfile(path):
+            paths.append(path)
+    if not paths:
+        print("没有找到页面样本，请先使用 --save URL 保存样本或指定HTML文件")
+        sys.exit(1)
+
+    if not benchmark(paths, args.repeat):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本：为scheduled_tasks表添加deferred_run字段
+"""
+
+import sqlite3
+from pathlib import Path
+
+def migrate_database():
+    """执行数据库迁移"""
+    # 获取数据库文件路径
+    db_path = Path(__file__).parent / "video_search.db"
+    
+    if not db_path.exists():
+        print(f"数据库文件不存在: {db_path}")
+        print("请先启动应用，让数据库自动创建")
+        return False
+    
+    conn = None
+    try:
+        # 连接数据库
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # 检查deferred_run字段是否已存在
+        cursor.execute("PRAGMA table_info(scheduled_tasks)")
+        columns = [column[1] for column in cursor.fetchall()]
+        
+        if 'deferred_run' in columns:
+            print("deferred_run字段已存在，无需迁移")
+            return True
+        
+        # 添加deferred_run字段（为空表示没有待补执行的延后任务）
+        print("正在添加deferred_run字段...")
+        cursor.execute("ALTER TABLE scheduled_tasks ADD COLUMN deferred_run DATETIME")
+        
+        # 提交更改
+        conn.commit()
+        print("✅ 数据库迁移完成！")
+        print("  - 为scheduled_tasks表添加了deferred_run字段")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ 数据库迁移失败: {e}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("开始数据库迁移...")
+    success = migrate_database()
+    if success:
+        print("迁移脚本执行完成！")
+    else:
+        print("迁移脚本执行失败！")
+        exit(1)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库迁移脚本：视频全局去重与首次发现记录
+- video_info 表：合并重复的 video_id，将 video_id 索引改为唯一索引，
+  添加 first_seen_task_id / first_seen_scheduled_task_id 字段并按历史执行记录回填
+- scheduled_tasks 表：添加 dedup_scope 字段
+"""
+
+import sqlite3
+import os
+from pathlib import Path
+
+def migrate_database():
+    """执行数据库迁移"""
+    # 获取数据库文件路径
+    db_path = Path(__file__).parent / "video_search.db"
+    
+    if not db_path.exists():
+        print(f"数据库文件不存在: {db_path}")
+        print("请先启动应用，让数据库自动创建")
+        return False
+    
+    conn = None
+    try:
+        # 连接数据库
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        
+        # 1. 添加字段
+        cursor.execute("PRAGMA table_info(scheduled_tasks)")
+        columns = [column[1] for column in cursor.fetchall()]
+        if 'dedup_scope' not in columns:
+            print("正在为scheduled_tasks添加dedup_scope字段...")
+            cursor.execute("ALTER TABLE scheduled_tasks ADD COLUMN dedup_scope TEXT DEFAULT 'task'")
+            cursor.execute("UPDATE scheduled_tasks SET dedup_scope = 'task' WHERE dedup_scope IS NULL")
+        
+        cursor.execute("PRAGMA table_info(video_info)")
+        columns = [column[1] for column in cursor.fetchall()]
+        for column in ('first_seen_task_id', 'first_seen_scheduled_task_id'):
+            if column not in columns:
+                print(f"正在为video_info添加{column}字段...")
+                cursor.execute(f"ALTER TABLE video_info ADD COLUMN {column} INTEGER")
+        
+        # 2. 合并重复的video_id，保留最早的记录
+        cursor.execute("SELECT video_id, MIN(id) FROM video_info GROUP BY video_id HAVING COUNT(*) > 1")
+        duplicates = cursor.fetchall()
+        for video_id, keep_id in duplicates:
+            cursor.execute(
+                "UPDATE video_execution_results SET video_id = ? "
+                "WHERE video_id IN (SELECT id FROM video_info WHERE video_id = ? AND id != ?)",
+                (keep_id, video_id, keep_id)
+            )
+            cursor.execute("DELETE FROM video_info WHERE video_id = ? AND id != ?", (video_id, keep_id))
+        print(f"合并了 {len(duplicates)} 个重复视频")
+        
+        # 3. 将video_id普通索引替换为唯一索引
+        cursor.execute("DROP INDEX IF EXISTS ix_video_info_video_id")
+        cursor.execute("CREATE UNIQUE INDEX ix_video_info_video_id ON video_info (video_id)")
+        
+        # 4. 根据最早的执行记录回填首次发现任务
+        cursor.execute("""
+            SELECT video_id, task_id, scheduled_task_id FROM (
+                SELECT ver.video_id AS video_id, er.task_id AS task_id, NULL AS scheduled_task_id, er.started_at AS seen_at
+                FROM video_execution_results ver JOIN execution_results er ON ver.execution_result_id = er.id
+                UNION ALL
+                SELECT ver.video_id, st.task_id, ser.scheduled_task_id, ser.started_at
+                FROM video_execution_results ver
+                JOIN scheduled_execution_results ser ON ver.scheduled_execution_result_id = ser.id
+                JOIN scheduled_tasks st ON ser.scheduled_task_id = st.id
+            ) ORDER BY seen_at DESC
+        """)
+        first_seen = {}
+        for video_db_id, task_id, scheduled_task_id in cursor.fetchall():
+            # 按时间倒序遍历，最后写入的即最早的记录
+            first_seen[video_db_id] = (task_id, scheduled_task_id)
+        cursor.executemany(
+            "UPDATE video_info SET first_seen_task_id = ?, first_seen_scheduled_task_id = ? "
+            "WHERE id = ? AND first_seen_task_id IS NULL",
+            [(task_id, scheduled_task_id, video_db_id) for video_db_id, (task_id, scheduled_task_id) in first_seen.items()]
+        )
+        
+        # 提交更改
+        conn.commit()
+        print("✅ 数据库迁移完成！")
+        print("  - video_info.video_id 改为唯一索引")
+        print(f"  - 回填了 {len(first_seen)} 个视频的首次发现任务")
+        print("  - 为scheduled_tasks表添加了dedup_scope字段，默认'task'")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ 数据库迁移失败: {e}")
+        if conn:
+            conn.rollback()
+        return False
+        
+    finally:
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    print("开始数据库迁移...")
+    success = migrate_database()
+    if success:
+        print("迁移脚本执行完成！")
+    else:
+        print("迁移脚本执行失败！")
+        exit(1)
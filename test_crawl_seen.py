@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+网站已见视频索引测试
+验证 normalize_url 的规范化规则（跟踪参数、默认端口、末尾斜杠等），
+以及使用临时数据库时 filter_new_or_changed 对新视频、内容变化和未变化视频的分类
+"""
+
+import os
+import tempfile
+
+from app.database import db_manager
+from app.models import CrawlWebsite, CrawlSeenUrl
+from app.services.crawl_seen_service import CrawlSeenService, normalize_url, make_item_hash
+
+
+def create_website(name: str) -> int:
+    db_manager.init_database(os.path.join(tempfile.mkdtemp(), 'test_crawl_seen.db'))
+    db = db_manager.get_session()
+    try:
+        website = CrawlWebsite(name=name, url='https://videos.example.com/')
+        db.add(website)
+        db.commit()
+        return website.id
+    finally:
+        db.close()
+
+
+def record(service: CrawlSeenService, website_id: int, task_id: int, videos: list):
+    """模拟视频保存成功后写入索引"""
+    db = db_manager.get_session()
+    try:
+        service.record(db, website_id, task_id, videos)
+        db.commit()
+    finally:
+        db.close()
+
+
+def make_video(number: int, title: str, description: str = '', url_suffix: str = '') -> dict:
+    return {'video_url': f"https://videos.example.com/v/{number}{url_suffix}", 'video_title': title,
+            'video_description': description, 'thumbnail_url': f"https://img.example.com/v/{number}.jpg"}
+
+
+def test_normalize_url():
+    """规范化后同一视频的不同写法得到相同的键"""
+    cases = [
+        # 跟踪参数（utm_*、fbclid 等）被去掉，其余参数排序
+        ('https://example.com/watch?v=1&utm_source=x&utm_Medium=y&fbclid=abc&gclid=1&spm=a.b',
+         'https://example.com/watch?v=1'),
+        ('https://example.com/watch?b=2&a=1&MSCLKID=z', 'https://example.com/watch?a=1&b=2'),
+        # 默认端口去掉，非默认端口保留
+        ('https://example.com:443/v/1', 'https://example.com/v/1'),
+        ('http://example.com:80/v/1', 'http://example.com/v/1'),
+        ('http://example.com:443/v/1', 'http://example.com:443/v/1'),
+        ('https://example.com:8443/v/1', 'https://example.com:8443/v/1'),
+        # 路径末尾的斜杠去掉，根路径保留
+        ('https://example.com/v/1/', 'https://example.com/v/1'),
+        ('https://example.com/v/1///', 'https://example.com/v/1'),
+        ('https://example.com', 'https://example.com/'),
+        ('https://example.com/', 'https://example.com/'),
+        # 协议和主机小写，路径大小写保留，片段去掉
+        ('HTTPS://Example.COM/Video/AbC#comments', 'https://example.com/Video/AbC'),
+        # 空值参数保留，首尾空白去掉
+        ('  https://example.com/v?id=&x=1  ', 'https://example.com/v?id=&x=1'),
+        ('', ''),
+    ]
+    for url, expected in cases:
+        assert normalize_url(url) == expected, f"{url!r}: 期望 {expected!r}，实际 {normalize_url(url)!r}"
+    print("✅ 链接规范化正确")
+
+
+def test_filter_new_changed_unchanged():
+    """首次爬取全部为新视频；再次爬取时只返回新视频和内容变化的视频"""
+    service = CrawlSeenService()
+    website_id = create_website('已见索引测试')
+
+    first = [make_video(1, '视频一'), make_video(2, '视频二'), make_video(3, '视频三')]
+    result = service.filter_new_or_changed(website_id, first)
+    assert [video['video_title'] for video in result] == ['视频一', '视频二', '视频三']
+    assert all(video['is_new'] for video in result)
+    record(service, website_id, 1, result)
+
+    second = [
+        make_video(1, '视频一', url_suffix='/?utm_source=feed'),  # 未变化（链接写法不同）
+        make_video(2, '视频二（更新）'),                          # 标题变化
+        make_video(3, '视频三', description='新增简介'),          # 简介变化
+        make_video(4, '视频四'),                                  # 新视频
+        make_video(4, '视频四（重复）', url_suffix='#top'),       # 本次爬取内重复，保留第一次出现的
+    ]
+    result = service.filter_new_or_changed(website_id, second)
+    classified = {video['normalized_url']: video['is_new'] for video in result}
+    assert classified == {
+        'https://videos.example.com/v/2': False,
+        'https://videos.example.com/v/3': False,
+        'https://videos.example.com/v/4': True,
+    }, classified
+    assert next(video for video in result if video['is_new'])['video_title'] == '视频四'
+    assert service.get_stats() == {'checked': 7, 'new': 4, 'changed': 2, 'unchanged': 1}
+
+    # 保存后索引中的内容哈希更新，第三次爬取相同内容时全部未变化
+    record(service, website_id, 2, result)
+    db = db_manager.get_session()
+    try:
+        row = db.query(CrawlSeenUrl).filter_by(website_id=website_id,
+                                               normalized_url='https://videos.example.com/v/2').one()
+        assert row.content_hash == make_item_hash(second[1])
+        assert row.first_seen_task_id == 1 and row.last_changed_task_id == 2
+    finally:
+        db.close()
+    assert service.filter_new_or_changed(website_id, second) == []
+    assert service.get_stats()['unchanged'] == 5
+
+    # 未保存的视频下次爬取仍视为新视频；不指定网站时不过滤
+    unsaved = service.filter_new_or_changed(website_id, [make_video(5, '视频五')])
+    assert len(unsaved) == 1 and unsaved[0]['is_new']
+    assert len(service.filter_new_or_changed(website_id, [make_video(5, '视频五')])) == 1
+    assert len(service.filter_new_or_changed(None, first)) == 3
+    print("✅ 新视频、内容变化与未变化视频分类正确")
+
+
+if __name__ == "__main__":
+    print("🔎 正在测试网站已见视频索引...")
+    print("=" * 50)
+    test_normalize_url()
+    test_filter_new_changed_unchanged()
+    print("\n🎉 网站已见视频索引测试全部通过")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+爬虫HTML解析一致性测试
+使用 fixtures/crawler 中保存的页面样本：
+- 单次遍历的选择器计划与逐个 soup.select() 的匹配结果（元素及顺序）完全相同
+- 自动解析结果与单次遍历改造前实现的结果快照（expected_auto_parse.json）一致
+"""
+
+import asyncio
+import json
+import logging
+import os
+
+from benchmark_crawler_parse import FIXTURE_DIR, load_fixture
+from app.services.crawler_service import (
+    CrawlerService, AUTO_PLAN, MNB_PLAN, BASIC_PAGE_PLAN, FIELD_PLAN, PAGINATION_PLAN
+)
+from app.utils.html_utils import LXML_AVAILABLE, make_soup
+
+# 改造前实现（逐个 soup.select）在 html.parser 下的自动解析结果
+SNAPSHOT_PATH = os.path.join(FIXTURE_DIR, 'expected_auto_parse.json')
+
+PAGE_PLANS = {'AUTO_PLAN': AUTO_PLAN, 'MNB_PLAN': MNB_PLAN, 'BASIC_PAGE_PLAN': BASIC_PAGE_PLAN,
+              'FIELD_PLAN': FIELD_PLAN, 'PAGINATION_PLAN': PAGINATION_PLAN}
+
+
+def fixture_names():
+    names = sorted(name for name in os.listdir(FIXTURE_DIR) if name.endswith('.html'))
+    assert names, f"没有找到页面样本: {FIXTURE_DIR}"
+    return names
+
+
+def assert_same_matches(plan, root, label):
+    actual = plan.select_all(root)
+    for selector in plan.selectors:
+        expected = root.select(selector)
+        assert [id(el) for el in actual[selector]] == [id(el) for el in expected], \
+            f"{label}: 选择器 {selector} 的匹配结果与 select() 不一致"
+
+
+def test_selector_plans_match_select():
+    """整页及单个元素范围内，选择器计划的匹配结果与 soup.select 相同"""
+    backends = ['html.parser'] + (['lxml'] if LXML_AVAILABLE else [])
+    for name in fixture_names():
+        _, html = load_fixture(os.path.join(FIXTURE_DIR, name))
+        for backend in backends:
+            soup = make_soup(html, backend)
+            for plan_name, plan in PAGE_PLANS.items():
+                assert_same_matches(plan, soup, f"{name} [{backend}] {plan_name}")
+            # 字段提取在每个候选元素内单独遍历
+            matches = AUTO_PLAN.select_all(soup)
+            for selector in AUTO_PLAN.selectors:
+                for element in matches[selector]:
+                    assert_same_matches(FIELD_PLAN, element, f"{name} [{backend}] {selector} 内 FIELD_PLAN")
+        print(f"✅ {name} 选择器计划与 select() 一致")
+
+
+def test_auto_parse_matches_snapshot():
+    """自动解析结果与改造前实现的快照一致"""
+    logging.disable(logging.CRITICAL)
+    try:
+        with open(SNAPSHOT_PATH, encoding='utf-8') as f:
+            snapshot = json.load(f)
+        crawler_service = CrawlerService()
+        names = fixture_names()
+        assert sorted(snapshot) == names, "快照与页面样本不对应"
+        for name in names:
+            base_url, html = load_fixture(os.path.join(FIXTURE_DIR, name))
+            videos = asyncio.run(crawler_service._auto_parse_videos(make_soup(html, 'html.parser'), base_url))
+            assert videos == snapshot[name], f"{name} 的自动解析结果与快照不一致"
+            print(f"✅ {name} 自动解析结果与快照一致（{len(videos)} 条）")
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+if __name__ == "__main__":
+    print("🕷️ 正在测试爬虫HTML解析一致性...")
+    print("=" * 50)
+    test_selector_plans_match_select()
+    test_auto_parse_matches_snapshot()
+    print("\n🎉 爬虫HTML解析一致性测试全部通过")
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+下载任务队列测试
+使用临时数据库和桩下载器（不访问网络），验证任务ID唯一、单主机并发上限、
+排队中与下载中任务的取消，以及启动时中断任务的重新排队
+"""
+
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from app.config import AppConfig
+from app.database import db_manager
+from app.models import DownloadJob, get_east8_time
+from app.services import download_queue_service
+from app.services.download_queue_service import (
+    DownloadQueue, JOB_DOWNLOADING, JOB_COMPLETED, JOB_CANCELLED, JOB_CANCELLING
+)
+
+_db_ready = False
+
+
+def setup_database():
+    """初始化临时数据库，并关闭与本测试无关的下载去重"""
+    global _db_ready
+    if not _db_ready:
+        db_manager.init_database(os.path.join(tempfile.mkdtemp(), 'test_download_queue.db'))
+        AppConfig.DOWNLOAD_DEDUP_ENABLED = False
+        _db_ready = True
+
+
+class StubDownloader:
+    """桩下载器：按 progress_hooks 回报进度，不产生文件"""
+
+    def __init__(self, steps: int = 5, step_delay: float = 0.05, release_event: threading.Event = None):
+        self.download_path = tempfile.gettempdir()
+        self.steps = steps
+        self.step_delay = step_delay
+        # 设置后才结束下载，用于模拟长时间运行的任务
+        self.release_event = release_event
+        self.started = threading.Event()
+        self._lock = threading.Lock()
+        self.active = Counter()
+        self.max_active = Counter()
+        self.max_total = 0
+
+    def get_video_id(self, url: str):
+        return None
+
+    def download_video(self, url: str, options: dict) -> dict:
+        host = download_queue_service.get_host(url)
+        with self._lock:
+            self.active[host] += 1
+            self.max_active[host] = max(self.max_active[host], self.active[host])
+            self.max_total = max(self.max_total, sum(self.active.values()))
+        self.started.set()
+        try:
+            total = self.steps * 1024
+            step = 0
+            while True:
+                step = min(step + 1, self.steps)
+                for hook in options['progress_hooks']:
+                    hook({'status': 'downloading', 'downloaded_bytes': step * 1024, 'total_bytes': total})
+                time.sleep(self.step_delay)
+                if step >= self.steps and (self.release_event is None or self.release_event.is_set()):
+                    break
+            for hook in options['progress_hooks']:
+                hook({'status': 'finished', 'downloaded_bytes': total, 'total_bytes': total})
+            return {'success': True, 'files': []}
+        finally:
+            with self._lock:
+                self.active[host] -= 1
+
+
+def make_queue(downloader: StubDownloader, workers: int = 2, per_host_limit: int = 1) -> DownloadQueue:
+    setup_database()
+    download_queue_service.get_youtube_downloader = lambda: downloader
+    queue = DownloadQueue(workers=workers, per_host_limit=per_host_limit)
+    queue.poll_interval = 1
+    return queue
+
+
+def wait_for(predicate, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return predicate()
+
+
+def job_status(queue: DownloadQueue, job_id: str) -> str:
+    job = queue.get_job(job_id)
+    return job['status'] if job else None
+
+
+def test_job_ids_unique():
+    """同一批次和不同批次提交的任务ID互不相同"""
+    queue = make_queue(StubDownloader(steps=1, step_delay=0))
+    try:
+        urls = [f"https://example.com/video/{i}" for i in range(20)]
+        job_ids = queue.submit(urls) + queue.submit(urls)
+        assert len(job_ids) == 40
+        assert len(set(job_ids)) == len(job_ids), "任务ID重复"
+        assert wait_for(lambda: all(job_status(queue, job_id) == JOB_COMPLETED for job_id in job_ids))
+        print("✅ 任务ID唯一")
+    finally:
+        queue.stop()
+
+
+def test_per_host_limit():
+    """任务数多于工作线程时，同一主机同时下载的任务数不超过上限，其他主机不受影响"""
+    downloader = StubDownloader(steps=4, step_delay=0.05)
+    queue = make_queue(downloader, workers=4, per_host_limit=1)
+    try:
+        urls = ([f"https://www.youtube.com/watch?v={i}" for i in range(4)] +
+                [f"https://youtu.be/{i}" for i in range(2)] +
+                [f"https://vimeo.com/{i}" for i in range(3)])
+        job_ids = queue.submit(urls)
+        assert wait_for(lambda: all(job_status(queue, job_id) == JOB_COMPLETED for job_id in job_ids), timeout=30)
+        assert downloader.max_active['youtube.com'] == 1, f"youtube.com 并发 {downloader.max_active['youtube.com']}"
+        assert downloader.max_active['vimeo.com'] == 1, f"vimeo.com 并发 {downloader.max_active['vimeo.com']}"
+        assert downloader.max_total == 2, f"不同主机应同时下载，最大并发 {downloader.max_total}"
+        print("✅ 单主机并发上限生效")
+    finally:
+        queue.stop()
+
+
+def test_cancel_queued_and_running():
+    """排队中的任务直接取消；下载中的任务由进度回调中止"""
+    release = threading.Event()
+    downloader = StubDownloader(steps=2, step_delay=0.05, release_event=release)
+    queue = make_queue(downloader, workers=1, per_host_limit=1)
+    try:
+        running_id, queued_id = queue.submit(["https://example.org/a", "https://example.org/b"])
+        assert downloader.started.wait(timeout=10)
+        assert job_status(queue, running_id) == JOB_DOWNLOADING
+
+        assert queue.cancel(queued_id) == JOB_CANCELLED
+        assert job_status(queue, queued_id) == JOB_CANCELLED
+
+        # 桩下载器在 release 设置前不会结束，任务只能由进度回调抛出 DownloadCancelled 中止
+        assert queue.cancel(running_id) == JOB_CANCELLING
+        assert wait_for(lambda: job_status(queue, running_id) == JOB_CANCELLED)
+        assert sum(downloader.active.values()) == 0
+        assert queue.cancel(running_id) == JOB_CANCELLED
+        print("✅ 排队中与下载中的任务均可取消")
+    finally:
+        release.set()
+        queue.stop()
+
+
+def test_requeue_interrupted_on_start():
+    """上次停机时处于下载中的任务在启动时重新排队并完成"""
+    setup_database()
+    now = get_east8_time()
+    db = db_manager.get_session()
+    try:
+        db.add(DownloadJob(job_id='download_interrupted', url='https://example.net/v', host='example.net',
+                           format_id='best', status=JOB_DOWNLOADING, progress=40, attempts=1,
+                           created_at=now, updated_at=now, started_at=now))
+        db.commit()
+    finally:
+        db.close()
+
+    release = threading.Event()
+    downloader = StubDownloader(steps=1, step_delay=0.05, release_event=release)
+    queue = make_queue(downloader)
+    try:
+        queue.start()
+        # 重新排队后被工作线程再次领取：尝试次数加一，进度从头开始
+        assert downloader.started.wait(timeout=10), "中断的任务未被重新领取"
+        job = queue.get_job('download_interrupted')
+        assert job['status'] == JOB_DOWNLOADING and job['attempts'] == 2
+        release.set()
+        assert wait_for(lambda: job_status(queue, 'download_interrupted') == JOB_COMPLETED)
+        print("✅ 中断的任务启动时重新排队")
+    finally:
+        release.set()
+        queue.stop()
+
+
+if __name__ == "__main__":
+    print("📥 正在测试下载任务队列...")
+    print("=" * 50)
+    test_job_ids_unique()
+    test_per_host_limit()
+    test_cancel_queued_and_running()
+    test_requeue_interrupted_on_start()
+    print("\n🎉 下载任务队列测试全部通过")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YouTube配额管理测试
+使用临时数据库和固定的配额日，验证按优先级的准入决策（正常执行、降级、延后、跳过）、
+太平洋时间零点的配额日切换（含夏令时），以及并发预留配额不会超支
+"""
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from app.config import AppConfig
+from app.database import db_manager
+from app.services import quota_service
+from app.services.quota_service import (
+    QuotaManager, QuotaExceededError, get_quota_date, get_next_reset_time,
+    ADMIT_RUN, ADMIT_DOWNGRADE, ADMIT_DEFER, ADMIT_SKIP
+)
+
+_db_ready = False
+
+
+def setup_database():
+    """初始化临时数据库，并固定各优先级的保留比例"""
+    global _db_ready
+    if not _db_ready:
+        db_manager.init_database(os.path.join(tempfile.mkdtemp(), 'test_quota_service.db'))
+        AppConfig.YT_QUOTA_RESERVE_NORMAL = 0.1
+        AppConfig.YT_QUOTA_RESERVE_LOW = 0.3
+        _db_ready = True
+
+
+@contextmanager
+def quota_day(quota_date: str):
+    """将配额管理器看到的当前配额日固定为 quota_date"""
+    original = quota_service.get_quota_date
+    quota_service.get_quota_date = lambda now=None: quota_date
+    try:
+        yield
+    finally:
+        quota_service.get_quota_date = original
+
+
+def make_manager(used: int, quota_date: str, daily_limit: int = 10000) -> QuotaManager:
+    """创建已用 used 单位配额的管理器（调用方需在 quota_day(quota_date) 内使用）"""
+    setup_database()
+    manager = QuotaManager(daily_limit=daily_limit)
+    if used:
+        manager.charge('videos.list', calls=used)
+    assert manager.get_used() == used
+    return manager
+
+
+def test_admit_by_priority():
+    """剩余配额扣除优先级保留量后按每页101单位计算可执行页数"""
+    cases = [
+        # (已用, 优先级, 请求页数, 期望决策, 期望页数)
+        (0, 'high', 5, ADMIT_RUN, 5),
+        (0, 'normal', 5, ADMIT_RUN, 5),
+        (0, 'low', 5, ADMIT_RUN, 5),
+        # 剩余500：高优先级不保留，可执行4页
+        (9500, 'high', 5, ADMIT_DOWNGRADE, 4),
+        # 剩余1500：普通保留1000，可执行4页；低优先级保留3000，无法执行
+        (8500, 'normal', 5, ADMIT_DOWNGRADE, 4),
+        (8500, 'low', 5, ADMIT_SKIP, 0),
+        # 剩余1100：普通保留1000后不足一页，延后到配额重置
+        (8900, 'normal', 5, ADMIT_DEFER, 0),
+        (8900, 'high', 5, ADMIT_RUN, 5),
+        # 剩余3505：低优先级保留3000后可执行5页
+        (6495, 'low', 5, ADMIT_RUN, 5),
+        (6495, 'low', 6, ADMIT_DOWNGRADE, 5),
+        # 剩余不足一页时，高优先级同样延后
+        (9950, 'high', 1, ADMIT_DEFER, 0),
+        (10000, 'low', 1, ADMIT_SKIP, 0),
+    ]
+    for index, (used, priority, pages, decision, allowed) in enumerate(cases):
+        with quota_day(f"2000-01-{index + 1:02d}"):
+            manager = make_manager(used, f"2000-01-{index + 1:02d}")
+            result = manager.admit(priority, pages)
+            assert result == (decision, allowed), \
+                f"已用 {used}、{priority} 请求 {pages} 页: 期望 {(decision, allowed)}，实际 {result}"
+
+    # 未设置优先级按普通处理
+    with quota_day('2000-02-01'):
+        manager = make_manager(8900, '2000-02-01')
+        assert manager.admit(None, 3) == (ADMIT_DEFER, 0)
+    print("✅ 按优先级的准入决策正确")
+
+
+def test_quota_date_rollover_at_pacific_midnight():
+    """配额日在太平洋时间零点切换，夏令时与标准时间均正确"""
+    # 标准时间（UTC-8）：UTC 07:59 仍是前一天，08:00 进入新的配额日
+    assert get_quota_date(datetime(2026, 1, 15, 7, 59, tzinfo=timezone.utc)) == '2026-01-14'
+    assert get_quota_date(datetime(2026, 1, 15, 8, 0, tzinfo=timezone.utc)) == '2026-01-15'
+    assert get_next_reset_time(datetime(2026, 1, 15, 7, 59, tzinfo=timezone.utc)) == \
+        datetime(2026, 1, 15, 8, 0, tzinfo=timezone.utc)
+
+    # 夏令时（UTC-7）：UTC 06:59 仍是前一天，07:00 进入新的配额日
+    assert get_quota_date(datetime(2026, 7, 1, 6, 59, tzinfo=timezone.utc)) == '2026-06-30'
+    assert get_quota_date(datetime(2026, 7, 1, 7, 0, tzinfo=timezone.utc)) == '2026-07-01'
+    assert get_next_reset_time(datetime(2026, 7, 1, 7, 0, tzinfo=timezone.utc)) == \
+        datetime(2026, 7, 2, 7, 0, tzinfo=timezone.utc)
+
+    # 夏令时开始当天：当天零点仍按标准时间，下一次重置按夏令时
+    assert get_next_reset_time(datetime(2026, 3, 8, 20, 0, tzinfo=timezone.utc)) == \
+        datetime(2026, 3, 9, 7, 0, tzinfo=timezone.utc)
+
+    # 东八区时间同样按太平洋时间换算
+    from app.models import EAST_8_TZ
+    assert get_quota_date(datetime(2026, 1, 15, 15, 59, tzinfo=EAST_8_TZ)) == '2026-01-14'
+    assert get_quota_date(datetime(2026, 1, 15, 16, 0, tzinfo=EAST_8_TZ)) == '2026-01-15'
+    print("✅ 配额日在太平洋时间零点切换")
+
+
+def test_usage_resets_on_new_quota_day():
+    """切换到新的配额日后已用配额清零，前一天的用量仍保存在数据库中"""
+    setup_database()
+    manager = QuotaManager(daily_limit=10000)
+    with quota_day('2000-03-01'):
+        manager.charge('search.list', calls=3)
+        assert manager.remaining() == 9700
+    with quota_day('2000-03-02'):
+        assert manager.get_used() == 0
+        assert manager.remaining() == 10000
+        manager.charge('videos.list')
+        assert manager.get_used() == 1
+    with quota_day('2000-03-01'):
+        assert manager.get_used() == 300
+    print("✅ 新配额日重新计算用量")
+
+
+def test_reserve_is_atomic():
+    """并发预留时检查与记录在同一把锁内，总消耗不超过每日上限"""
+    setup_database()
+    manager = QuotaManager(daily_limit=1000)
+    succeeded = []
+    rejected = []
+    start = threading.Barrier(30)
+
+    def worker():
+        start.wait()
+        try:
+            manager.reserve('search.list')
+            succeeded.append(1)
+        except QuotaExceededError:
+            rejected.append(1)
+
+    with quota_day('2000-04-01'):
+        threads = [threading.Thread(target=worker) for _ in range(30)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(succeeded) == 10 and len(rejected) == 20, f"成功 {len(succeeded)}，拒绝 {len(rejected)}"
+        assert manager.get_used() == 1000 and manager.remaining() == 0
+
+        # 配额不足时不记录消耗
+        try:
+            manager.reserve('videos.list')
+            assert False, "配额耗尽时应拒绝"
+        except QuotaExceededError:
+            pass
+        assert manager.get_used() == 1000
+    print("✅ 并发预留不超支")
+
+
+if __name__ == "__main__":
+    print("📊 正在测试YouTube配额管理...")
+    print("=" * 50)
+    test_admit_by_priority()
+    test_quota_date_rollover_at_pacific_midnight()
+    test_usage_resets_on_new_quota_day()
+    test_reserve_is_atomic()
+    print("\n🎉 YouTube配额管理测试全部通过")
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+外部API限流与熔断测试
+用假时钟替换 rate_limit_service 中的 time（monotonic 返回假时间，sleep 只推进假时间），
+验证熔断器的 closed -> open -> half_open 状态转换、探测名额归还、is_failure 过滤，
+以及令牌桶与并发名额的等待超时
+"""
+
+from contextlib import contextmanager
+
+from app.services import rate_limit_service
+from app.services.rate_limit_service import (
+    TokenBucket, CircuitBreaker, ProviderGuard, RateLimitedError, CircuitOpenError,
+    CIRCUIT_CLOSED, CIRCUIT_OPEN, CIRCUIT_HALF_OPEN
+)
+
+
+class FakeClock:
+    """替代 time 模块：sleep 立即返回并推进时间"""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+        self.slept = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.slept.append(seconds)
+        self.now += seconds
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+def fail(error: Exception):
+    raise error
+
+
+@contextmanager
+def fake_clock():
+    original = rate_limit_service.time
+    clock = FakeClock()
+    rate_limit_service.time = clock
+    try:
+        yield clock
+    finally:
+        rate_limit_service.time = original
+
+
+def test_breaker_opens_after_threshold():
+    """连续失败达到阈值后打开，冷却期内拒绝请求"""
+    with fake_clock() as clock:
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+        for _ in range(2):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == CIRCUIT_CLOSED
+
+        # 成功会清零连续失败次数
+        breaker.record_success()
+        for _ in range(3):
+            assert breaker.allow()
+            breaker.record_failure()
+        assert breaker.state == CIRCUIT_OPEN
+        assert not breaker.allow()
+
+        clock.advance(29.9)
+        assert not breaker.allow()
+        assert breaker.state == CIRCUIT_OPEN
+        print("✅ 连续失败后熔断")
+
+
+def test_breaker_half_open_probe():
+    """冷却后半开只放行一个探测请求；探测失败重新打开，探测成功关闭"""
+    with fake_clock() as clock:
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=10)
+        breaker.record_failure()
+        assert breaker.state == CIRCUIT_OPEN
+
+        clock.advance(10)
+        assert breaker.allow()
+        assert breaker.state == CIRCUIT_HALF_OPEN
+        assert not breaker.allow(), "半开状态只放行一个探测请求"
+
+        breaker.record_failure()
+        assert breaker.state == CIRCUIT_OPEN
+        assert not breaker.allow(), "探测失败后重新开始冷却"
+
+        clock.advance(10)
+        assert breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CIRCUIT_CLOSED
+        assert breaker.allow() and breaker.allow()
+        print("✅ 半开探测成功后恢复")
+
+
+def test_breaker_release_probe():
+    """未计入成败的探测请求归还名额，下一个请求可以继续探测"""
+    with fake_clock() as clock:
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=5)
+        breaker.record_failure()
+        clock.advance(5)
+        assert breaker.allow()
+        assert not breaker.allow()
+        breaker.release_probe()
+        assert breaker.state == CIRCUIT_HALF_OPEN
+        assert breaker.allow()
+
+        # 关闭状态下归还名额不产生影响
+        breaker.record_success()
+        breaker.release_probe()
+        assert breaker.state == CIRCUIT_CLOSED and breaker.half_open_calls == 0
+        print("✅ 探测名额可归还")
+
+
+def test_guard_is_failure_filter():
+    """is_failure 判定为非故障的异常不计入熔断，半开时归还探测名额"""
+    with fake_clock() as clock:
+        guard = ProviderGuard('test', rate=100, burst=100, max_concurrency=2, failure_threshold=2,
+                              recovery_timeout=10, acquire_timeout=1,
+                              is_failure=lambda e: not isinstance(e, ValueError))
+
+        for _ in range(5):
+            try:
+                guard.execute(fail, ValueError('参数错误'))
+            except ValueError:
+                pass
+        assert guard.breaker.state == CIRCUIT_CLOSED
+        assert guard.get_stats()['failures'] == 0
+
+        for _ in range(2):
+            try:
+                guard.execute(fail, RuntimeError('服务错误'))
+            except RuntimeError:
+                pass
+        assert guard.breaker.state == CIRCUIT_OPEN
+        try:
+            guard.execute(lambda: 'ok')
+            assert False, "熔断中应直接拒绝"
+        except CircuitOpenError:
+            pass
+        assert guard.get_stats()['short_circuited'] == 1
+
+        # 半开探测遇到非故障异常：归还名额，下一个请求继续探测并关闭熔断器
+        clock.advance(10)
+        try:
+            guard.execute(fail, ValueError('参数错误'))
+        except ValueError:
+            pass
+        assert guard.breaker.state == CIRCUIT_HALF_OPEN
+        assert guard.execute(lambda: 'ok') == 'ok'
+        assert guard.breaker.state == CIRCUIT_CLOSED
+        print("✅ is_failure 过滤生效")
+
+
+def test_token_bucket_timeout():
+    """令牌不足时按补充速率等待，预计等待超过超时时间时立即失败"""
+    with fake_clock() as clock:
+        bucket = TokenBucket(rate=2, capacity=2)
+        assert bucket.acquire(timeout=0) == 0
+        assert bucket.acquire(timeout=0) == 0
+
+        try:
+            bucket.acquire(timeout=0.4)
+            assert False, "需要等待0.5秒，超时0.4秒应失败"
+        except RateLimitedError:
+            pass
+        assert clock.slept == [], "预计超时时不应等待"
+
+        waited = bucket.acquire(timeout=1)
+        assert abs(waited - 0.5) < 1e-9
+        assert clock.slept == [0.5]
+
+        # 长时间空闲后令牌不超过容量
+        clock.advance(100)
+        assert bucket.acquire(timeout=0) == 0
+        assert bucket.acquire(timeout=0) == 0
+        try:
+            bucket.acquire(timeout=0)
+            assert False, "突发请求不应超过容量"
+        except RateLimitedError:
+            pass
+        print("✅ 令牌桶等待与超时")
+
+
+def test_guard_throttled_releases_probe():
+    """等待令牌超时计为限流，不计入熔断，并归还半开探测名额"""
+    with fake_clock() as clock:
+        guard = ProviderGuard('test', rate=1, burst=1, max_concurrency=1, failure_threshold=1,
+                              recovery_timeout=10, acquire_timeout=0.5)
+        try:
+            guard.execute(fail, RuntimeError('服务错误'))
+        except RuntimeError:
+            pass
+        assert guard.breaker.state == CIRCUIT_OPEN
+
+        # 冷却期间令牌已补满，先用掉令牌使下一次探测等待超时
+        clock.advance(10)
+        guard.bucket.tokens = 0
+        guard.bucket.updated_at = clock.now
+        try:
+            guard.execute(lambda: 'ok')
+            assert False, "等待令牌超过0.5秒应限流"
+        except RateLimitedError:
+            pass
+        stats = guard.get_stats()
+        assert stats['throttled'] == 1 and stats['failures'] == 1
+        assert guard.breaker.state == CIRCUIT_HALF_OPEN and guard.breaker.half_open_calls == 0
+
+        clock.advance(1)
+        assert guard.execute(lambda: 'ok') == 'ok'
+        assert guard.breaker.state == CIRCUIT_CLOSED
+        print("✅ 限流超时归还探测名额")
+
+
+def test_guard_concurrency_timeout():
+    """并发名额用尽时等待超时计为限流"""
+    guard = ProviderGuard('test', rate=100, burst=100, max_concurrency=1, acquire_timeout=0.05)
+
+    def nested():
+        # 在持有唯一并发名额时再次调用
+        return guard.execute(lambda: 'inner')
+
+    try:
+        guard.execute(nested)
+        assert False, "并发名额用尽时应限流"
+    except RateLimitedError:
+        pass
+    stats = guard.get_stats()
+    assert stats['throttled'] == 1 and stats['in_flight'] == 0
+    assert guard.execute(lambda: 'ok') == 'ok'
+    print("✅ 并发名额等待超时")
+
+
+if __name__ == "__main__":
+    print("🚦 正在测试限流与熔断...")
+    print("=" * 50)
+    test_breaker_opens_after_threshold()
+    test_breaker_half_open_probe()
+    test_breaker_release_probe()
+    test_guard_is_failure_filter()
+    test_token_bucket_timeout()
+    test_guard_throttled_releases_probe()
+    test_guard_concurrency_timeout()
+    print("\n🎉 限流与熔断测试全部通过")
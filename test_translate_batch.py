@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量翻译测试
+使用桩翻译接口、桩翻译记忆和桩语言预判（不访问网络），验证 _pack_batches 的
+TextList 条数（16条）与总字符数（5000字符）限制，以及 translate_batch 中某一批
+请求失败时改为逐条翻译、单条失败只影响该条
+"""
+
+import json
+from contextlib import contextmanager
+
+from app.services import translate_service as translate_module
+from app.services.rate_limit_service import ProviderGuard
+from app.services.translate_service import (
+    TranslateService, TRANSLATE_BATCH_MAX_ITEMS, TRANSLATE_BATCH_MAX_CHARS
+)
+
+
+class StubVolcService:
+    """桩翻译接口：包含 bad_batch 标记的多条请求整批失败，包含 bad_item 标记的单条请求失败"""
+
+    def __init__(self):
+        self.requests = []
+
+    def json(self, api, params, body):
+        texts = json.loads(body)['TextList']
+        self.requests.append(texts)
+        if len(texts) > 1 and any('bad_batch' in text for text in texts):
+            raise RuntimeError('批量请求失败')
+        if any('bad_item' in text for text in texts):
+            return json.dumps({'ResponseMetadata': {'Error': {'Code': '-400', 'Message': '单条失败'}}})
+        return json.dumps({'TranslationList': [{'Translation': f"译:{text}"} for text in texts]})
+
+
+class StubMemory:
+    """桩翻译记忆：只记录写入的译文"""
+
+    def __init__(self, cached: dict = None):
+        self.cached = dict(cached or {})
+        self.stored = {}
+
+    def get_many(self, texts, target_language):
+        return {text: self.cached[text] for text in texts if text in self.cached}
+
+    def put_many(self, translations, target_language):
+        self.stored.update(translations)
+
+
+class StubDetector:
+    """桩语言预判：以 zh: 开头的文本视为已是目标语言"""
+
+    def check(self, text, target_language):
+        if text.startswith('zh:'):
+            return False, target_language
+        return True, None
+
+
+@contextmanager
+def stub_guard():
+    """替换火山引擎调用保护，避免测试中的失败请求触发熔断或限流"""
+    original = translate_module.volc_api_guard
+    translate_module.volc_api_guard = ProviderGuard('volcengine-test', rate=1000, burst=1000,
+                                                    max_concurrency=4, failure_threshold=1000)
+    try:
+        yield
+    finally:
+        translate_module.volc_api_guard = original
+
+
+def make_service(memory: StubMemory = None) -> TranslateService:
+    service = TranslateService(memory=memory or StubMemory(), detector=StubDetector())
+    service.service = StubVolcService()
+    return service
+
+
+def test_pack_batches_item_limit():
+    """每批最多16条，顺序不变"""
+    service = make_service()
+    texts = [f"text {i}" for i in range(40)]
+    batches = service._pack_batches(texts)
+    assert [len(batch) for batch in batches] == [16, 16, 8]
+    assert [text for batch in batches for text in batch] == texts
+    assert service._pack_batches([]) == []
+    assert TRANSLATE_BATCH_MAX_ITEMS == 16
+    print("✅ 每批不超过16条")
+
+
+def test_pack_batches_char_limit():
+    """每批总字符数不超过5000；超长的单条文本单独成批"""
+    service = make_service()
+    texts = ['a' * 2000, 'b' * 2000, 'c' * 1000, 'd' * 1, 'e' * 6000, 'f' * 10]
+    batches = service._pack_batches(texts)
+    assert batches == [['a' * 2000, 'b' * 2000, 'c' * 1000], ['d'], ['e' * 6000], ['f' * 10]]
+    for batch in batches:
+        assert len(batch) == 1 or sum(len(text) for text in batch) <= TRANSLATE_BATCH_MAX_CHARS
+
+    # 条数和字符数同时限制：先达到哪个就在哪里切分
+    texts = ['x' * 400] * 20
+    batches = service._pack_batches(texts)
+    assert [len(batch) for batch in batches] == [12, 8]
+    assert TRANSLATE_BATCH_MAX_CHARS == 5000
+    print("✅ 每批不超过5000字符")
+
+
+def test_translate_batch_per_item_fallback():
+    """整批请求失败时逐条翻译，失败的单条返回None，其他条目及其他批次不受影响"""
+    memory = StubMemory(cached={'cached text': '译:记忆'})
+    service = make_service(memory)
+    texts = ([f"first {i}" for i in range(15)] + ['bad_batch bad_item'] +   # 第一批：整批失败，逐条重试
+             ['second bad_batch', 'second ok'] +                           # 第二批：整批失败，逐条全部成功
+             ['zh:已是中文', '', 'cached text', 'first 3'])                 # 预判跳过、空文本、记忆命中、重复文本
+
+    with stub_guard():
+        results = service.translate_batch(texts)
+
+    assert len(results) == len(texts)
+    for i in range(15):
+        assert results[i] == f"译:first {i}"
+    assert results[15] is None, "单条失败只影响该条"
+    assert results[16] == '译:second bad_batch' and results[17] == '译:second ok'
+    assert results[18] == 'zh:已是中文' and results[19] is None
+    assert results[20] == '译:记忆' and results[21] == '译:first 3'
+
+    # 两次整批请求，各自逐条重试；预判跳过、记忆命中与重复文本不发送
+    requests = service.service.requests
+    assert [len(batch) for batch in requests] == [16] + [1] * 16 + [2] + [1, 1]
+    sent = [text for batch in requests for text in batch]
+    assert 'zh:已是中文' not in sent and 'cached text' not in sent
+    assert sent.count('first 3') == 2
+
+    # 只有成功的译文写入翻译记忆
+    assert 'bad_batch bad_item' not in memory.stored
+    assert len(memory.stored) == 17
+
+    # translate_texts 不保留预判跳过的原文
+    with stub_guard():
+        assert service.translate_texts(['zh:已是中文']) == [None]
+    print("✅ 整批失败时逐条翻译，单条失败只影响该条")
+
+
+if __name__ == "__main__":
+    print("🈯 正在测试批量翻译...")
+    print("=" * 50)
+    test_pack_batches_item_limit()
+    test_pack_batches_char_limit()
+    test_translate_batch_per_item_fallback()
+    print("\n🎉 批量翻译测试全部通过")
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+翻译任务队列测试
+使用临时数据库和桩翻译服务（不访问网络），验证多个工作线程并发领取时任务不重复、
+失败按指数退避重试并在达到上限后标记失败，以及启动时恢复上次停机时处理中的任务
+"""
+
+import os
+import tempfile
+import threading
+from datetime import timedelta
+
+from app.database import db_manager
+from app.models import TranslationJob, VideoInfo, get_east8_time
+from app.services import translation_queue_service
+from app.services.translation_queue_service import (
+    TranslationQueue, JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED
+)
+
+_db_ready = False
+_video_counter = 0
+
+
+def setup_database():
+    global _db_ready
+    if not _db_ready:
+        db_manager.init_database(os.path.join(tempfile.mkdtemp(), 'test_translation_queue.db'))
+        _db_ready = True
+
+
+class StubTranslateService:
+    """桩翻译服务：fail 为真时整批抛出异常，否则返回加前缀的译文"""
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.calls = 0
+
+    def translate_batch(self, texts):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError('翻译服务不可用')
+        return [f"译:{text}" for text in texts]
+
+
+def make_queue(translate_service: StubTranslateService, **kwargs) -> TranslationQueue:
+    setup_database()
+    translation_queue_service.get_translate_service = lambda: translate_service
+    queue = TranslationQueue(**kwargs)
+    queue.poll_interval = 1
+    return queue
+
+
+def add_videos(queue: TranslationQueue, count: int) -> list:
+    """写入 count 个待翻译视频并入队，返回 VideoInfo 主键列表"""
+    global _video_counter
+    db = db_manager.get_session()
+    try:
+        videos = []
+        for _ in range(count):
+            _video_counter += 1
+            videos.append(VideoInfo(video_id=f"vid{_video_counter:05d}", title=f"title {_video_counter}",
+                                    description=f"description {_video_counter}"))
+        db.add_all(videos)
+        db.flush()
+        ids = [video.id for video in videos]
+        queue.enqueue(db, ids)
+        db.commit()
+        return ids
+    finally:
+        db.close()
+
+
+def get_jobs(video_info_ids: list) -> dict:
+    db = db_manager.get_session()
+    try:
+        jobs = db.query(TranslationJob).filter(TranslationJob.video_info_id.in_(video_info_ids)).all()
+        db.expunge_all()
+        return {job.video_info_id: job for job in jobs}
+    finally:
+        db.close()
+
+
+def make_due(video_info_ids: list):
+    """将任务的下次尝试时间提前到现在，跳过退避等待"""
+    db = db_manager.get_session()
+    try:
+        db.query(TranslationJob).filter(TranslationJob.video_info_id.in_(video_info_ids)).update(
+            {TranslationJob.next_attempt_at: get_east8_time()}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_concurrent_claim_is_atomic():
+    """多个线程同时领取，每个任务只被领取一次"""
+    queue = make_queue(StubTranslateService(), batch_size=7)
+    video_ids = add_videos(queue, 60)
+    job_ids = {job.id for job in get_jobs(video_ids).values()}
+
+    claimed = []
+    lock = threading.Lock()
+    start = threading.Barrier(8)
+
+    def worker():
+        start.wait()
+        while True:
+            db = db_manager.get_session()
+            try:
+                batch = [job.id for job in queue._claim_batch(db)]
+            finally:
+                db.close()
+            if not batch:
+                return
+            with lock:
+                claimed.extend(batch)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(claimed) == len(set(claimed)), f"有任务被重复领取：{len(claimed) - len(set(claimed))} 次"
+    assert set(claimed) == job_ids
+    assert all(job.status == JOB_RUNNING and job.claim_token for job in get_jobs(video_ids).values())
+    print("✅ 并发领取不重复")
+
+
+def test_exponential_backoff_then_failed():
+    """批量翻译失败时按 backoff * 2^(attempts-1) 延后重试，达到上限后标记失败"""
+    translate_service = StubTranslateService(fail=True)
+    queue = make_queue(translate_service, batch_size=50)
+    queue.max_attempts = 3
+    queue.backoff_seconds = 60
+    video_ids = add_videos(queue, 2)
+
+    for attempt in (1, 2):
+        before = get_east8_time().replace(tzinfo=None)
+        assert queue._process_next_batch() == 2
+        after = get_east8_time().replace(tzinfo=None)
+        delay = timedelta(seconds=60 * 2 ** (attempt - 1))
+        for job in get_jobs(video_ids).values():
+            assert job.status == JOB_PENDING and job.attempts == attempt
+            assert job.claim_token is None and job.last_error == '翻译服务不可用'
+            assert before + delay <= job.next_attempt_at <= after + delay, \
+                f"第 {attempt} 次失败后应延后 {delay}"
+        # 退避期间不会被再次领取
+        assert queue._process_next_batch() == 0
+        make_due(video_ids)
+
+    assert queue._process_next_batch() == 2
+    assert all(job.status == JOB_FAILED and job.attempts == 3 for job in get_jobs(video_ids).values())
+    assert queue._process_next_batch() == 0
+    assert translate_service.calls == 3
+
+    # 重新入队后从头开始，翻译成功即完成
+    translate_service.fail = False
+    db = db_manager.get_session()
+    try:
+        queue.enqueue(db, video_ids)
+        db.commit()
+    finally:
+        db.close()
+    assert queue._process_next_batch() == 2
+    assert all(job.status == JOB_DONE and job.attempts == 0 for job in get_jobs(video_ids).values())
+    stats = queue.get_stats()
+    assert stats['retried'] == 4 and stats['failed'] == 2 and stats['done'] == 2
+    print("✅ 失败按指数退避重试，达到上限后标记失败")
+
+
+def test_recover_running_jobs_on_start():
+    """上次停机时处于处理中的任务在启动时重新置为待处理并完成翻译"""
+    queue = make_queue(StubTranslateService())
+    video_ids = add_videos(queue, 3)
+    db = db_manager.get_session()
+    try:
+        # 模拟停机前已被领取但未处理完成的任务
+        db.query(TranslationJob).filter(TranslationJob.video_info_id.in_(video_ids)).update(
+            {TranslationJob.status: JOB_RUNNING, TranslationJob.claim_token: 'stale-token'},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    queue.start()
+    try:
+        assert queue.wait_for(video_ids, timeout=10), "处理中的任务未被恢复"
+        jobs = get_jobs(video_ids)
+        assert all(job.status == JOB_DONE and job.claim_token is None for job in jobs.values())
+
+        db = db_manager.get_session()
+        try:
+            videos = db.query(VideoInfo).filter(VideoInfo.id.in_(video_ids)).all()
+            assert all(video.translated_title == f"译:{video.title}" for video in videos)
+            assert all(video.translated_description == f"译:{video.description}" for video in videos)
+        finally:
+            db.close()
+        print("✅ 启动时恢复处理中的任务")
+    finally:
+        queue.stop()
+
+
+if __name__ == "__main__":
+    print("🌐 正在测试翻译任务队列...")
+    print("=" * 50)
+    test_concurrent_claim_is_atomic()
+    test_exponential_backoff_then_failed()
+    test_recover_running_jobs_on_start()
+    print("\n🎉 翻译任务队列测试全部通过")